@@ -0,0 +1,93 @@
+"""
+Benchmark of LSTM training throughput with in-memory NumPy sequences versus the tf.data pipeline.
+
+Trains the model of create_lstm_model on a synthetic random-walk series, once from the copied
+sequence arrays model.fit used to receive and once from the streaming datasets of input_pipeline,
+and reports training steps per second for every epoch:
+
+    python -m benchmarks.bench_input_pipeline --rows 100000 --epochs 3
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from scripts.time_series_forecasting.a_data_preparation import prepare_data_for_lstm, split_data
+from scripts.time_series_forecasting.b_lstm_model import create_lstm_model
+from scripts.time_series_forecasting.input_pipeline import build_datasets
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Record the wall time of every training epoch."""
+
+    def on_train_begin(self, logs=None):
+        self.durations = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.durations.append(time.perf_counter() - self.started)
+
+
+def generate_series(rows, seed=0):
+    """Generate a random-walk close series scaled to [0, 1]."""
+    close = np.random.default_rng(seed).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({'scaled_close': (close - close.min()) / (close.max() - close.min())})
+
+
+def run(name, fit, steps, epochs):
+    """
+    Train a fresh model and print its steps per second for every epoch.
+
+    Args:
+        name (str): Label of the pipeline.
+        fit (callable): Function training the model passed to it with the given callbacks.
+        steps (int): Training steps per epoch.
+        epochs (int): Number of epochs.
+
+    Returns:
+        list: Steps per second of every epoch.
+    """
+    timer = EpochTimer()
+    fit(timer)
+    rates = [steps / duration for duration in timer.durations]
+    print(f"{name:<8} " + "  ".join(f"epoch {i + 1}: {rate:7.1f} steps/s" for i, rate in enumerate(rates)))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help="Length of the series")
+    parser.add_argument('--window-size', type=int, default=30, help="Timesteps per sequence")
+    parser.add_argument('--batch-size', type=int, default=32, help="Sequences per batch")
+    parser.add_argument('--epochs', type=int, default=3, help="Training epochs per pipeline")
+    args = parser.parse_args()
+
+    data = generate_series(args.rows)
+    X, y = prepare_data_for_lstm(data, args.window_size)
+    # The arrays model.fit received before the sequences became views
+    X_train, _, y_train, _ = split_data(np.array(X), np.array(y))
+    steps = -(-len(X_train) // args.batch_size)
+    print(f"{len(X_train):,} training sequences, {steps} steps per epoch; "
+          f"NumPy sequences take {X_train.nbytes / 1e6:.0f} MB")
+
+    input_shape = (args.window_size, 1)
+    tf.keras.utils.set_random_seed(0)
+    numpy_rates = run('numpy', lambda timer: create_lstm_model(input_shape).fit(
+        X_train, y_train, batch_size=args.batch_size, epochs=args.epochs, callbacks=[timer], verbose=0),
+        steps, args.epochs)
+
+    train_dataset, _, _ = build_datasets(data, args.window_size, args.batch_size)
+    tf.keras.utils.set_random_seed(0)
+    dataset_rates = run('tf.data', lambda timer: create_lstm_model(input_shape).fit(
+        train_dataset, epochs=args.epochs, callbacks=[timer], verbose=0), steps, args.epochs)
+
+    # The first epoch includes tracing the model and the first pass over the series
+    speedup = np.mean(dataset_rates[1:] or dataset_rates) / np.mean(numpy_rates[1:] or numpy_rates)
+    print(f"tf.data / numpy after the first epoch: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
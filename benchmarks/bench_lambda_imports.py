@@ -0,0 +1,104 @@
+"""
+Report the handler's import time and the deployment size of the Lambda bundle.
+
+Each measurement imports the handler in a fresh interpreter with -X importtime, the way a cold
+Lambda container does. The source directory is measured without any bytecode cache, as on Lambda
+where /var/task is read-only and nothing can be cached; the built bundle uses its precompiled
+bytecode. Build the bundle first:
+
+    python -m scripts.build_lambda_bundle --output build/lambda
+    python -m benchmarks.bench_lambda_imports --bundle build/lambda
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+from scripts.build_lambda_bundle import SOURCE_DIR, directory_size
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def measure_imports(directory, module='lambda_function', use_bytecode=True):
+    """
+    Import a module in a fresh interpreter and parse the -X importtime report.
+
+    Args:
+        directory (str): Directory put first on sys.path.
+        module (str): Module to import.
+        use_bytecode (bool): Use existing pycs; when False a fresh empty cache is used and nothing is written.
+
+    Returns:
+        tuple: Total import time in seconds and a list of (module, cumulative seconds) for the
+        modules imported directly by the handler.
+    """
+    with tempfile.TemporaryDirectory() as empty_cache:
+        command = [sys.executable, '-X', 'importtime']
+        if not use_bytecode:
+            command += ['-X', f'pycache_prefix={empty_cache}']
+        command += ['-c', f'import {module}']
+        env = {**os.environ, 'PYTHONPATH': directory, 'PYTHONDONTWRITEBYTECODE': '1',
+               'AWS_LAMBDA_FUNCTION_NAME': 'bench'}
+        result = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True, check=True)
+
+    # A module's line follows the lines of the modules it imported, indented one level deeper
+    total, children, pending = 0.0, [], []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1e6
+        depth = len(match.group(3)) // 2
+        if depth == 1:
+            pending.append((match.group(4), cumulative))
+        elif depth == 0:
+            if match.group(4) == module:
+                total, children = cumulative, pending
+            pending = []
+    return total, children
+
+
+def zipped_size(directory):
+    """Return the size in bytes of the directory compressed the way the bundle is deployed."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, 'bundle.zip')
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith('.pyc') and '__pycache__' in root and directory == SOURCE_DIR:
+                        continue  # Local caches are not part of the deployed source tree
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, directory))
+        return os.path.getsize(zip_path)
+
+
+def report(label, directory, use_bytecode, runs, top):
+    """Print the median import time, the slowest direct imports and the bundle size."""
+    measurements = [measure_imports(directory, use_bytecode=use_bytecode) for _ in range(runs)]
+    totals = [total for total, _ in measurements]
+    print(f"{label}: {directory}")
+    print(f"  import time: median {statistics.median(totals) * 1000:.1f} ms over {runs} runs "
+          f"(min {min(totals) * 1000:.1f} ms)")
+    for name, seconds in sorted(measurements[-1][1], key=lambda item: -item[1])[:top]:
+        print(f"    {name:<40} {seconds * 1000:8.1f} ms")
+    print(f"  size: {directory_size(directory) / 1e6:.1f} MB unpacked, {zipped_size(directory) / 1e6:.1f} MB zipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Lambda handler import time and bundle size.")
+    parser.add_argument('--bundle', help="Directory built by scripts.build_lambda_bundle")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--top', type=int, default=8, help="Number of slowest direct imports to list")
+    args = parser.parse_args()
+
+    report("Source", SOURCE_DIR, use_bytecode=False, runs=args.runs, top=args.top)
+    if args.bundle:
+        report("Bundle", os.path.abspath(args.bundle), use_bytecode=True, runs=args.runs, top=args.top)
+
+
+if __name__ == '__main__':
+    main()
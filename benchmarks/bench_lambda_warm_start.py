@@ -0,0 +1,166 @@
+"""
+Local harness measuring cold and warm invocation latency of the Lambda handler.
+
+The handler runs against stand-ins: Secrets Manager and OANDA answer after a configurable
+simulated latency (OANDA also charges a connection setup cost for every new pooled connection),
+and the database is a temporary SQLite file. The first invocation is cold; later ones reuse the
+cached secret, engine and HTTP session. With --no-reuse the caches are cleared before every
+invocation, which approximates the handler before warm-start reuse.
+
+    python -m benchmarks.bench_lambda_warm_start --invocations 20
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# The handler imports the packages bundled inside lambda_function/, not the top-level ones
+LAMBDA_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_function')
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def generate_candles(count, end=datetime(2024, 1, 1)):
+    """
+    Generate complete daily candles in the OANDA response format.
+
+    Args:
+        count (int): Number of candles.
+        end (datetime): Timestamp after the last candle.
+
+    Returns:
+        list: Raw candles.
+    """
+    candles = []
+    for i in range(count):
+        time_ = end - timedelta(days=count - i)
+        price = f"{1.1 + i / 10000:.5f}"
+        candles.append({'complete': True, 'volume': 1000 + i,
+                        'time': time_.strftime('%Y-%m-%dT%H:%M:%S.000000000Z'),
+                        'mid': {'o': price, 'h': price, 'l': price, 'c': price}})
+    return candles
+
+
+class StubSecretsManager:
+    """Secrets Manager client returning a fixed secret after a simulated round trip."""
+
+    def __init__(self, secret, latency):
+        self.secret = secret
+        self.latency = latency
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {'SecretString': json.dumps(self.secret)}
+
+
+def make_oanda_adapter(body, connect_latency, request_latency, stats):
+    """
+    Build an HTTPAdapter class that answers every request with the given body.
+
+    Each adapter instance pays connect_latency once, standing in for the TCP and TLS handshake of
+    a new keep-alive connection.
+    """
+
+    class StubOandaAdapter(HTTPAdapter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.connected = False
+
+        def send(self, request, **kwargs):
+            if not self.connected:
+                stats['connections'] += 1
+                time.sleep(connect_latency)
+                self.connected = True
+            time.sleep(request_latency)
+            response = requests.Response()
+            response.status_code = 200
+            response.raw = io.BytesIO(body)
+            response.url = request.url
+            response.request = request
+            return response
+
+    return StubOandaAdapter
+
+
+def simulate_cold_start(handler_module, fetch_module, db_connect):
+    """Drop every cached object, as a new Lambda container would start without them."""
+    handler_module._secrets_client = None
+    handler_module._secret_cache.clear()
+    fetch_module._http_session = None
+    db_connect.dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold and warm Lambda handler latency.")
+    parser.add_argument('--invocations', type=int, default=10, help="Number of handler invocations")
+    parser.add_argument('--candles', type=int, default=100, help="Candles returned by the OANDA stand-in")
+    parser.add_argument('--secrets-latency', type=float, default=0.05, help="Simulated Secrets Manager round trip (s)")
+    parser.add_argument('--connect-latency', type=float, default=0.1, help="Simulated OANDA connection setup (s)")
+    parser.add_argument('--request-latency', type=float, default=0.03, help="Simulated OANDA request (s)")
+    parser.add_argument('--no-reuse', action='store_true', help="Clear all caches before every invocation")
+    args = parser.parse_args()
+
+    os.environ['AWS_LAMBDA_FUNCTION_NAME'] = 'bench'  # Skip loading the local .env file
+    os.environ.pop('DB_HOST', None)
+    sys.path.insert(0, LAMBDA_ROOT)
+    for name in [name for name in sys.modules if name == 'database' or name.startswith('database.')]:
+        del sys.modules[name]
+
+    import boto3
+    import lambda_function as handler_module
+    import database.fetch_data as fetch_module
+    import database.db_connect as db_connect
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite:///{os.path.join(temp_dir, 'bench.sqlite')}"
+        secret = {'OANDA_API_KEY': 'bench', 'DB_HOST': 'localhost', 'DB_NAME': 'bench',
+                  'DB_USER': 'bench', 'DB_PASS': 'bench', 'DB_PORT': '5432'}
+        secrets_manager = StubSecretsManager(secret, args.secrets_latency)
+        stats = {'connections': 0, 'engines': 0}
+        body = json.dumps({'candles': generate_candles(args.candles)}).encode()
+        adapter = make_oanda_adapter(body, args.connect_latency, args.request_latency, stats)
+        create_engine = db_connect.create_engine
+
+        def counting_create_engine(*engine_args, **engine_kwargs):
+            stats['engines'] += 1
+            engine = create_engine(*engine_args, **engine_kwargs)
+            db_connect.Base.metadata.create_all(engine)
+            return engine
+
+        latencies = []
+        with patch.object(boto3, 'client', return_value=secrets_manager), \
+                patch.object(fetch_module, 'HTTPAdapter', adapter), \
+                patch.object(db_connect, 'get_database_url', return_value=database_url), \
+                patch.object(db_connect, 'create_engine', counting_create_engine):
+            for i in range(args.invocations):
+                if args.no_reuse and i > 0:
+                    simulate_cold_start(handler_module, fetch_module, db_connect)
+                started = time.perf_counter()
+                handler_module.lambda_handler({'currency_pair': 'EUR_USD'}, None)
+                latencies.append(time.perf_counter() - started)
+            db_connect.dispose_engine()
+
+    cold, warm = latencies[0], latencies[1:]
+    print(f"Mode: {'no reuse' if args.no_reuse else 'warm-start reuse'}")
+    for i, latency in enumerate(latencies):
+        print(f"  invocation {i + 1:>3}: {latency * 1000:8.1f} ms{' (cold)' if i == 0 else ''}")
+    print(f"Cold: {cold * 1000:.1f} ms")
+    if warm:
+        print(f"Warm: median {statistics.median(warm) * 1000:.1f} ms, max {max(warm) * 1000:.1f} ms")
+    print(f"Secrets Manager calls: {secrets_manager.calls}, OANDA connections: {stats['connections']}, "
+          f"engines created: {stats['engines']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 """
 This module handles the database connection and session creation.
+
+The engine and its connection pool are created once per process and shared by every caller, so
+repeated calls to get_engine, get_session and session_scope reuse open connections instead of
+building a new pool each time.
 """
 
+from contextlib import contextmanager
 from sqlalchemy import create_engine, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 import logging
+import threading
 from utils.env_loader import load_environment
 
 # Configure logging to output timestamp, log level, and message
@@ -14,6 +20,18 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables from .env file for database connection
 load_environment()
 
+# Pool defaults suited to serverless Postgres (e.g. Neon), which closes idle connections and
+# suspends the compute after a few minutes without traffic
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_POOL_TIMEOUT = 30  # Seconds to wait for a free connection
+DEFAULT_POOL_RECYCLE = 300  # Seconds; replace connections before the server drops them
+
+# Engine and session factory shared by the whole process, created on first use
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
 
 Base = declarative_base()
 def get_database_url():
@@ -22,18 +40,84 @@ def get_database_url():
            f"{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:" \
            f"{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
+def _env_flag(name, default=False):
+    """Read a boolean flag such as DB_ECHO=true from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_engine_options():
+    """
+    Return the engine options, overridable through environment variables.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE size the pool,
+    DB_POOL_PRE_PING checks connections before use and DB_ECHO enables SQL command logging.
+
+    Returns:
+        dict: Keyword arguments for create_engine.
+    """
+    return {
+        'echo': _env_flag('DB_ECHO'),
+        'pool_size': int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)),
+        'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', default=True),
+    }
+
 # Initialize SQLAlchemy Engine that will manage connections
 def get_engine():
-    """Return the SQLAlchemy engine."""
-    database_url = get_database_url()
-    return create_engine(database_url, echo=True)  # echo=True enables SQL command logging
+    """Return the shared SQLAlchemy engine, creating it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(get_database_url(), **get_engine_options())
+        return _engine
 
 # Create a Session class bound to the engine
 def get_session():
-    """Return a new session."""
+    """Return the shared session factory bound to the pooled engine."""
+    global _session_factory
     engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session
+    with _engine_lock:
+        if _session_factory is None:
+            _session_factory = sessionmaker(bind=engine)
+        return _session_factory
+
+@contextmanager
+def session_scope():
+    """
+    Provide a transactional session from the pooled engine.
+
+    The session is committed when the block succeeds, rolled back when it raises and always closed,
+    which returns its connection to the pool.
+
+    Yields:
+        Session: A new session.
+    """
+    session = get_session()()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def dispose_engine():
+    """
+    Close all pooled connections and forget the shared engine.
+
+    The next get_engine call builds a new engine, e.g. after the settings changed or in a forked process.
+    """
+    global _engine, _session_factory
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _session_factory = None
 
 def test_connection():
     """Test the database connection."""
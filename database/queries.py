@@ -0,0 +1,208 @@
+"""
+This module reads candle series from currency_data into typed NumPy arrays.
+
+Queries run on the shared pooled engine with bound parameters. Rows are streamed through a
+server-side cursor in chunks of READ_CHUNK_SIZE and copied straight into arrays preallocated from
+a count of the range, float64 for prices and datetime64[us] for timestamps, so reading millions of
+candles never holds them all as Python objects or goes through object-dtype columns.
+
+    from database.queries import read_series_frame
+    frame = read_series_frame('EUR/USD', 'H1', from_time=datetime(2020, 1, 1))
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+from database.db_connect import get_engine
+from database.dimensions import find_instrument_id, granularity_id, DEFAULT_GRANULARITY
+from database.schema.create_tables import CurrencyData
+
+# Rows fetched from the server per round trip
+READ_CHUNK_SIZE = 50_000
+
+# Columns that can be read, with their array dtypes
+SERIES_DTYPES = {
+    'timestamp': np.dtype('datetime64[us]'),
+    'open': np.dtype('float64'),
+    'high': np.dtype('float64'),
+    'low': np.dtype('float64'),
+    'close': np.dtype('float64'),
+    'volume': np.dtype('float64'),
+}
+DEFAULT_SERIES_COLUMNS = ('timestamp', 'close')
+
+# Timestamps are copied as integer microseconds since the epoch, which NumPy converts far faster than datetimes
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _check_columns(columns):
+    """Raise ValueError if a column cannot be read."""
+    unknown = [column for column in columns if column not in SERIES_DTYPES]
+    if unknown:
+        raise ValueError(f"Unknown series columns {unknown}; expected some of {', '.join(SERIES_DTYPES)}")
+
+
+def _series_conditions(instrument_id, granularity_id, from_time=None, to_time=None):
+    """Return the WHERE conditions selecting one series in [from_time, to_time)."""
+    conditions = [CurrencyData.instrument_id == instrument_id, CurrencyData.granularity_id == granularity_id]
+    if from_time is not None:
+        conditions.append(CurrencyData.timestamp >= from_time)
+    if to_time is not None:
+        conditions.append(CurrencyData.timestamp < to_time)
+    return conditions
+
+
+def build_series_query(instrument_id, granularity_id, from_time=None, to_time=None, columns=DEFAULT_SERIES_COLUMNS):
+    """
+    Build the query reading columns of one series in [from_time, to_time), ordered by timestamp.
+
+    Args:
+        instrument_id (int): Id of the currency pair.
+        granularity_id (int): Id of the candle granularity.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        columns (tuple): Names from SERIES_DTYPES.
+
+    Returns:
+        sqlalchemy.sql.Select: The query, with every value passed as a bound parameter.
+
+    Raises:
+        ValueError: If a column cannot be read.
+    """
+    _check_columns(columns)
+    return select(*[getattr(CurrencyData, column) for column in columns]) \
+        .where(*_series_conditions(instrument_id, granularity_id, from_time, to_time)) \
+        .order_by(CurrencyData.timestamp)
+
+
+def build_count_query(instrument_id, granularity_id, from_time=None, to_time=None):
+    """Build the query counting the candles of one series in [from_time, to_time)."""
+    return select(func.count()).select_from(CurrencyData) \
+        .where(*_series_conditions(instrument_id, granularity_id, from_time, to_time))
+
+
+def read_watermark(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                   engine=None):
+    """
+    Read how far a candle series has been loaded, to tell whether data derived from it is stale.
+
+    The checksum sums every value of the range, so it also moves when existing candles are
+    corrected in place, e.g. by an upsert with update_existing, which leaves the count and the
+    latest timestamp alone.
+
+    Like every read, it never registers the pair; an unknown pair has no candles.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        dict: 'rows', the number of candles in the range, 'last_timestamp', the latest one or None,
+            and 'checksum', the sum of their open, high, low, close and volume or None.
+    """
+    engine = engine or get_engine()
+    instrument_id = find_instrument_id(engine, currency_pair)
+    if instrument_id is None:
+        return {'rows': 0, 'last_timestamp': None, 'checksum': None}
+    conditions = _series_conditions(instrument_id, granularity_id(granularity), from_time, to_time)
+    values = (CurrencyData.open + CurrencyData.high + CurrencyData.low + CurrencyData.close + CurrencyData.volume)
+    with engine.connect() as connection:
+        rows, last_timestamp, checksum = connection.execute(
+            select(func.count(), func.max(CurrencyData.timestamp), func.sum(values)).where(*conditions)).one()
+    return {'rows': rows, 'last_timestamp': last_timestamp, 'checksum': checksum}
+
+
+def fill_arrays(result, columns, size, chunk_size=READ_CHUNK_SIZE):
+    """
+    Copy the rows of a result into typed arrays, one chunk at a time.
+
+    Args:
+        result (Result): Rows with the given columns, in order.
+        columns (tuple): Names from SERIES_DTYPES.
+        size (int): Expected number of rows; arrays grow if more arrive and are trimmed if fewer do.
+        chunk_size (int): Rows fetched per chunk.
+
+    Returns:
+        dict: Arrays keyed by column name.
+    """
+    arrays = {column: np.empty(size, dtype=SERIES_DTYPES[column]) for column in columns}
+    filled = 0
+    for rows in result.partitions(chunk_size):
+        end = filled + len(rows)
+        if end > len(arrays[columns[0]]):
+            # Rows inserted after the count; grow geometrically rather than per chunk
+            arrays = {column: np.resize(array, max(end, 2 * len(array))) for column, array in arrays.items()}
+        for index, column in enumerate(columns):
+            target = arrays[column][filled:end]
+            if target.dtype.kind == 'M':
+                target.view('int64')[:] = np.fromiter(((row[index] - EPOCH) // MICROSECOND for row in rows),
+                                                      dtype='int64', count=len(rows))
+            else:
+                target[:] = np.fromiter((row[index] for row in rows), dtype=target.dtype, count=len(rows))
+        filled = end
+    return {column: array[:filled] for column, array in arrays.items()}
+
+
+def read_series(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                columns=DEFAULT_SERIES_COLUMNS, engine=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read columns of a candle series into NumPy arrays.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        columns (tuple): Names from SERIES_DTYPES.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+        chunk_size (int): Rows fetched from the server per round trip.
+
+    Returns:
+        dict: Arrays keyed by column name, ordered by timestamp; empty for a pair never loaded,
+            which is not registered by the read.
+    """
+    engine = engine or get_engine()
+    _check_columns(columns)
+    series_granularity_id = granularity_id(granularity)
+    instrument_id = find_instrument_id(engine, currency_pair)
+    if instrument_id is None:
+        return {column: np.empty(0, dtype=SERIES_DTYPES[column]) for column in columns}
+    query = build_series_query(instrument_id, series_granularity_id, from_time, to_time, columns)
+    with engine.connect() as connection:
+        size = connection.execute(build_count_query(instrument_id, series_granularity_id, from_time, to_time)).scalar()
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        return fill_arrays(result, tuple(columns), size, chunk_size)
+
+
+def read_series_frame(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                      columns=DEFAULT_SERIES_COLUMNS, engine=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read columns of a candle series into a DataFrame backed by the arrays of read_series.
+
+    Takes the same arguments as read_series.
+
+    Returns:
+        DataFrame: One typed column per requested column.
+    """
+    arrays = read_series(currency_pair, granularity, from_time, to_time, columns, engine, chunk_size)
+    return pd.DataFrame(arrays, copy=False)
+
+
+def read_series_arrow(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                      columns=DEFAULT_SERIES_COLUMNS, engine=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read columns of a candle series into an Arrow table, for consumers such as Polars or Parquet writers.
+
+    Takes the same arguments as read_series and needs pyarrow, which is only imported here.
+
+    Returns:
+        pyarrow.Table: One column per requested column, sharing memory with the NumPy arrays.
+    """
+    import pyarrow as pa
+    arrays = read_series(currency_pair, granularity, from_time, to_time, columns, engine, chunk_size)
+    return pa.table({column: pa.array(array) for column, array in arrays.items()})
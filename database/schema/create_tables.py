@@ -1,6 +1,44 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import (Column, Integer, SmallInteger, String, Float, DateTime, ForeignKey, ForeignKeyConstraint,
+                        UniqueConstraint, Index, JSON)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from database.db_connect import Base
+from database.schema.partitions import skip_if_partitioned
+
+
+class Instrument(Base):
+    """
+    Represents a traded instrument, referenced by candles through its small integer id.
+
+    Attributes:
+        id (int): Primary key.
+        name (str): The instrument as stored (e.g., EUR/USD).
+        display_name (str): A readable name (e.g., Euro / US Dollar).
+        pip_size (float): Price change of one pip (e.g., 0.0001, or 0.01 for pairs quoted in yen).
+    """
+    __tablename__ = 'instrument'
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(SmallInteger().with_variant(Integer(), 'sqlite'), primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    display_name = Column(String, nullable=False)
+    pip_size = Column(Float, nullable=False)
+
+
+class Granularity(Base):
+    """
+    Represents a candle granularity. Ids are fixed (see database.dimensions.GRANULARITIES).
+
+    Attributes:
+        id (int): Primary key.
+        name (str): The OANDA granularity code (e.g., H1, D).
+        seconds (int): The length of one candle.
+    """
+    __tablename__ = 'granularity'
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False, unique=True)
+    seconds = Column(Integer, nullable=False)
 
 
 class CurrencyData(Base):
@@ -9,18 +47,30 @@ class CurrencyData(Base):
 
     Attributes:
         id (int): Primary key.
-        currency_pair (str): The currency pair (e.g., EUR/USD).
+        instrument_id (int): Foreign key to the instrument (e.g., EUR/USD).
+        granularity_id (int): Foreign key to the candle granularity (e.g., D).
         timestamp (datetime): The timestamp of the data.
         open (float): The opening price.
         high (float): The highest price.
         low (float): The lowest price.
         close (float): The closing price.
         volume (float): The volume of trading.
+
+    A candle is uniquely identified by its instrument, granularity and timestamp,
+    which is the conflict target used by the bulk upsert path and serves range
+    scans of one series. The timestamp index serves queries across all series,
+    such as the latest stored candle.
     """
     __tablename__ = 'currency_data'
+    __table_args__ = (
+        UniqueConstraint('instrument_id', 'granularity_id', 'timestamp',
+                         name='uq_currency_data_instrument_granularity_timestamp'),
+        Index('ix_currency_data_timestamp', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True)
-    currency_pair = Column(String, nullable=False)
+    instrument_id = Column(SmallInteger, ForeignKey('instrument.id'), nullable=False)
+    granularity_id = Column(SmallInteger, ForeignKey('granularity.id'), nullable=False)
     timestamp = Column(DateTime, nullable=False)
     open = Column(Float, nullable=False)
     high = Column(Float, nullable=False)
@@ -28,6 +78,8 @@ class CurrencyData(Base):
     close = Column(Float, nullable=False)
     volume = Column(Float, nullable=False)
 
+    instrument = relationship('Instrument')
+    granularity = relationship('Granularity')
     moving_averages = relationship('MovingAverage', back_populates='currency_data')
     predictions = relationship('Prediction', back_populates='currency_data')
 
@@ -44,9 +96,14 @@ class MovingAverage(Base):
         moving_average (float): The moving average value.
     """
     __tablename__ = 'moving_average'
+    __table_args__ = (
+        # Not created when currency_data is partitioned, as id alone is not unique there
+        ForeignKeyConstraint(['currency_data_id'], ['currency_data.id']).ddl_if(callable_=skip_if_partitioned),
+        Index('ix_moving_average_currency_data_id_window_size', 'currency_data_id', 'window_size'),
+    )
 
     id = Column(Integer, primary_key=True)
-    currency_data_id = Column(Integer, ForeignKey('currency_data.id'), nullable=False)
+    currency_data_id = Column(Integer, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     window_size = Column(Integer, nullable=False)
     moving_average = Column(Float, nullable=False)
@@ -54,6 +111,58 @@ class MovingAverage(Base):
     currency_data = relationship('CurrencyData', back_populates='moving_averages')
 
 
+class CandleIndicators(Base):
+    """
+    Represents all indicator values of one candle in a single row.
+
+    Attributes:
+        instrument_id (int): Foreign key to the instrument (e.g., EUR/USD).
+        granularity_id (int): Foreign key to the candle granularity (e.g., D).
+        timestamp (datetime): The timestamp of the candle.
+        values (dict): Indicator values keyed by name (e.g., sma_5, rsi_14), stored as JSONB on PostgreSQL.
+
+    Unlike MovingAverage, which stores one row per candle and window, new indicators need no schema
+    change and reading a candle's indicators needs no join on a surrogate id.
+    """
+    __tablename__ = 'candle_indicators'
+
+    instrument_id = Column(SmallInteger, ForeignKey('instrument.id'), primary_key=True)
+    granularity_id = Column(SmallInteger, ForeignKey('granularity.id'), primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    values = Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+
+
+class CandleRollup(Base):
+    """
+    Represents a higher-timeframe candle derived from finer candles (e.g., H4 from H1).
+
+    Attributes:
+        instrument_id (int): Foreign key to the instrument (e.g., EUR/USD).
+        granularity_id (int): Foreign key to the granularity of the bucket (e.g., H4, D or W).
+        timestamp (datetime): The start of the bucket.
+        open (float): The opening price of the first candle in the bucket.
+        high (float): The highest price in the bucket.
+        low (float): The lowest price in the bucket.
+        close (float): The closing price of the last candle in the bucket.
+        volume (float): The summed volume of the bucket.
+        candle_count (int): The number of ingested candles in the bucket, lower for a bucket still forming.
+
+    Rollups are kept apart from currency_data, so they never collide with candles fetched from
+    OANDA at the same granularity, which are aligned differently.
+    """
+    __tablename__ = 'candle_rollup'
+
+    instrument_id = Column(SmallInteger, ForeignKey('instrument.id'), primary_key=True)
+    granularity_id = Column(SmallInteger, ForeignKey('granularity.id'), primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
+    candle_count = Column(Integer, nullable=False)
+
+
 class Prediction(Base):
     """
     Represents a prediction.
@@ -66,9 +175,14 @@ class Prediction(Base):
         predicted_close (float): The predicted closing price.
     """
     __tablename__ = 'prediction'
+    __table_args__ = (
+        # Not created when currency_data is partitioned, as id alone is not unique there
+        ForeignKeyConstraint(['currency_data_id'], ['currency_data.id']).ddl_if(callable_=skip_if_partitioned),
+        Index('ix_prediction_currency_data_id_model_name', 'currency_data_id', 'model_name'),
+    )
 
     id = Column(Integer, primary_key=True)
-    currency_data_id = Column(Integer, ForeignKey('currency_data.id'), nullable=False)
+    currency_data_id = Column(Integer, nullable=False)
     timestamp = Column(DateTime, nullable=False)
     model_name = Column(String, nullable=False)
     predicted_close = Column(Float, nullable=False)
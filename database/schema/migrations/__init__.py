@@ -0,0 +1,9 @@
+"""
+Versioned, online-safe schema migrations.
+
+See runner for applying migrations and operations for the schema operations they use.
+"""
+
+from database.schema.migrations.runner import (
+    upgrade, downgrade, current_version, applied_versions, load_migrations, IrreversibleMigrationError)
+from database.schema.migrations.operations import Operations
@@ -0,0 +1,377 @@
+"""
+This module provides the online-safe schema operations used by the versioned migrations.
+
+Every operation runs in its own short transaction with a lock timeout, so a migration never
+holds a lock on a busy table for longer than one statement and gives up quickly instead of
+queueing behind long-running queries. Operations that hit the lock timeout are retried with a
+backoff. All operations are idempotent, so a migration that failed halfway can simply be rerun.
+
+On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, which does not block writes.
+Column type changes follow the expand/contract pattern: add the new column, backfill it in
+throttled batches, then rename and drop, instead of a table-rewriting ALTER COLUMN TYPE.
+NOT NULL and foreign key constraints on existing tables are added as NOT VALID first and
+validated afterwards, which scans the table without blocking writes.
+"""
+
+import logging
+import time
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+# Longest wait for a table lock before a statement gives up (milliseconds)
+DEFAULT_LOCK_TIMEOUT_MS = 5000
+DEFAULT_LOCK_RETRIES = 5  # Attempts after a lock timeout before the migration fails
+DEFAULT_RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled on each further one
+
+DEFAULT_BACKFILL_BATCH_SIZE = 5000  # Key range updated per backfill transaction
+# Share of wall time a backfill spends running statements; it sleeps for the rest
+DEFAULT_BACKFILL_DUTY_CYCLE = 0.5
+
+LOCK_TIMEOUT_SQLSTATE = '55P03'  # PostgreSQL lock_not_available
+
+# Children of a partitioned table, including nested partitioned tables (relkind 'p')
+CHILD_TABLES_SQL = """
+    SELECT c.relname, c.relkind
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass(:table)
+    ORDER BY c.relname
+"""
+
+
+def is_lock_timeout(error):
+    """Return whether an OperationalError was caused by a lock timeout or a locked SQLite database."""
+    original = getattr(error, 'orig', None)
+    return getattr(original, 'pgcode', None) == LOCK_TIMEOUT_SQLSTATE or 'database is locked' in str(original)
+
+
+class Operations:
+    """
+    Schema operations of one migration run, bound to an engine.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of the database to migrate.
+        lock_timeout_ms (int): Lock timeout of every statement on PostgreSQL.
+        retries (int): Retries of a statement after a lock timeout.
+        backoff (float): Seconds before the first retry.
+        sleep (callable): Sleep function, replaceable in tests.
+    """
+
+    def __init__(self, engine, lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS, retries=DEFAULT_LOCK_RETRIES,
+                 backoff=DEFAULT_RETRY_BACKOFF, sleep=time.sleep):
+        self.engine = engine
+        self.lock_timeout_ms = lock_timeout_ms
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+
+    @property
+    def postgresql(self):
+        return self.engine.dialect.name == 'postgresql'
+
+    def _with_retries(self, function):
+        """Call function, retrying it with exponential backoff while it fails on lock timeouts."""
+        for attempt in range(self.retries + 1):
+            try:
+                return function()
+            except OperationalError as e:
+                if not is_lock_timeout(e) or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning(f"Lock timeout, retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+                self.sleep(delay)
+
+    def _transaction(self, function):
+        """Run function(connection) in a transaction with the lock timeout set, retrying on lock timeouts."""
+        def attempt():
+            with self.engine.begin() as connection:
+                if self.postgresql:
+                    connection.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+                return function(connection)
+        return self._with_retries(attempt)
+
+    def _autocommit(self, statements):
+        """Run statements outside a transaction, as CREATE INDEX CONCURRENTLY requires, with the lock timeout set."""
+        def attempt():
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text(f"SET lock_timeout = {int(self.lock_timeout_ms)}"))
+                try:
+                    for statement in statements:
+                        connection.execute(text(statement))
+                finally:
+                    connection.execute(text("RESET lock_timeout"))
+        self._with_retries(attempt)
+
+    def execute(self, statement, params=None):
+        """
+        Execute one SQL statement in its own transaction.
+
+        Args:
+            statement (str): SQL statement.
+            params (dict): Bound parameters.
+
+        Returns:
+            int: Number of rows affected.
+        """
+        return self._transaction(lambda connection: connection.execute(text(statement), params or {}).rowcount)
+
+    def query(self, statement, params=None):
+        """
+        Run one SQL query in its own transaction.
+
+        Args:
+            statement (str): SQL query.
+            params (dict): Bound parameters.
+
+        Returns:
+            list: Result rows.
+        """
+        return self._transaction(lambda connection: connection.execute(text(statement), params or {}).all())
+
+    def has_table(self, table):
+        return self._transaction(lambda connection: inspect(connection).has_table(table))
+
+    def _columns(self, table):
+        # Reflecting columns waits for locks on the table, so it runs under the lock timeout too
+        return {c['name']: c for c in self._transaction(lambda connection: inspect(connection).get_columns(table))}
+
+    def has_column(self, table, column):
+        return column in self._columns(table)
+
+    def _has_constraint(self, table, name):
+        with self.engine.connect() as connection:
+            return connection.execute(text(
+                "SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table)"),
+                {'name': name, 'table': table}).scalar() is not None
+
+    def index_state(self, name):
+        """Return None when an index does not exist, otherwise whether it is valid (always True on SQLite)."""
+        with self.engine.connect() as connection:
+            if self.postgresql:
+                return connection.execute(text(
+                    "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.oid = to_regclass(:name)"), {'name': name}).scalar()
+            found = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"), {'name': name}).scalar()
+            return True if found else None
+
+    def _is_partitioned(self, table):
+        with self.engine.connect() as connection:
+            return connection.execute(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+                                      {'table': table}).scalar() is not None
+
+    def create_tables(self, metadata, tables=None):
+        """Create the tables of a MetaData that do not exist yet."""
+        self._transaction(lambda connection: metadata.create_all(connection, tables=tables, checkfirst=True))
+
+    def create_index(self, name, table, columns, unique=False):
+        """
+        Create an index unless it exists, without blocking writes on PostgreSQL.
+
+        A concurrent build that failed leaves an invalid index behind; it is dropped and rebuilt.
+        Partitioned tables do not support CONCURRENTLY, so the index is created on the parent
+        only and built concurrently on each partition before being attached.
+
+        Args:
+            name (str): Index name.
+            table (str): Table name.
+            columns (list): Indexed columns.
+            unique (bool): Create a unique index.
+        """
+        state = self.index_state(name)
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        if not self.postgresql:
+            if state is None:
+                self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+                logging.info(f"Created index {name} on {table}")
+            return
+        if state:
+            return
+        if self._is_partitioned(table):
+            self._create_partitioned_index(name, table, columns, kind)
+        else:
+            if state is False:
+                logging.warning(f"Rebuilding invalid index {name}")
+                self._autocommit([f"DROP INDEX CONCURRENTLY IF EXISTS {name}"])
+            self._autocommit([f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"])
+        logging.info(f"Created index {name} on {table}")
+
+    def _create_partitioned_index(self, name, table, columns, kind):
+        """Create an index on a partitioned table one partition at a time."""
+        self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON ONLY {table} ({', '.join(columns)})")
+        with self.engine.connect() as connection:
+            children = connection.execute(text(CHILD_TABLES_SQL), {'table': table}).all()
+        for child, relkind in children:
+            # Same naming as PostgreSQL uses for indexes it creates on partitions; capped at the identifier limit
+            child_index = f"{child}_{'_'.join(columns)}_{'key' if kind.startswith('UNIQUE') else 'idx'}"[:63]
+            if relkind == 'p':
+                self._create_partitioned_index(child_index, child, columns, kind)
+            elif self.index_state(child_index) is not True:
+                self._autocommit([f"DROP INDEX CONCURRENTLY IF EXISTS {child_index}",
+                                  f"CREATE {kind} CONCURRENTLY {child_index} ON {child} ({', '.join(columns)})"])
+            # Attaching an index that is already attached to this parent does nothing
+            self.execute(f"ALTER INDEX {name} ATTACH PARTITION {child_index}")
+
+    def drop_index(self, name, table):
+        """
+        Drop an index, or the unique constraint of the same name on PostgreSQL, if it exists.
+
+        Args:
+            name (str): Index or constraint name.
+            table (str): Table the index belongs to.
+        """
+        if self.index_state(name) is None:
+            return
+        if self.postgresql:
+            if self._has_constraint(table, name):
+                self.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+            elif self._is_partitioned(table):
+                self.execute(f"DROP INDEX IF EXISTS {name}")
+            else:
+                self._autocommit([f"DROP INDEX CONCURRENTLY IF EXISTS {name}"])
+        else:
+            self.execute(f"DROP INDEX IF EXISTS {name}")
+        logging.info(f"Dropped index {name}")
+
+    def add_column(self, table, name, type_, nullable=True, default=None):
+        """
+        Add a column unless it exists.
+
+        A constant default keeps the change a catalog-only update on PostgreSQL 11+, without
+        rewriting the table.
+
+        Args:
+            table (str): Table name.
+            name (str): Column name.
+            type_ (TypeEngine): SQLAlchemy column type, e.g. Float().
+            nullable (bool): Allow NULL values; a NOT NULL column needs a default on existing tables.
+            default (str): SQL expression of the default value.
+        """
+        if self.has_column(table, name):
+            return
+        definition = f"{name} {type_.compile(dialect=self.engine.dialect)}"
+        if default is not None:
+            definition += f" DEFAULT {default}"
+        if not nullable:
+            definition += " NOT NULL"
+        self.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+        logging.info(f"Added column {table}.{name}")
+
+    def set_not_null(self, table, column):
+        """
+        Make a column NOT NULL unless it is already, without blocking writes while existing rows are checked.
+
+        On PostgreSQL a NOT VALID check constraint is added and validated, which lets SET NOT NULL
+        skip its own full-table scan under an exclusive lock. SQLite cannot alter columns, so the
+        column is left nullable there.
+
+        Args:
+            table (str): Table name.
+            column (str): Column name.
+        """
+        if not self._columns(table)[column]['nullable']:
+            return
+        if not self.postgresql:
+            logging.info(f"SQLite cannot alter {table}.{column}; leaving it nullable")
+            return
+        if self._is_partitioned(table):
+            # Partitioned tables do not take NOT VALID constraints, so each partition is checked under the lock
+            self.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+        else:
+            check = f"{table}_{column}_not_null"[:63]
+            if not self._has_constraint(table, check):
+                self.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID")
+            self.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+            self.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+            self.execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
+        logging.info(f"Set {table}.{column} NOT NULL")
+
+    def add_foreign_key(self, name, table, columns, referred_table, referred_columns):
+        """
+        Add a foreign key unless it exists, validating existing rows without blocking writes.
+
+        SQLite cannot add constraints to existing tables, so nothing is done there.
+
+        Args:
+            name (str): Constraint name.
+            table (str): Referencing table.
+            columns (list): Referencing columns.
+            referred_table (str): Referenced table.
+            referred_columns (list): Referenced columns.
+        """
+        if not self.postgresql:
+            logging.info(f"SQLite cannot add foreign key {name} to an existing table; skipping it")
+            return
+        if self._has_constraint(table, name):
+            return
+        definition = (f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+                      f"REFERENCES {referred_table} ({', '.join(referred_columns)})")
+        if self._is_partitioned(table):
+            # NOT VALID is not supported for foreign keys on partitioned tables
+            self.execute(definition)
+        else:
+            self.execute(f"{definition} NOT VALID")
+            self.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+        logging.info(f"Added foreign key {name} on {table}")
+
+    def drop_column(self, table, name):
+        """Drop a column if it exists."""
+        if self.has_column(table, name):
+            self.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
+            logging.info(f"Dropped column {table}.{name}")
+
+    def rename_table(self, old, new):
+        """Rename a table unless it was renamed already."""
+        if self.has_table(old) and not self.has_table(new):
+            self.execute(f"ALTER TABLE {old} RENAME TO {new}")
+            logging.info(f"Renamed table {old} to {new}")
+
+    def drop_table(self, table):
+        """Drop a table if it exists."""
+        if self.has_table(table):
+            self.execute(f"DROP TABLE {table}")
+            logging.info(f"Dropped table {table}")
+
+    def rename_column(self, table, old, new):
+        """Rename a column unless it was renamed already."""
+        if self.has_column(table, old) and not self.has_column(table, new):
+            self.execute(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}")
+            logging.info(f"Renamed column {table}.{old} to {new}")
+
+    def backfill(self, table, assignments, where=None, key='id', batch_size=DEFAULT_BACKFILL_BATCH_SIZE,
+                 duty_cycle=DEFAULT_BACKFILL_DUTY_CYCLE):
+        """
+        Update existing rows in batches of key ranges, pausing between batches.
+
+        Each batch is its own transaction touching at most batch_size keys, so row locks are
+        held briefly and replication and vacuum keep up. After each batch the backfill sleeps in
+        proportion to how long the batch took, keeping its share of database time at duty_cycle
+        however loaded the server is.
+
+        Args:
+            table (str): Table name.
+            assignments (str): SQL SET clause, e.g. "close_cents = round(close * 100)".
+            where (str): Optional SQL condition selecting the rows still to update, which makes
+                an interrupted backfill cheap to resume.
+            key (str): Integer key column the batches are ranges of.
+            batch_size (int): Keys per batch.
+            duty_cycle (float): Share of time spent updating, between 0 (exclusive) and 1.
+
+        Returns:
+            int: Number of rows updated.
+        """
+        low, high = self._transaction(
+            lambda connection: connection.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one())
+        if low is None:
+            return 0
+        condition = f" AND ({where})" if where else ''
+        statement = f"UPDATE {table} SET {assignments} WHERE {key} >= :start AND {key} < :stop{condition}"
+        updated = 0
+        for start in range(low, high + 1, batch_size):
+            started = time.monotonic()
+            updated += self.execute(statement, {'start': start, 'stop': start + batch_size})
+            elapsed = time.monotonic() - started
+            if duty_cycle < 1 and start + batch_size <= high:
+                self.sleep(elapsed * (1 - duty_cycle) / duty_cycle)
+        logging.info(f"Backfilled {updated} rows of {table}")
+        return updated
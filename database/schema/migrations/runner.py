@@ -0,0 +1,155 @@
+"""
+This module applies and reverts the versioned schema migrations.
+
+Migrations live in database/schema/migrations/versions, one module per version with VERSION,
+DESCRIPTION, upgrade(op) and downgrade(op). Applied versions are recorded in the
+schema_migrations table:
+
+    python -m database.schema.migrations.runner status
+    python -m database.schema.migrations.runner upgrade
+    python -m database.schema.migrations.runner downgrade --to 2
+"""
+
+import argparse
+import importlib
+import logging
+import pkgutil
+from datetime import datetime, timezone
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, insert, delete
+from database.schema.migrations import versions
+from database.schema.migrations.operations import Operations
+
+# Kept out of Base so the models' create_all does not manage it
+migration_metadata = MetaData()
+migration_history = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String, nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+class IrreversibleMigrationError(Exception):
+    """Raised by the downgrade of a migration that cannot be reverted."""
+
+
+def load_migrations(package=versions):
+    """
+    Import the migration modules of a package.
+
+    Args:
+        package (module): Package holding one module per migration.
+
+    Returns:
+        list: Migration modules sorted by VERSION.
+
+    Raises:
+        ValueError: If two migrations share a version.
+    """
+    migrations = [importlib.import_module(f"{package.__name__}.{info.name}")
+                  for info in pkgutil.iter_modules(package.__path__)]
+    migrations.sort(key=lambda migration: migration.VERSION)
+    seen = [migration.VERSION for migration in migrations]
+    if len(seen) != len(set(seen)):
+        raise ValueError(f"Duplicate migration versions in {package.__name__}: {seen}")
+    return migrations
+
+
+def applied_versions(engine):
+    """Return the set of versions recorded in schema_migrations, creating the table if needed."""
+    migration_metadata.create_all(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(migration_history.c.version)).scalars())
+
+
+def current_version(engine):
+    """Return the highest applied version, or 0 for a database without migrations."""
+    return max(applied_versions(engine), default=0)
+
+
+def upgrade(engine, target=None, migrations=None, **options):
+    """
+    Apply the pending migrations up to a version.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of the database to migrate.
+        target (int): Last version to apply; defaults to the newest.
+        migrations (list): Migration modules; defaults to load_migrations().
+        **options: Keyword arguments for Operations, e.g. lock_timeout_ms.
+
+    Returns:
+        list: Versions applied.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    applied = applied_versions(engine)
+    op = Operations(engine, **options)
+    done = []
+    for migration in migrations:
+        if migration.VERSION in applied or (target is not None and migration.VERSION > target):
+            continue
+        logging.info(f"Applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+        migration.upgrade(op)
+        # Recorded only once every operation succeeded; the operations are idempotent, so a
+        # migration interrupted before this point is simply run again
+        with engine.begin() as connection:
+            connection.execute(insert(migration_history).values(
+                version=migration.VERSION, description=migration.DESCRIPTION,
+                applied_at=datetime.now(timezone.utc).replace(tzinfo=None)))
+        done.append(migration.VERSION)
+    return done
+
+
+def downgrade(engine, target, migrations=None, **options):
+    """
+    Revert the applied migrations newer than a version, newest first.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of the database to migrate.
+        target (int): Version to return to; 0 reverts every migration.
+        migrations (list): Migration modules; defaults to load_migrations().
+        **options: Keyword arguments for Operations.
+
+    Returns:
+        list: Versions reverted.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    applied = applied_versions(engine)
+    op = Operations(engine, **options)
+    done = []
+    for migration in reversed(migrations):
+        if migration.VERSION not in applied or migration.VERSION <= target:
+            continue
+        logging.info(f"Reverting migration {migration.VERSION}: {migration.DESCRIPTION}")
+        migration.downgrade(op)
+        with engine.begin() as connection:
+            connection.execute(delete(migration_history).where(migration_history.c.version == migration.VERSION))
+        done.append(migration.VERSION)
+    return done
+
+
+def main():
+    from database.db_connect import get_engine
+
+    parser = argparse.ArgumentParser(description="Apply or revert versioned schema migrations.")
+    parser.add_argument('command', choices=['status', 'upgrade', 'downgrade'])
+    parser.add_argument('--to', type=int, help="Target version (required for downgrade)")
+    parser.add_argument('--lock-timeout-ms', type=int, help="Lock timeout of each statement")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    options = {} if args.lock_timeout_ms is None else {'lock_timeout_ms': args.lock_timeout_ms}
+    if args.command == 'status':
+        applied = applied_versions(engine)
+        for migration in load_migrations():
+            print(f"{migration.VERSION:>4} {'applied' if migration.VERSION in applied else 'pending':<8} "
+                  f"{migration.DESCRIPTION}")
+    elif args.command == 'upgrade':
+        upgrade(engine, args.to, **options)
+    else:
+        if args.to is None:
+            parser.error("downgrade requires --to")
+        downgrade(engine, args.to, **options)
+
+
+if __name__ == "__main__":
+    main()
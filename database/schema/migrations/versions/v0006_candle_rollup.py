@@ -0,0 +1,17 @@
+"""
+Create candle_rollup, holding the H4, D and W candles derived from H1 candles.
+"""
+
+from database.db_connect import Base
+
+VERSION = 6
+DESCRIPTION = "Create candle_rollup"
+
+
+def upgrade(op):
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+    op.create_tables(Base.metadata, tables=[Base.metadata.tables['candle_rollup']])
+
+
+def downgrade(op):
+    op.drop_table('candle_rollup')
@@ -0,0 +1,186 @@
+"""
+This module resolves instrument and granularity names to the small integer keys stored in currency_data.
+
+Candles reference the instrument and granularity dimension tables instead of repeating a
+free-form pair string in every row and index entry. Granularities have fixed ids; instruments
+are registered on first use. Resolved ids are cached per engine, so loaders pay for the
+lookup once per process rather than once per batch.
+"""
+
+import threading
+import weakref
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from database.schema.create_tables import Instrument, Granularity
+
+# OANDA granularity codes mapped to (fixed id, candle length in seconds); the ids are stored in
+# currency_data, so existing entries must never be renumbered. Monthly candles are sized to the
+# longest month
+GRANULARITIES = {
+    'S5': (1, 5), 'S10': (2, 10), 'S15': (3, 15), 'S30': (4, 30),
+    'M1': (5, 60), 'M2': (6, 120), 'M4': (7, 240), 'M5': (8, 300), 'M10': (9, 600), 'M15': (10, 900),
+    'M30': (11, 1800),
+    'H1': (12, 3600), 'H2': (13, 7200), 'H3': (14, 10800), 'H4': (15, 14400), 'H6': (16, 21600),
+    'H8': (17, 28800), 'H12': (18, 43200),
+    'D': (19, 86400), 'W': (20, 604800), 'M': (21, 2678400),
+}
+DEFAULT_GRANULARITY = 'D'  # Granularity of the daily fetch and of candles stored before granularities existed
+
+# Pip size of pairs quoted in yen; every other pair uses DEFAULT_PIP_SIZE
+JPY_PIP_SIZE = 0.01
+DEFAULT_PIP_SIZE = 0.0001
+
+# Names used to build instrument display names, e.g. "Euro / US Dollar"
+CURRENCY_NAMES = {
+    'AUD': 'Australian Dollar', 'CAD': 'Canadian Dollar', 'CHF': 'Swiss Franc', 'EUR': 'Euro',
+    'GBP': 'British Pound', 'JPY': 'Japanese Yen', 'NZD': 'New Zealand Dollar', 'USD': 'US Dollar',
+}
+
+# Instrument ids per engine, keyed by normalised name; entries go away with their engine
+_instrument_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def normalise_instrument(name):
+    """Return the stored spelling of an instrument, e.g. 'EUR/USD' for 'EUR_USD' or 'eur/usd'."""
+    return name.strip().upper().replace('_', '/')
+
+
+def default_pip_size(name):
+    """Return the pip size of an instrument: 0.01 for pairs quoted in yen, 0.0001 otherwise."""
+    return JPY_PIP_SIZE if normalise_instrument(name).endswith('/JPY') else DEFAULT_PIP_SIZE
+
+
+def default_display_name(name):
+    """Return a readable name such as 'Euro / US Dollar', or the instrument name for unknown currencies."""
+    name = normalise_instrument(name)
+    currencies = name.split('/')
+    if len(currencies) == 2 and all(currency in CURRENCY_NAMES for currency in currencies):
+        return ' / '.join(CURRENCY_NAMES[currency] for currency in currencies)
+    return name
+
+
+def granularity_id(name):
+    """
+    Return the fixed id of an OANDA granularity code.
+
+    Args:
+        name (str): Granularity code, e.g. 'H1' or 'D'.
+
+    Returns:
+        int: The id stored in currency_data.granularity_id.
+
+    Raises:
+        ValueError: If the code is unknown.
+    """
+    try:
+        return GRANULARITIES[name][0]
+    except KeyError:
+        raise ValueError(f"Unknown granularity {name!r}; expected one of {', '.join(GRANULARITIES)}") from None
+
+
+def granularity_rows():
+    """Return the rows of the granularity table."""
+    return [{'id': id_, 'name': name, 'seconds': seconds} for name, (id_, seconds) in GRANULARITIES.items()]
+
+
+def _insert_ignoring_conflicts(dialect_name, table):
+    """Return an INSERT that leaves existing rows alone, for the dialects supporting ON CONFLICT."""
+    if dialect_name == 'postgresql':
+        return pg_insert(table).on_conflict_do_nothing()
+    if dialect_name == 'sqlite':
+        # Imported here because the Lambda bundle leaves out the SQLite dialect
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def seed_granularities(connection):
+    """
+    Insert the granularities missing from the granularity table.
+
+    Args:
+        connection (Connection): SQLAlchemy connection.
+    """
+    existing = set(connection.execute(select(Granularity.id)).scalars())
+    rows = [row for row in granularity_rows() if row['id'] not in existing]
+    if rows:
+        connection.execute(_insert_ignoring_conflicts(connection.dialect.name, Granularity.__table__), rows)
+
+
+def _engine_of(bind):
+    """Return the engine behind a session, connection or engine."""
+    return bind.get_bind() if isinstance(bind, Session) else bind.engine
+
+
+def get_instrument_id(bind, name):
+    """
+    Return the id of an instrument, registering it with default pip size and display name if needed.
+
+    The lookup and registration run in their own short transaction on the engine behind bind, so
+    a new instrument is committed before any candle referencing it, and loads running in parallel
+    never wait on each other's uncommitted instruments.
+
+    Args:
+        bind: SQLAlchemy engine, connection or session.
+        name (str): Instrument name in any spelling, e.g. 'EUR_USD' or 'EUR/USD'.
+
+    Returns:
+        int: The instrument id.
+    """
+    name = normalise_instrument(name)
+    engine = _engine_of(bind)
+    with _cache_lock:
+        cached = _instrument_cache.get(engine, {}).get(name)
+    if cached is not None:
+        return cached
+
+    lookup = select(Instrument.id).where(Instrument.name == name)
+    with engine.begin() as connection:
+        instrument_id = connection.execute(lookup).scalar()
+        if instrument_id is None:
+            connection.execute(_insert_ignoring_conflicts(engine.dialect.name, Instrument.__table__).values(
+                name=name, display_name=default_display_name(name), pip_size=default_pip_size(name)))
+            instrument_id = connection.execute(lookup).scalar()
+    with _cache_lock:
+        _instrument_cache.setdefault(engine, {})[name] = instrument_id
+    return instrument_id
+
+
+def find_instrument_id(bind, name):
+    """
+    Return the id of a registered instrument without registering it, for read paths.
+
+    Args:
+        bind: SQLAlchemy engine, connection or session.
+        name (str): Instrument name in any spelling, e.g. 'EUR_USD' or 'EUR/USD'.
+
+    Returns:
+        int: The instrument id, or None if the instrument is unknown.
+    """
+    name = normalise_instrument(name)
+    engine = _engine_of(bind)
+    with _cache_lock:
+        cached = _instrument_cache.get(engine, {}).get(name)
+    if cached is not None:
+        return cached
+
+    with engine.connect() as connection:
+        instrument_id = connection.execute(select(Instrument.id).where(Instrument.name == name)).scalar()
+    if instrument_id is not None:
+        # Only known instruments are cached, so one registered later is found on the next read
+        with _cache_lock:
+            _instrument_cache.setdefault(engine, {})[name] = instrument_id
+    return instrument_id
+
+
+def get_instrument_ids(bind, names):
+    """Return a dict mapping each given instrument name, as passed, to its id."""
+    return {name: get_instrument_id(bind, name) for name in names}
+
+
+def clear_dimension_cache():
+    """Forget every cached instrument id, e.g. after instruments were renumbered or in tests."""
+    with _cache_lock:
+        _instrument_cache.clear()
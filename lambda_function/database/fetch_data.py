@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from utils.env_loader import load_environment
 import logging
@@ -11,6 +12,25 @@ logging.basicConfig(level=logging.INFO)
 
 # Constant - Daily value of currency_pair
 GRANULARITY = "D"
+REQUEST_TIMEOUT = 30  # Seconds to wait for OANDA before giving up on a request
+
+# Keep-alive session shared by all calls (and by warm invocations of the same container)
+_http_session = None
+
+
+def get_http_session():
+    """
+    Return the shared HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: Session with a keep-alive connection pool.
+    """
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        _http_session = session
+    return _http_session
 
 
 def fetch_ohlc_data(instrument, count=100):
@@ -36,7 +56,7 @@ def fetch_ohlc_data(instrument, count=100):
         "count": count,
         "granularity": GRANULARITY
     }
-    response = requests.get(OANDA_API_URL, headers=headers, params=params)
+    response = get_http_session().get(OANDA_API_URL, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
     response.raise_for_status()  # Raise an error for bad status codes
     return response.json()["candles"]
 
@@ -1,16 +1,25 @@
 import logging
-from database.db_connect import get_engine, Base
+from database.db_connect import get_engine
 from database.schema.create_tables import CurrencyData, MovingAverage, Prediction  # Import the models
+from database.schema.migrations import upgrade
+from database.schema.partitions import partitioning_enabled, create_partitioned_table, ensure_upcoming_partitions
 
 def migrate_database():
     """
     Migrate the database schema.
 
     This function initializes the database schema based on the defined models
-    by creating the necessary tables.
+    by applying the pending versioned migrations in database/schema/migrations.
+    With DB_PARTITION_CURRENCY_DATA=true on PostgreSQL, currency_data is created
+    partitioned by month and the upcoming partitions are added.
     """
     engine = get_engine()
-    Base.metadata.create_all(engine)
+    partitioned = partitioning_enabled() and engine.dialect.name == 'postgresql'
+    if partitioned:
+        create_partitioned_table(engine)
+    upgrade(engine)
+    if partitioned:
+        ensure_upcoming_partitions(engine)
     logging.info("Database schema created successfully")
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""
+Migration modules, applied in order of their VERSION.
+
+Each module defines VERSION (int), DESCRIPTION (str), upgrade(op) and downgrade(op), where op is
+an Operations instance. Operations must be idempotent, and index and column names are spelled
+out instead of read from the models, so a migration keeps doing the same thing as the models change.
+"""
@@ -0,0 +1,21 @@
+"""
+Create the model tables that do not exist yet.
+"""
+
+from database.db_connect import Base
+from database.schema.migrations.runner import IrreversibleMigrationError
+
+VERSION = 1
+DESCRIPTION = "Create currency_data, moving_average, candle_indicators and prediction"
+
+# The dimension tables come first, as currency_data references them
+TABLES = ('instrument', 'granularity', 'currency_data', 'moving_average', 'candle_indicators', 'prediction')
+
+
+def upgrade(op):
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+    op.create_tables(Base.metadata, tables=[Base.metadata.tables[name] for name in TABLES])
+
+
+def downgrade(op):
+    raise IrreversibleMigrationError("The baseline migration would drop every table and is not reverted")
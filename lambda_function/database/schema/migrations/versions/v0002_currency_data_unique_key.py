@@ -0,0 +1,20 @@
+"""
+Add the (currency_pair, timestamp) unique key to currency_data tables created before it existed.
+
+Tables created by the baseline already have it as the constraint of the same name. A unique
+index is accepted by PostgreSQL as an ON CONFLICT target just like the constraint. Tables created
+by the baseline once currency_pair was replaced by instrument_id (migration 5) are skipped.
+"""
+
+VERSION = 2
+DESCRIPTION = "Unique key on currency_data (currency_pair, timestamp)"
+
+
+def upgrade(op):
+    if op.has_column('currency_data', 'currency_pair'):
+        op.create_index('uq_currency_data_pair_timestamp', 'currency_data', ['currency_pair', 'timestamp'],
+                        unique=True)
+
+
+def downgrade(op):
+    op.drop_index('uq_currency_data_pair_timestamp', 'currency_data')
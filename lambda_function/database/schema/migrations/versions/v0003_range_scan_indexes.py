@@ -0,0 +1,22 @@
+"""
+Add the indexes serving the latest-candle lookup and the per-candle indicator and prediction lookups.
+"""
+
+VERSION = 3
+DESCRIPTION = "Indexes on currency_data (timestamp), moving_average and prediction"
+
+INDEXES = (
+    ('ix_currency_data_timestamp', 'currency_data', ['timestamp']),
+    ('ix_moving_average_currency_data_id_window_size', 'moving_average', ['currency_data_id', 'window_size']),
+    ('ix_prediction_currency_data_id_model_name', 'prediction', ['currency_data_id', 'model_name']),
+)
+
+
+def upgrade(op):
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade(op):
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table)
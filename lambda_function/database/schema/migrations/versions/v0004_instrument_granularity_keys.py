@@ -0,0 +1,78 @@
+"""
+Expand currency_data with small integer keys to the instrument and granularity dimension tables.
+
+Every stored currency_pair spelling (EUR/USD, EUR_USD) is registered as one instrument, the new
+instrument_id column is backfilled in batches and the (instrument_id, granularity_id, timestamp)
+unique key is built next to the old one. Candles stored so far are daily. The currency_pair
+column stays until migration 5, so code reading it keeps working while this one runs.
+"""
+
+from sqlalchemy import SmallInteger
+from database.db_connect import Base
+from database.dimensions import (GRANULARITIES, DEFAULT_GRANULARITY, normalise_instrument, default_display_name,
+                                 default_pip_size, granularity_id)
+from database.schema.migrations.runner import IrreversibleMigrationError
+
+VERSION = 4
+DESCRIPTION = "Instrument and granularity tables referenced from currency_data"
+
+UNIQUE_KEY = 'uq_currency_data_instrument_granularity_timestamp'
+# Matches normalise_instrument for the spellings stored so far
+NORMALISED_PAIR_SQL = "upper(replace(trim({column}), '_', '/'))"
+
+# Partitioned layout of migrate_database before this migration: months sub-partitioned by currency_pair.
+# Its unique keys must include currency_pair, so the new key cannot be built on it
+LEGACY_PARTITION_KEY_SQL = """
+    SELECT 1 FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = ANY(p.partattrs::int2[])
+    WHERE a.attname = 'currency_pair'
+      AND (p.partrelid = to_regclass('currency_data')
+           OR p.partrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass('currency_data')))
+    LIMIT 1
+"""
+
+
+def upgrade(op):
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+    op.create_tables(Base.metadata, tables=[Base.metadata.tables['instrument'], Base.metadata.tables['granularity']])
+    for name, (id_, seconds) in GRANULARITIES.items():
+        op.execute("INSERT INTO granularity (id, name, seconds) SELECT :id, :name, :seconds "
+                   "WHERE NOT EXISTS (SELECT 1 FROM granularity WHERE id = :id)",
+                   {'id': id_, 'name': name, 'seconds': seconds})
+    if not op.has_column('currency_data', 'currency_pair'):
+        return  # Created by the baseline with the keys already in place
+
+    if op.postgresql and op.query(LEGACY_PARTITION_KEY_SQL):
+        raise RuntimeError("currency_data is partitioned by currency_pair; recreate it with "
+                           "create_partitioned_table and copy the candles over before migrating")
+
+    pairs = {row[0] for row in op.query("SELECT DISTINCT currency_pair FROM currency_data")}
+    if op.has_column('candle_indicators', 'currency_pair'):
+        pairs |= {row[0] for row in op.query("SELECT DISTINCT currency_pair FROM candle_indicators")}
+    for name in sorted({normalise_instrument(pair) for pair in pairs}):
+        op.execute("INSERT INTO instrument (name, display_name, pip_size) SELECT :name, :display_name, :pip_size "
+                   "WHERE NOT EXISTS (SELECT 1 FROM instrument WHERE name = :name)",
+                   {'name': name, 'display_name': default_display_name(name), 'pip_size': default_pip_size(name)})
+
+    op.add_column('currency_data', 'instrument_id', SmallInteger())
+    # A constant default fills existing rows without rewriting the table
+    op.add_column('currency_data', 'granularity_id', SmallInteger(), nullable=False,
+                  default=str(granularity_id(DEFAULT_GRANULARITY)))
+    op.backfill('currency_data',
+                "instrument_id = (SELECT instrument.id FROM instrument "
+                f"WHERE instrument.name = {NORMALISED_PAIR_SQL.format(column='currency_data.currency_pair')})",
+                where="instrument_id IS NULL")
+    op.set_not_null('currency_data', 'instrument_id')
+    op.add_foreign_key('currency_data_instrument_id_fkey', 'currency_data', ['instrument_id'], 'instrument', ['id'])
+    op.add_foreign_key('currency_data_granularity_id_fkey', 'currency_data', ['granularity_id'], 'granularity', ['id'])
+    op.create_index(UNIQUE_KEY, 'currency_data', ['instrument_id', 'granularity_id', 'timestamp'], unique=True)
+
+
+def downgrade(op):
+    if not op.has_column('currency_data', 'currency_pair'):
+        raise IrreversibleMigrationError("currency_data has no currency_pair to return to; revert migration 5 first")
+    op.drop_index(UNIQUE_KEY, 'currency_data')
+    op.drop_column('currency_data', 'granularity_id')
+    op.drop_column('currency_data', 'instrument_id')
+    op.drop_table('granularity')
+    op.drop_table('instrument')
@@ -0,0 +1,91 @@
+"""
+Contract: drop currency_pair from currency_data and key candle_indicators by instrument and granularity.
+
+Run once every reader and writer uses instrument_id and granularity_id. candle_indicators is
+rebuilt rather than altered, as its primary key changes: the old table is renamed, its rows are
+copied into the new one with a single INSERT ... SELECT and it is dropped afterwards.
+"""
+
+from sqlalchemy import MetaData, Table, Column, String, DateTime, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from database.db_connect import Base
+
+VERSION = 5
+DESCRIPTION = "Drop currency_data.currency_pair and rekey candle_indicators"
+
+LEGACY_INDICATORS = 'candle_indicators_legacy'
+D_GRANULARITY_ID = 19  # database.dimensions.GRANULARITIES['D']; every candle stored before migration 4 is daily
+NORMALISED_PAIR_SQL = "upper(replace(trim({column}), '_', '/'))"  # As in migration 4
+
+# Layout of candle_indicators before this migration, recreated by the downgrade
+legacy_metadata = MetaData()
+Table(
+    'candle_indicators', legacy_metadata,
+    Column('currency_pair', String, primary_key=True),
+    Column('timestamp', DateTime, primary_key=True),
+    Column('values', JSON().with_variant(JSONB(), 'postgresql'), nullable=False),
+)
+
+
+def _set_aside_candle_indicators(op):
+    """
+    Rename candle_indicators out of the way, including its primary key on PostgreSQL, whose name
+    the recreated table needs.
+    """
+    op.rename_table('candle_indicators', LEGACY_INDICATORS)
+    if op.postgresql and op.query("SELECT 1 FROM pg_constraint WHERE conname = 'candle_indicators_pkey' "
+                                  f"AND conrelid = to_regclass('{LEGACY_INDICATORS}')"):
+        op.execute(f"ALTER TABLE {LEGACY_INDICATORS} RENAME CONSTRAINT candle_indicators_pkey "
+                   f"TO {LEGACY_INDICATORS}_pkey")
+
+
+def upgrade(op):
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+    if op.has_column('currency_data', 'currency_pair'):
+        op.drop_index('uq_currency_data_pair_timestamp', 'currency_data')
+        op.drop_column('currency_data', 'currency_pair')
+
+    if op.has_table('candle_indicators') and op.has_column('candle_indicators', 'currency_pair'):
+        _set_aside_candle_indicators(op)
+    if op.has_table(LEGACY_INDICATORS):
+        op.create_tables(Base.metadata, tables=[Base.metadata.tables['candle_indicators']])
+        op.execute(f"""
+            INSERT INTO candle_indicators (instrument_id, granularity_id, timestamp, "values")
+            SELECT instrument.id, {D_GRANULARITY_ID}, legacy.timestamp, legacy."values"
+            FROM {LEGACY_INDICATORS} legacy
+            JOIN instrument ON instrument.name = {NORMALISED_PAIR_SQL.format(column='legacy.currency_pair')}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM candle_indicators existing
+                WHERE existing.instrument_id = instrument.id AND existing.granularity_id = {D_GRANULARITY_ID}
+                  AND existing.timestamp = legacy.timestamp
+            )
+        """)
+        op.drop_table(LEGACY_INDICATORS)
+
+
+def downgrade(op):
+    if not op.has_column('currency_data', 'currency_pair'):
+        op.add_column('currency_data', 'currency_pair', String())
+    op.backfill('currency_data',
+                "currency_pair = (SELECT instrument.name FROM instrument WHERE instrument.id = currency_data.instrument_id)",
+                where="currency_pair IS NULL")
+    op.set_not_null('currency_data', 'currency_pair')
+    op.create_index('uq_currency_data_pair_timestamp', 'currency_data', ['currency_pair', 'timestamp'], unique=True)
+
+    if op.has_table('candle_indicators') and op.has_column('candle_indicators', 'instrument_id'):
+        _set_aside_candle_indicators(op)
+    if op.has_table(LEGACY_INDICATORS):
+        # Only daily candles had indicators before this migration
+        op.create_tables(legacy_metadata)
+        op.execute(f"""
+            INSERT INTO candle_indicators (currency_pair, timestamp, "values")
+            SELECT instrument.name, legacy.timestamp, legacy."values"
+            FROM {LEGACY_INDICATORS} legacy
+            JOIN instrument ON instrument.id = legacy.instrument_id
+            WHERE legacy.granularity_id = {D_GRANULARITY_ID}
+              AND NOT EXISTS (
+                SELECT 1 FROM candle_indicators existing
+                WHERE existing.currency_pair = instrument.name AND existing.timestamp = legacy.timestamp
+            )
+        """)
+        op.drop_table(LEGACY_INDICATORS)
@@ -0,0 +1,342 @@
+"""
+This module manages the optional monthly range partitioning of currency_data on PostgreSQL.
+
+With DB_PARTITION_CURRENCY_DATA=true, migrate_database creates currency_data as a table
+partitioned by timestamp with one partition per month, optionally sub-partitioned by instrument
+(DB_PARTITION_PAIRS=EUR/USD,GBP/USD). Range queries only scan the months they touch, and
+old months can be detached or dropped instead of deleted row by row:
+
+    python -m database.schema.partitions list
+    python -m database.schema.partitions ensure --months-ahead 3
+    python -m database.schema.partitions detach --before 2020-01-01 --archive-schema archive
+
+A partitioned table can only enforce keys that include the partitioning columns, so the primary
+key becomes (id, instrument_id, timestamp) and the foreign keys from moving_average and prediction to
+currency_data.id are not created in this mode.
+"""
+
+import argparse
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateColumn
+from database.db_connect import Base, _env_flag
+
+PARTITIONED_TABLE = 'currency_data'
+DEFAULT_MONTHS_AHEAD = 3  # Months of empty partitions created ahead of the current one
+
+# Monthly partitions are named currency_data_pYYYY_MM; pair sub-partitions append the pair
+PARTITION_NAME_PATTERN = re.compile(rf'^{PARTITIONED_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+# Children of currency_data; no rows when the table is missing or not partitioned, and a single
+# NULL row when it is partitioned but has no partitions yet
+LIST_PARTITIONS_SQL = f"""
+    SELECT child.relname
+    FROM pg_partitioned_table pt
+    LEFT JOIN pg_inherits i ON i.inhparent = pt.partrelid
+    LEFT JOIN pg_class child ON child.oid = i.inhrelid
+    WHERE pt.partrelid = to_regclass('{PARTITIONED_TABLE}')
+"""
+
+
+def partitioning_enabled():
+    """Return whether currency_data should be created as a partitioned table (DB_PARTITION_CURRENCY_DATA)."""
+    return _env_flag('DB_PARTITION_CURRENCY_DATA')
+
+
+def partition_pairs():
+    """Return the currency pairs that get their own sub-partition in every month (DB_PARTITION_PAIRS)."""
+    return [pair.strip() for pair in os.getenv('DB_PARTITION_PAIRS', '').split(',') if pair.strip()]
+
+
+def months_ahead():
+    """Return how many months of partitions to create ahead of the current one (DB_PARTITION_MONTHS_AHEAD)."""
+    return int(os.getenv('DB_PARTITION_MONTHS_AHEAD', DEFAULT_MONTHS_AHEAD))
+
+
+def skip_if_partitioned(ddl, target, bind, dialect=None, **kw):
+    """
+    DDL condition leaving out foreign keys to currency_data.id when currency_data is partitioned.
+
+    Used with Constraint.ddl_if; id alone is not unique on a partitioned table, so PostgreSQL
+    rejects foreign keys referencing it.
+    """
+    return not (dialect is not None and dialect.name == 'postgresql' and partitioning_enabled())
+
+
+def month_start(value):
+    """Return midnight of the first day of the month containing value."""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Return the first day of the month count months after month."""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month, pair=None):
+    """
+    Return the name of a monthly partition or of one of its pair sub-partitions.
+
+    Args:
+        month (datetime): Any time within the month.
+        pair (str): Currency pair of the sub-partition; 'default' names the sub-partition for other pairs.
+
+    Returns:
+        str: e.g. currency_data_p2024_01 or currency_data_p2024_01_eur_usd.
+    """
+    name = f"{PARTITIONED_TABLE}_p{month.year:04d}_{month.month:02d}"
+    if pair is not None:
+        name += '_' + re.sub(r'[^a-z0-9]+', '_', pair.lower()).strip('_')
+    return name
+
+
+def parse_partition_month(name):
+    """Return the month of a monthly partition name, or None for other names such as the default partition."""
+    match = PARTITION_NAME_PATTERN.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _quote(value):
+    """Quote a string literal for DDL, where bound parameters are not allowed."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_partitioned_table_ddl(table=None):
+    """
+    Build the CREATE TABLE statement of currency_data as a table partitioned by month.
+
+    Columns and foreign keys are compiled from the model. PostgreSQL requires every unique key to
+    include the partitioning columns, so the primary key gains the instrument and timestamp; with
+    the instrument included, months can be sub-partitioned by instrument whether or not
+    DB_PARTITION_PAIRS was set at creation.
+
+    Args:
+        table (Table): The currency_data table; defaults to the one registered on Base.
+
+    Returns:
+        list: SQL statements creating the table and its default partition.
+    """
+    table = table if table is not None else Base.metadata.tables[PARTITIONED_TABLE]
+    dialect = postgresql.dialect()
+    definitions = [str(CreateColumn(column).compile(dialect=dialect)) for column in table.columns]
+    definitions.append(f"PRIMARY KEY ({', '.join(c.name for c in table.primary_key.columns)}, instrument_id, timestamp)")
+    definitions.append("CONSTRAINT uq_currency_data_instrument_granularity_timestamp "
+                       "UNIQUE (instrument_id, granularity_id, timestamp)")
+    definitions += [f"FOREIGN KEY ({', '.join(constraint.column_keys)}) "
+                    f"REFERENCES {constraint.referred_table.name} "
+                    f"({', '.join(element.column.name for element in constraint.elements)})"
+                    for constraint in sorted(table.foreign_key_constraints, key=lambda c: c.column_keys)]
+    body = ',\n    '.join(definitions)
+    return [
+        f"CREATE TABLE {table.name} (\n    {body}\n) PARTITION BY RANGE (timestamp)",
+        # Catches rows outside the prepared months instead of failing the insert
+        f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT",
+    ]
+
+
+def build_partition_ddl(month, pairs=None):
+    """
+    Build the statements creating the partition of one month.
+
+    Args:
+        month (datetime): Any time within the month.
+        pairs (dict): Instrument ids to sub-partition by, keyed by currency pair; the month is not
+            sub-partitioned when empty.
+
+    Returns:
+        list: SQL statements.
+    """
+    month = month_start(month)
+    name = partition_name(month)
+    bounds = f"FOR VALUES FROM ({_quote(month)}) TO ({_quote(add_months(month, 1))})"
+    if not pairs:
+        return [f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} {bounds}"]
+    statements = [f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} {bounds} PARTITION BY LIST (instrument_id)"]
+    statements += [f"CREATE TABLE {partition_name(month, pair)} PARTITION OF {name} FOR VALUES IN ({int(instrument_id)})"
+                   for pair, instrument_id in pairs.items()]
+    statements.append(f"CREATE TABLE {partition_name(month, 'default')} PARTITION OF {name} DEFAULT")
+    return statements
+
+
+def plan_partitions(existing, start, end, pairs=None):
+    """
+    Build the statements creating the monthly partitions missing between two times.
+
+    Args:
+        existing (iterable): Names of the existing partitions.
+        start (datetime): Start of the range.
+        end (datetime): End of the range, inclusive.
+        pairs (dict): Instrument ids to sub-partition new months by, keyed by currency pair.
+
+    Returns:
+        list: SQL statements; empty when every month exists.
+    """
+    existing = set(existing)
+    statements = []
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        if partition_name(month) not in existing:
+            statements += build_partition_ddl(month, pairs or {})
+        month = add_months(month, 1)
+    return statements
+
+
+def list_partitions(connection):
+    """
+    Return the partitions of currency_data.
+
+    Args:
+        connection (Connection): SQLAlchemy connection to PostgreSQL.
+
+    Returns:
+        list: Partition names, or None when currency_data is not partitioned.
+    """
+    rows = connection.execute(text(LIST_PARTITIONS_SQL)).all()
+    if not rows:
+        return None
+    return sorted(row[0] for row in rows if row[0] is not None)
+
+
+def create_partitioned_table(engine):
+    """
+    Create currency_data as a partitioned table unless it already exists.
+
+    The instrument and granularity tables it references are created first. An existing
+    unpartitioned table is left untouched; converting it means copying its rows into a new
+    partitioned table, which is a manual migration.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of a PostgreSQL database.
+
+    Returns:
+        bool: True when the table was created.
+    """
+    with engine.begin() as connection:
+        if connection.execute(text(f"SELECT to_regclass('{PARTITIONED_TABLE}')")).scalar() is not None:
+            if list_partitions(connection) is None:
+                logging.warning(f"{PARTITIONED_TABLE} exists and is not partitioned; leaving it unchanged")
+            return False
+        Base.metadata.create_all(connection, tables=[Base.metadata.tables['instrument'],
+                                                     Base.metadata.tables['granularity']])
+        for statement in build_partitioned_table_ddl():
+            connection.execute(text(statement))
+    logging.info(f"Created partitioned table {PARTITIONED_TABLE}")
+    return True
+
+
+def ensure_partitions(engine, start, end, pairs=None):
+    """
+    Create the monthly partitions missing between two times, e.g. before loading candles.
+
+    Does nothing unless the database is PostgreSQL and currency_data is partitioned, so loaders
+    can call it unconditionally.
+
+    Args:
+        engine (Engine): SQLAlchemy engine.
+        start (datetime): Start of the range.
+        end (datetime): End of the range, inclusive.
+        pairs (dict): Instrument ids to sub-partition new months by, keyed by currency pair; defaults
+            to the instruments of DB_PARTITION_PAIRS.
+
+    Returns:
+        list: Names of the partitions created, or None when currency_data is not partitioned.
+    """
+    if engine.dialect.name != 'postgresql':
+        return None
+    with engine.begin() as connection:
+        existing = list_partitions(connection)
+        if existing is None:
+            return None
+        if pairs is None:
+            from database.dimensions import get_instrument_ids  # Imported here, as it needs the models
+            pairs = get_instrument_ids(connection, partition_pairs())
+        statements = plan_partitions(existing, start, end, pairs)
+        for statement in statements:
+            connection.execute(text(statement))
+    created = [statement.split()[2] for statement in statements]
+    if created:
+        logging.info(f"Created partitions {', '.join(created)}")
+    return created
+
+
+def ensure_upcoming_partitions(engine, count=None):
+    """
+    Create the partitions of the current month and of the months ahead of it.
+
+    Args:
+        engine (Engine): SQLAlchemy engine.
+        count (int): Months ahead of the current one; defaults to DB_PARTITION_MONTHS_AHEAD.
+
+    Returns:
+        list: Names of the partitions created, or None when currency_data is not partitioned.
+    """
+    current = month_start(datetime.now(timezone.utc))
+    return ensure_partitions(engine, current, add_months(current, months_ahead() if count is None else count))
+
+
+def detach_partitions(engine, before, archive_schema=None, drop=False):
+    """
+    Detach the monthly partitions holding only candles older than a cutoff.
+
+    Detaching is a catalog change instead of a DELETE of every row. The detached tables keep
+    their data and can be moved to an archive schema, dumped, or dropped.
+
+    Args:
+        engine (Engine): SQLAlchemy engine of a PostgreSQL database.
+        before (datetime): Cutoff; months ending on or before it are detached.
+        archive_schema (str): Schema to move the detached tables to.
+        drop (bool): Drop the detached tables instead of keeping them.
+
+    Returns:
+        list: Names of the detached partitions.
+    """
+    detached = []
+    with engine.begin() as connection:
+        for name in list_partitions(connection) or []:
+            month = parse_partition_month(name)
+            if month is None or add_months(month, 1) > before:
+                continue
+            connection.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                connection.execute(text(f"DROP TABLE {name}"))
+            elif archive_schema:
+                connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+                connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+            detached.append(name)
+    logging.info(f"Detached {len(detached)} partitions older than {before:%Y-%m-%d}")
+    return detached
+
+
+def main():
+    from database.db_connect import get_engine
+    from database.schema import create_tables  # noqa: F401 - registers the models on Base
+
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of currency_data.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="List the partitions")
+    ensure = subparsers.add_parser('ensure', help="Create partitions from the current month onwards")
+    ensure.add_argument('--months-ahead', type=int, default=months_ahead(), help="Months to create ahead")
+    detach = subparsers.add_parser('detach', help="Detach partitions older than a date")
+    detach.add_argument('--before', required=True, type=datetime.fromisoformat, help="Cutoff date (YYYY-MM-DD)")
+    detach.add_argument('--archive-schema', help="Schema to move detached partitions to")
+    detach.add_argument('--drop', action='store_true', help="Drop detached partitions")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.command == 'list':
+        with engine.connect() as connection:
+            for name in list_partitions(connection) or []:
+                print(name)
+    elif args.command == 'ensure':
+        ensure_upcoming_partitions(engine, args.months_ahead)
+    else:
+        detach_partitions(engine, args.before, args.archive_schema, args.drop)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,79 @@
-import boto3
 import os
 import json
+import time
+import threading
+from database.db_connect import dispose_engine
 from database.fetch_data import fetch_data
-from database.insert_data import insert_currency_data
+from database.insert_data import upsert_currency_data
 
+SECRET_NAME = os.getenv('SECRET_NAME', 'fin_analytics_sys')  # Replace with your actual secret name
+SECRET_TTL_SECONDS = int(os.getenv('SECRET_TTL_SECONDS', 300))  # Re-read the secret at most this often
+SECRET_KEYS = ('OANDA_API_KEY', 'DB_HOST', 'DB_NAME', 'DB_USER', 'DB_PASS', 'DB_PORT')
+DATABASE_KEYS = ('DB_HOST', 'DB_NAME', 'DB_USER', 'DB_PASS', 'DB_PORT')
 
-def get_secret(secret_name):
-    client = boto3.client('secretsmanager')
-    response = client.get_secret_value(SecretId=secret_name)
-    secret = response['SecretString']
-    return json.loads(secret)
+# Kept at module level so warm invocations of the same container skip the setup. The SQLAlchemy
+# engine and the OANDA HTTP session are cached the same way in database.db_connect and database.fetch_data.
+_secrets_client = None
+_secret_cache = {}  # Secret name -> (expiry on the monotonic clock, decoded secret)
+_lock = threading.Lock()
 
 
-def lambda_handler(event, context):
-    secret_name = "fin_analytics_sys"  # Replace with your actual secret name
-    secrets = get_secret(secret_name)
+def get_secrets_client():
+    """Return the shared Secrets Manager client, creating it on first use."""
+    global _secrets_client
+    with _lock:
+        if _secrets_client is None:
+            # boto3 takes a large share of the import time, so it is only loaded when a secret is fetched
+            import boto3
+            _secrets_client = boto3.client('secretsmanager')
+        return _secrets_client
+
+
+def get_secret(secret_name, ttl=SECRET_TTL_SECONDS):
+    """
+    Return the decoded secret, fetching it from Secrets Manager only when the cached copy has expired.
+
+    Args:
+        secret_name (str): Name of the secret.
+        ttl (float): Seconds a fetched secret is reused, so rotated credentials are picked up eventually.
+
+    Returns:
+        dict: The decoded secret.
+    """
+    now = time.monotonic()
+    cached = _secret_cache.get(secret_name)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    response = get_secrets_client().get_secret_value(SecretId=secret_name)
+    secret = json.loads(response['SecretString'])
+    _secret_cache[secret_name] = (now + ttl, secret)
+    return secret
 
-    os.environ['OANDA_API_KEY'] = secrets['OANDA_API_KEY']
-    os.environ['DB_HOST'] = secrets['DB_HOST']
-    os.environ['DB_NAME'] = secrets['DB_NAME']
-    os.environ['DB_USER'] = secrets['DB_USER']
-    os.environ['DB_PASS'] = secrets['DB_PASS']
-    os.environ['DB_PORT'] = secrets['DB_PORT']
+
+def configure_environment(secrets):
+    """
+    Export the secrets as environment variables.
+
+    The pooled engine is disposed when the database settings changed, e.g. after a credential rotation,
+    so the next query connects with the new values.
+
+    Args:
+        secrets (dict): The decoded secret.
+    """
+    database_changed = any(os.environ.get(key) != secrets[key] for key in DATABASE_KEYS)
+    for key in SECRET_KEYS:
+        os.environ[key] = secrets[key]
+    if database_changed:
+        dispose_engine()
+
+
+def lambda_handler(event, context):
+    configure_environment(get_secret(SECRET_NAME))
 
     currency_pair = event.get('currency_pair', 'EUR_USD') # 'currency_pair' parameter will be used when this project in future takes an input from the user
     data = fetch_data()
-    insert_currency_data(data)
+    upsert_currency_data(data)
 
     return {
         'statusCode': 200,
@@ -0,0 +1,276 @@
+"""
+This module handles paginated, resumable historical backfills from the OANDA API.
+
+A [from, to] range is split into windows of at most MAX_CANDLES_PER_REQUEST candles for the
+chosen granularity. Windows are fetched with a bounded number of concurrent requests, streamed
+in order into a database loader, and the end of the last loaded window is checkpointed so an
+interrupted backfill resumes where it stopped instead of starting over.
+"""
+
+import argparse
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from database.dimensions import GRANULARITIES
+from scripts.fetch_data import fetch_ohlc_data
+from scripts.copy_loader import copy_currency_data
+from scripts.rollups import refresh_rollups, ROLLUP_BASE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# OANDA returns at most this many candles per request
+MAX_CANDLES_PER_REQUEST = 5000
+
+# Candle length per OANDA granularity code; monthly candles are sized to the longest month
+GRANULARITY_SECONDS = {name: seconds for name, (_, seconds) in GRANULARITIES.items()}
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def split_range(from_time, to_time, granularity, page_size=MAX_CANDLES_PER_REQUEST):
+    """
+    Split a time range into consecutive windows that each fit in a single request.
+
+    Args:
+        from_time (datetime): UTC start of the range (inclusive).
+        to_time (datetime): UTC end of the range (exclusive).
+        granularity (str): OANDA granularity code.
+        page_size (int): Maximum number of candles per window.
+
+    Returns:
+        list: (start, end) tuples covering the range.
+    """
+    step = timedelta(seconds=GRANULARITY_SECONDS[granularity] * page_size)
+    windows = []
+    start = from_time
+    while start < to_time:
+        end = min(start + step, to_time)
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def fetch_window(instrument, granularity, window, include_incomplete=False):
+    """
+    Fetch the candles of a single window.
+
+    Candles outside [start, end) are dropped so adjacent windows never overlap.
+
+    Args:
+        instrument (str): The instrument to fetch (e.g., 'EUR_USD').
+        granularity (str): OANDA granularity code.
+        window (tuple): (start, end) of the window.
+        include_incomplete (bool): Keep the still-forming candle at the end of the range.
+
+    Returns:
+        list: Raw candles of the window.
+    """
+    start, end = window
+    lower, upper = start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)
+    candles = fetch_ohlc_data(instrument, from_time=start, to_time=end, granularity=granularity)
+    return [
+        candle for candle in candles
+        if lower <= candle['time'][:19] < upper and (include_incomplete or candle.get('complete', True))
+    ]
+
+
+def iter_pages(instrument, granularity, windows, max_workers=4, include_incomplete=False):
+    """
+    Fetch windows concurrently and yield them in chronological order.
+
+    At most 2 * max_workers windows are in flight, so memory use does not depend on the range size.
+
+    Args:
+        instrument (str): The instrument to fetch.
+        granularity (str): OANDA granularity code.
+        windows (iterable): (start, end) windows to fetch.
+        max_workers (int): Maximum number of concurrent requests.
+        include_incomplete (bool): Keep the still-forming candle at the end of the range.
+
+    Yields:
+        tuple: (window, candles) for each window.
+    """
+    windows = iter(windows)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+
+    def submit(window):
+        pending.append((window, executor.submit(fetch_window, instrument, granularity, window, include_incomplete)))
+
+    try:
+        for window in islice(windows, 2 * max_workers):
+            submit(window)
+        while pending:
+            window, future = pending.popleft()
+            candles = future.result()
+            next_window = next(windows, None)
+            if next_window is not None:
+                submit(next_window)
+            yield window, candles
+    finally:
+        # Do not keep fetching pages nobody will consume
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _stream_candles(pages, loaded_windows):
+    """
+    Flatten (window, candles) pages into a candle stream, recording each window once it is consumed.
+    """
+    for window, candles in pages:
+        yield from candles
+        loaded_windows.append(window)
+
+
+class BackfillCheckpoint:
+    """
+    JSON file recording up to which point a backfill has been loaded.
+
+    The checkpoint is only honoured for the same instrument, granularity and range.
+    """
+
+    def __init__(self, path, instrument, granularity, from_time, to_time):
+        self.path = path
+        self.job = {
+            'instrument': instrument,
+            'granularity': granularity,
+            'from': from_time.strftime(TIME_FORMAT),
+            'to': to_time.strftime(TIME_FORMAT),
+        }
+
+    def load(self):
+        """
+        Return the end of the last loaded window, or None when there is nothing to resume.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('job') != self.job:
+            logging.warning(f"Ignoring checkpoint {self.path} written for a different backfill: {state.get('job')}")
+            return None
+        return datetime.strptime(state['completed_until'], TIME_FORMAT)
+
+    def save(self, completed_until):
+        """
+        Atomically record that everything before completed_until has been loaded.
+        """
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'job': self.job, 'completed_until': completed_until.strftime(TIME_FORMAT)}, f)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def stored_to_time(path, instrument, granularity, from_time):
+        """
+        Return the end of the range of an unfinished backfill with the same instrument, granularity
+        and start, so a resumed run without an explicit end continues the same job.
+
+        Returns:
+            datetime: The stored end of the range, or None when there is no such checkpoint.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            job = json.load(f).get('job', {})
+        if (job.get('instrument'), job.get('granularity'), job.get('from')) != \
+                (instrument, granularity, from_time.strftime(TIME_FORMAT)):
+            return None
+        return datetime.strptime(job['to'], TIME_FORMAT)
+
+    def clear(self):
+        """
+        Remove the checkpoint once the backfill has finished.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_backfill(instrument, from_time, to_time, granularity='D', checkpoint_path=None, max_workers=4,
+                 windows_per_commit=10, page_size=MAX_CANDLES_PER_REQUEST, loader=copy_currency_data,
+                 rollup=refresh_rollups):
+    """
+    Backfill a range of candles into currency_data, resuming from the checkpoint if one exists.
+
+    Candles are streamed into the loader as a generator. Each loader call covers up to
+    windows_per_commit windows and is committed before the checkpoint moves past them, so a crash
+    never skips data. Re-loading a partially committed group is harmless because the loaders upsert.
+    Backfilled H1 candles also refresh the rollup buckets they fall into before the checkpoint moves.
+
+    Args:
+        instrument (str): The instrument to backfill (e.g., 'EUR_USD').
+        from_time (datetime): UTC start of the range.
+        to_time (datetime): UTC end of the range.
+        granularity (str): OANDA granularity code.
+        checkpoint_path (str): Optional checkpoint file enabling resumption.
+        max_workers (int): Maximum number of concurrent requests.
+        windows_per_commit (int): Windows loaded per loader call and checkpoint.
+        page_size (int): Maximum number of candles per request.
+        loader (callable): Loader accepting an iterable of candles and currency_pair, granularity and
+            rollup keywords, like copy_currency_data.
+        rollup (callable): Called with the currency pair and the start and end of each loaded group of
+            H1 candles to update the rollups; None skips them.
+
+    Returns:
+        dict: Total 'inserted', 'updated' and 'skipped' counts reported by the loader.
+    """
+    checkpoint = BackfillCheckpoint(checkpoint_path, instrument, granularity, from_time, to_time) \
+        if checkpoint_path else None
+    resume_from = checkpoint.load() if checkpoint else None
+    if resume_from:
+        logging.info(f"Resuming backfill of {instrument} {granularity} from {resume_from}")
+        from_time = max(from_time, resume_from)
+
+    windows = split_range(from_time, to_time, granularity, page_size)
+    logging.info(f"Backfilling {instrument} {granularity} from {from_time} to {to_time} in {len(windows)} windows")
+
+    currency_pair = instrument.replace('_', '/')
+    totals = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    pages = iter_pages(instrument, granularity, windows, max_workers=max_workers)
+    for first_page in pages:
+        loaded_windows = []
+        group = chain([first_page], islice(pages, windows_per_commit - 1))
+        # The rollups of each group are refreshed here, over its whole windows, before the checkpoint moves
+        counts = loader(_stream_candles(group, loaded_windows), currency_pair=currency_pair, granularity=granularity,
+                        rollup=None)
+        for key in totals:
+            totals[key] += counts[key]
+        if rollup and granularity == ROLLUP_BASE:
+            rollup(currency_pair, loaded_windows[0][0], loaded_windows[-1][1])
+        if checkpoint:
+            checkpoint.save(loaded_windows[-1][1])
+        logging.info(f"Loaded {instrument} {granularity} up to {loaded_windows[-1][1]}")
+
+    if checkpoint:
+        checkpoint.clear()
+    logging.info(f"Backfill of {instrument} {granularity} finished: {totals}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical OANDA candles into currency_data.")
+    parser.add_argument('--instrument', default='EUR_USD')
+    parser.add_argument('--granularity', default='D', choices=sorted(GRANULARITY_SECONDS))
+    parser.add_argument('--from', dest='from_time', required=True, type=datetime.fromisoformat,
+                        help="UTC start, e.g. 2015-01-01")
+    parser.add_argument('--to', dest='to_time', type=datetime.fromisoformat,
+                        help="UTC end; defaults to the end of an unfinished backfill of the same start, else now")
+    parser.add_argument('--checkpoint', default=None, help="Checkpoint file; defaults to backfill_<instrument>_<granularity>.json")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of concurrent requests")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f"backfill_{args.instrument}_{args.granularity}.json"
+    # A default end of 'now' would change on every rerun and never match the checkpoint's job
+    to_time = args.to_time or BackfillCheckpoint.stored_to_time(checkpoint_path, args.instrument, args.granularity,
+                                                                args.from_time) \
+        or datetime.now(timezone.utc).replace(tzinfo=None)
+    run_backfill(args.instrument, args.from_time, to_time, args.granularity,
+                 checkpoint_path=checkpoint_path, max_workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+This module builds a trimmed, precompiled deployment bundle from the lambda_function directory.
+
+The vendored dependencies are copied without test suites, unused SQLAlchemy dialects, typing stubs
+and packaging leftovers. boto3 and its dependencies are left out by default because the AWS Lambda
+Python runtime already provides them. All modules are then compiled to bytecode, since /var/task is
+read-only on Lambda and every cold start would otherwise compile the sources again, and the result
+is zipped.
+
+Run it with the same Python version as the Lambda runtime, so the bytecode is actually used:
+
+    python -m scripts.build_lambda_bundle --output build/lambda
+"""
+
+import argparse
+import compileall
+import fnmatch
+import logging
+import os
+import py_compile
+import shutil
+import zipfile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_function')
+DEFAULT_OUTPUT_DIR = os.path.join('build', 'lambda')
+
+# Paths relative to the bundle root that are never needed at runtime
+EXCLUDED_PATHS = (
+    'bin', 'include', 'requirements.txt', 'constraints.txt',
+    'sqlalchemy/testing',
+    'sqlalchemy/dialects/mssql', 'sqlalchemy/dialects/mysql',
+    'sqlalchemy/dialects/oracle', 'sqlalchemy/dialects/sqlite',
+    'sqlalchemy/dialects/postgresql/provision.py',  # Test provisioning, imports sqlalchemy.testing
+    'sqlalchemy/dialects/type_migration_guidelines.txt',
+    'sqlalchemy/ext/mypy',
+    # IDNA mapping table, only imported when requests encodes a non-ASCII host name
+    'idna/uts46data.py',
+)
+EXCLUDED_PATTERNS = ('__pycache__', '*.pyc', '*.pyi', 'py.typed', 'RECORD', 'INSTALLER')
+
+# Packages provided by the Lambda Python runtime
+RUNTIME_PROVIDED = (
+    'boto3', 'botocore', 's3transfer', 'jmespath', 'dateutil', 'six.py',
+    'boto3-*.dist-info', 'botocore-*.dist-info', 's3transfer-*.dist-info', 'jmespath-*.dist-info',
+    'python_dateutil-*.dist-info', 'six-*.dist-info',
+)
+
+# botocore service models the handler uses; the other ~400 services are dropped when boto3 is bundled.
+# botocore.docs stays, as botocore.client imports it eagerly.
+BOTOCORE_SERVICES = ('secretsmanager',)
+
+
+def is_excluded(relative_path, keep_boto3=False):
+    """
+    Decide whether a path of the source tree is left out of the bundle.
+
+    Args:
+        relative_path (str): Path relative to the source directory, using '/' separators.
+        keep_boto3 (bool): Bundle boto3 instead of relying on the runtime's copy.
+
+    Returns:
+        bool: True when the path is excluded.
+    """
+    parts = relative_path.split('/')
+    if any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in EXCLUDED_PATTERNS):
+        return True
+    if any(relative_path == path or relative_path.startswith(path + '/') for path in EXCLUDED_PATHS):
+        return True
+    if not keep_boto3:
+        return any(fnmatch.fnmatch(parts[0], pattern) for pattern in RUNTIME_PROVIDED)
+    if parts[:2] == ['botocore', 'data'] and len(parts) > 3:
+        return parts[2] not in BOTOCORE_SERVICES
+    return False
+
+
+def copy_tree(source_dir, output_dir, keep_boto3=False):
+    """
+    Copy the source tree into output_dir, skipping excluded paths.
+
+    Args:
+        source_dir (str): The lambda_function directory.
+        output_dir (str): Bundle directory; replaced if it exists.
+        keep_boto3 (bool): Bundle boto3 instead of relying on the runtime's copy.
+
+    Returns:
+        int: Number of files copied.
+    """
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    copied = 0
+    for root, dirs, files in os.walk(source_dir):
+        relative_root = os.path.relpath(root, source_dir).replace(os.sep, '/')
+        relative_root = '' if relative_root == '.' else relative_root + '/'
+        dirs[:] = [name for name in dirs if not is_excluded(relative_root + name, keep_boto3)]
+        for name in files:
+            if is_excluded(relative_root + name, keep_boto3):
+                continue
+            target = os.path.join(output_dir, relative_root, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(os.path.join(root, name), target)
+            copied += 1
+    return copied
+
+
+def compile_tree(output_dir, optimize=0):
+    """
+    Compile every module of the bundle to bytecode.
+
+    Unchecked-hash pycs are used, so the interpreter loads them without comparing source timestamps,
+    which the zip packaging does not preserve reliably.
+
+    Args:
+        output_dir (str): Bundle directory.
+        optimize (int): Optimization level passed to the compiler.
+
+    Returns:
+        bool: True when all modules compiled.
+    """
+    return compileall.compile_dir(output_dir, quiet=1, optimize=optimize, workers=0,
+                                  invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+
+def zip_tree(output_dir, zip_path):
+    """
+    Zip the bundle directory with paths relative to its root.
+
+    Args:
+        output_dir (str): Bundle directory.
+        zip_path (str): Path of the archive to write.
+    """
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for root, dirs, files in os.walk(output_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                archive.write(path, os.path.relpath(path, output_dir))
+
+
+def directory_size(path):
+    """Return the total size in bytes of all files below path."""
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def build_bundle(output_dir=DEFAULT_OUTPUT_DIR, source_dir=SOURCE_DIR, keep_boto3=False, optimize=0):
+    """
+    Build the trimmed, precompiled bundle and its zip archive.
+
+    Args:
+        output_dir (str): Bundle directory; the archive is written next to it as <output_dir>.zip.
+        source_dir (str): The lambda_function directory.
+        keep_boto3 (bool): Bundle boto3 instead of relying on the runtime's copy.
+        optimize (int): Bytecode optimization level.
+
+    Returns:
+        str: Path of the zip archive.
+    """
+    copied = copy_tree(source_dir, output_dir, keep_boto3)
+    if not compile_tree(output_dir, optimize):
+        raise RuntimeError(f"Compiling the bundle in {output_dir} failed")
+    zip_path = output_dir.rstrip('/\\') + '.zip'
+    zip_tree(output_dir, zip_path)
+    logging.info(f"Bundled {copied} files: {directory_size(source_dir) / 1e6:.1f} MB source, "
+                 f"{directory_size(output_dir) / 1e6:.1f} MB bundle, {os.path.getsize(zip_path) / 1e6:.1f} MB zipped")
+    return zip_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the trimmed Lambda deployment bundle.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help="Bundle directory")
+    parser.add_argument('--keep-boto3', action='store_true',
+                        help="Bundle boto3 (trimmed to the services used) instead of using the runtime's copy")
+    parser.add_argument('--optimize', type=int, default=0, choices=(0, 1, 2), help="Bytecode optimization level")
+    args = parser.parse_args()
+    build_bundle(args.output, keep_boto3=args.keep_boto3, optimize=args.optimize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+This module provides a local on-disk cache of raw OANDA candles.
+
+Completed candles never change, so they are stored compressed in a local SQLite database keyed
+by instrument, granularity and candle time. For every instrument/granularity the cache also
+records the contiguous time range it knows completely, which lets a request be served from disk
+and only go to the network for the part after that range. Incomplete (still forming) candles are
+returned to the caller but never stored.
+
+The cache is enabled by pointing OANDA_CACHE_PATH at a database file; OANDA_CACHE_MAX_BYTES caps
+its size, evicting the least recently used series first.
+"""
+
+import os
+import json
+import logging
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+from requests.exceptions import ConnectionError, Timeout
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Largest page OANDA serves for a single request
+MAX_CANDLES_PER_REQUEST = 5000
+
+KEY_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Cache shared by the fetch functions, created on first use
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def time_key(value):
+    """
+    Normalise a candle time string or datetime to the key format used by the cache.
+
+    Args:
+        value (str or datetime): RFC 3339 time string or naive UTC datetime.
+
+    Returns:
+        str: Time as 'YYYY-MM-DDTHH:MM:SS'.
+    """
+    if isinstance(value, datetime):
+        return value.strftime(KEY_FORMAT)
+    return value[:19]
+
+
+def _param(key):
+    """Convert a cache key to an OANDA query parameter value."""
+    return key + 'Z'
+
+
+class CandleCache:
+    """
+    SQLite-backed cache of completed OANDA candles.
+
+    Attributes:
+        path (str): Location of the SQLite database.
+        max_bytes (int): Size above which least recently used series are evicted.
+        stats (dict): Candle 'hits' served from disk, candle 'misses' fetched from the network,
+            network 'requests' made and series 'evictions', updated under the cache lock.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, clock=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._clock = clock or (lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'requests': 0, 'evictions': 0}
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS candles (
+                instrument TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                time TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (instrument, granularity, time)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS coverage (
+                instrument TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                start TEXT NOT NULL,
+                end TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (instrument, granularity)
+            );
+        """)
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        self._connection.close()
+
+    # Storage helpers
+
+    def _coverage(self, series):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT start, end FROM coverage WHERE instrument = ? AND granularity = ?", series).fetchone()
+        return row
+
+    def _read(self, series, start, end, limit=None, newest=False):
+        order = 'DESC' if newest else 'ASC'
+        sql = (f"SELECT payload FROM candles WHERE instrument = ? AND granularity = ? AND time >= ? AND time < ? "
+               f"ORDER BY time {order}")
+        params = [*series, start, end]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+            self._connection.execute(
+                "UPDATE coverage SET last_used = ? WHERE instrument = ? AND granularity = ?",
+                (self._clock().timestamp(), *series))
+            self._connection.commit()
+            self.stats['hits'] += len(rows)
+        candles = [json.loads(zlib.decompress(payload)) for (payload,) in rows]
+        if newest:
+            candles.reverse()
+        return candles
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def snapshot(self):
+        """
+        Return a copy of the counters.
+        """
+        with self._lock:
+            return dict(self.stats)
+
+    def _fetch(self, fetch, **params):
+        # The request itself runs outside the lock so concurrent fetches overlap
+        self._count('requests')
+        candles = fetch(**params)
+        self._count('misses', len(candles))
+        return candles
+
+    def _store(self, series, candles, start, upper, limit):
+        """
+        Store the complete candles of a network response and extend the known range.
+
+        Args:
+            series (tuple): (instrument, granularity).
+            candles (list): Candles returned by the network, in time order.
+            start (str): Key from which the response is known to be gap-free.
+            upper (str): Key the request ran up to (its 'to' or the current time).
+            limit (int): Number of candles requested, or None when the request was bounded by 'to' only.
+        """
+        complete = [c for c in candles if c.get('complete', True)]
+        incomplete = [c for c in candles if not c.get('complete', True)]
+        if incomplete:
+            # Everything before the forming candle is final
+            end = time_key(incomplete[0]['time'])
+        elif limit is not None and len(candles) >= limit:
+            # The response was cut off by the count; only up to the last candle is known
+            end = (datetime.strptime(time_key(candles[-1]['time']), KEY_FORMAT)
+                   + timedelta(seconds=1)).strftime(KEY_FORMAT)
+        else:
+            end = upper
+
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO candles (instrument, granularity, time, payload) VALUES (?, ?, ?, ?)",
+                [(*series, time_key(c['time']), zlib.compress(json.dumps(c).encode())) for c in complete])
+
+            current = self._connection.execute(
+                "SELECT start, end FROM coverage WHERE instrument = ? AND granularity = ?", series).fetchone()
+            if current and start <= current[1] and end >= current[0]:
+                # Overlapping or adjacent: grow the known range
+                start, end = min(start, current[0]), max(end, current[1])
+            elif current:
+                # Disjoint: the old range is dropped so the series stays contiguous
+                self._connection.execute(
+                    "DELETE FROM candles WHERE instrument = ? AND granularity = ? AND (time < ? OR time >= ?)",
+                    (*series, start, end))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO coverage (instrument, granularity, start, end, last_used) VALUES (?, ?, ?, ?, ?)",
+                (*series, start, end, self._clock().timestamp()))
+            self._connection.commit()
+        self._evict(series)
+
+    def _used_bytes(self):
+        page_count = self._connection.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, current_series):
+        """
+        Evict least recently used series, then the oldest candles of the current one, until under max_bytes.
+        """
+        with self._lock:
+            while self._used_bytes() > self.max_bytes:
+                victim = self._connection.execute(
+                    "SELECT instrument, granularity FROM coverage WHERE NOT (instrument = ? AND granularity = ?) "
+                    "ORDER BY last_used LIMIT 1", current_series).fetchone()
+                if victim:
+                    self._connection.execute("DELETE FROM candles WHERE instrument = ? AND granularity = ?", victim)
+                    self._connection.execute("DELETE FROM coverage WHERE instrument = ? AND granularity = ?", victim)
+                    self.stats['evictions'] += 1
+                    logging.info(f"Evicted cached candles for {victim[0]} {victim[1]}")
+                else:
+                    # Only the current series is left: drop its oldest candles and move the range start
+                    oldest = self._connection.execute(
+                        "SELECT time FROM candles WHERE instrument = ? AND granularity = ? ORDER BY time LIMIT 1 OFFSET 1000",
+                        current_series).fetchone()
+                    if oldest is None:
+                        break
+                    self._connection.execute(
+                        "DELETE FROM candles WHERE instrument = ? AND granularity = ? AND time < ?",
+                        (*current_series, oldest[0]))
+                    self._connection.execute(
+                        "UPDATE coverage SET start = ? WHERE instrument = ? AND granularity = ?",
+                        (oldest[0], *current_series))
+                self._connection.commit()
+
+    # Public API
+
+    def get_range(self, instrument, granularity, fetch, from_time, to_time=None):
+        """
+        Return the candles in [from_time, to_time), fetching only what is not cached.
+
+        Args:
+            instrument (str): The instrument (e.g., 'EUR_USD').
+            granularity (str): OANDA granularity code.
+            fetch (callable): Function taking OANDA query parameters and returning candles.
+            from_time (datetime): UTC start of the range.
+            to_time (datetime): UTC end of the range; defaults to now.
+
+        Returns:
+            list: Raw candles in time order.
+        """
+        series = (instrument, granularity)
+        now = time_key(self._clock())
+        start = time_key(from_time)
+        upper = min(time_key(to_time), now) if to_time else now
+        coverage = self._coverage(series)
+
+        if coverage and coverage[0] <= start <= coverage[1]:
+            cached = self._read(series, start, min(upper, coverage[1]))
+            if upper <= coverage[1]:
+                return cached
+            tail_start = coverage[1]
+        else:
+            cached = []
+            tail_start = start
+
+        params = {'from': _param(tail_start)}
+        if to_time:
+            params['to'] = _param(upper)
+        else:
+            params['count'] = MAX_CANDLES_PER_REQUEST
+        try:
+            tail = self._fetch(fetch, **params)
+        except (ConnectionError, Timeout) as e:
+            if not cached:
+                raise
+            logging.warning(f"Serving cached {instrument} {granularity} candles only, network unavailable: {e}")
+            return cached
+        self._store(series, tail, tail_start, upper, None if to_time else MAX_CANDLES_PER_REQUEST)
+        return cached + [c for c in tail if time_key(c['time']) < upper or not to_time]
+
+    def get_from(self, instrument, granularity, fetch, from_time, count):
+        """
+        Return up to count candles starting at from_time, fetching only what is not cached.
+
+        Args:
+            instrument (str): The instrument (e.g., 'EUR_USD').
+            granularity (str): OANDA granularity code.
+            fetch (callable): Function taking OANDA query parameters and returning candles.
+            from_time (datetime): UTC start of the range.
+            count (int): Number of candles requested.
+
+        Returns:
+            list: Raw candles in time order.
+        """
+        series = (instrument, granularity)
+        start = time_key(from_time)
+        coverage = self._coverage(series)
+
+        if coverage and coverage[0] <= start <= coverage[1]:
+            cached = self._read(series, start, coverage[1], limit=count)
+            if len(cached) == count:
+                return cached
+            tail_start = coverage[1]
+        else:
+            cached = []
+            tail_start = start
+
+        remaining = count - len(cached)
+        try:
+            tail = self._fetch(fetch, **{'from': _param(tail_start), 'count': remaining})
+        except (ConnectionError, Timeout) as e:
+            if not cached:
+                raise
+            logging.warning(f"Serving cached {instrument} {granularity} candles only, network unavailable: {e}")
+            return cached
+        self._store(series, tail, tail_start, time_key(self._clock()), remaining)
+        return cached + tail
+
+    def get_latest(self, instrument, granularity, fetch, count):
+        """
+        Return the latest count candles, fetching only the candles after the cached range.
+
+        Args:
+            instrument (str): The instrument (e.g., 'EUR_USD').
+            granularity (str): OANDA granularity code.
+            fetch (callable): Function taking OANDA query parameters and returning candles.
+            count (int): Number of candles requested.
+
+        Returns:
+            list: Raw candles in time order, the last one possibly incomplete.
+        """
+        series = (instrument, granularity)
+        now = time_key(self._clock())
+        coverage = self._coverage(series)
+
+        if coverage:
+            try:
+                tail = self._fetch(fetch, **{'from': _param(coverage[1]), 'count': MAX_CANDLES_PER_REQUEST})
+            except (ConnectionError, Timeout) as e:
+                logging.warning(f"Serving cached {instrument} {granularity} candles only, network unavailable: {e}")
+                return self._read(series, coverage[0], coverage[1], limit=count, newest=True)
+            if len(tail) < MAX_CANDLES_PER_REQUEST:
+                self._store(series, tail, coverage[1], now, MAX_CANDLES_PER_REQUEST)
+                complete_tail = [c for c in tail if c.get('complete', True)]
+                incomplete_tail = [c for c in tail if not c.get('complete', True)]
+                needed = count - len(complete_tail) - len(incomplete_tail)
+                cached = self._read(series, coverage[0], coverage[1], limit=needed, newest=True) if needed > 0 else []
+                if len(cached) == max(needed, 0):
+                    return (cached + complete_tail + incomplete_tail)[-count:]
+
+        # Nothing usable cached (or the cache is too stale): fetch the whole page
+        candles = self._fetch(fetch, count=count)
+        if candles:
+            self._store(series, candles, time_key(candles[0]['time']), now, None)
+        return candles
+
+
+def get_cache():
+    """
+    Return the shared candle cache, or None when OANDA_CACHE_PATH is not set.
+
+    Returns:
+        CandleCache: The shared cache.
+    """
+    global _cache
+    path = os.getenv('OANDA_CACHE_PATH')
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            _cache = CandleCache(path, int(os.getenv('OANDA_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+        return _cache
+
+
+def fetch_candles(client, instrument, granularity, cache=None, **params):
+    """
+    Fetch candles through the cache when one is configured, otherwise straight from the client.
+
+    Args:
+        client (OandaClient): Client used for network requests.
+        instrument (str): The instrument (e.g., 'EUR_USD').
+        granularity (str): OANDA granularity code.
+        cache (CandleCache): Cache to use; defaults to the shared cache.
+        **params: OANDA query parameters ('from', 'to', 'count').
+
+    Returns:
+        list: Raw candles in time order.
+    """
+    cache = cache or get_cache()
+
+    def fetch(**query):
+        return client.get_candles(instrument, granularity, **query)
+
+    if cache is None:
+        return fetch(**params)
+
+    if 'from' in params:
+        from_time = datetime.strptime(time_key(params['from']), KEY_FORMAT)
+        if 'to' in params:
+            to_time = datetime.strptime(time_key(params['to']), KEY_FORMAT)
+            return cache.get_range(instrument, granularity, fetch, from_time, to_time)
+        return cache.get_from(instrument, granularity, fetch, from_time, params.get('count', 500))
+    return cache.get_latest(instrument, granularity, fetch, params.get('count', 500))
@@ -0,0 +1,222 @@
+"""
+This module handles high-volume loading of currency data through PostgreSQL COPY.
+
+Candles are streamed into a temporary staging table with psycopg2's copy_expert and then
+merged into currency_data with a single INSERT ... SELECT ... ON CONFLICT statement, so
+no ORM object is ever built and memory stays flat regardless of the input size. Loaded H1
+candles refresh their rollups once committed, as with upsert_currency_data.
+"""
+
+import io
+import logging
+from database.db_connect import get_engine
+from database.dimensions import get_instrument_id, get_instrument_ids, granularity_id, DEFAULT_GRANULARITY
+from database.schema.partitions import LIST_PARTITIONS_SQL, plan_partitions, partition_pairs
+from scripts.insert_data import (create_currency_data_row, refresh_loaded_rollups, CURRENCY_DATA_KEY_COLUMNS,
+                                 CURRENCY_DATA_VALUE_COLUMNS)
+from scripts.rollups import refresh_rollups
+
+# Columns written through COPY, in the order they appear on each line
+COPY_COLUMNS = CURRENCY_DATA_KEY_COLUMNS + CURRENCY_DATA_VALUE_COLUMNS
+STAGING_TABLE = 'currency_data_staging'
+
+
+class IteratorFile(io.TextIOBase):
+    """
+    Read-only file object that pulls lines from an iterator on demand.
+
+    copy_expert reads its input in fixed-size chunks, so only about one chunk of the
+    underlying generator is ever held in memory.
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                line = next(self._lines)
+            except StopIteration:
+                break
+            chunks.append(line)
+            length += len(line)
+
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def format_copy_line(row):
+    """
+    Format a currency_data row as a line of PostgreSQL COPY text format.
+
+    Args:
+        row (dict): Column values for a single currency_data row.
+
+    Returns:
+        str: Tab-separated line terminated by a newline.
+    """
+    return '\t'.join((
+        str(row['instrument_id']),
+        str(row['granularity_id']),
+        row['timestamp'].isoformat(sep=' '),
+        *(repr(float(row[column])) for column in CURRENCY_DATA_VALUE_COLUMNS)
+    )) + '\n'
+
+
+def build_merge_sql(update_existing=False, partitioned=False):
+    """
+    Build the statement that merges the staging table into currency_data.
+
+    Duplicates inside the staging table are collapsed so the last streamed candle wins,
+    and the inserted/updated counts are computed server-side instead of returning every row.
+
+    Args:
+        update_existing (bool): Overwrite changed values of existing candles.
+        partitioned (bool): currency_data is partitioned; xmax cannot be returned from a
+            partitioned table, so new candles are counted from the staged keys that already exist.
+
+    Returns:
+        str: SQL statement returning one (inserted, updated) row.
+    """
+    columns = ', '.join(COPY_COLUMNS)
+    key = ', '.join(CURRENCY_DATA_KEY_COLUMNS)
+    if update_existing:
+        assignments = ', '.join(f"{column} = EXCLUDED.{column}" for column in CURRENCY_DATA_VALUE_COLUMNS)
+        changed = ' OR '.join(f"currency_data.{column} IS DISTINCT FROM EXCLUDED.{column}"
+                              for column in CURRENCY_DATA_VALUE_COLUMNS)
+        conflict_action = f"DO UPDATE SET {assignments} WHERE {changed}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    if partitioned:
+        # All parts of the statement see the table as it was before the insert
+        return f"""
+            WITH staged AS (
+                SELECT DISTINCT ON ({key}) {columns}
+                FROM {STAGING_TABLE}
+                ORDER BY {key}, seq DESC
+            ), existing AS (
+                SELECT count(*) AS total FROM staged JOIN currency_data USING ({key})
+            ), merged AS (
+                INSERT INTO currency_data ({columns})
+                SELECT {columns} FROM staged
+                ON CONFLICT ({key}) {conflict_action}
+                RETURNING 1
+            )
+            SELECT inserted, (SELECT count(*) FROM merged) - inserted
+            FROM (SELECT (SELECT count(*) FROM staged) - total AS inserted FROM existing) AS counts
+        """
+
+    return f"""
+        WITH merged AS (
+            INSERT INTO currency_data ({columns})
+            SELECT DISTINCT ON ({key}) {columns}
+            FROM {STAGING_TABLE}
+            ORDER BY {key}, seq DESC
+            ON CONFLICT ({key}) {conflict_action}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+        FROM merged
+    """
+
+
+def ensure_staged_partitions(cursor, pairs=None):
+    """
+    Create the currency_data partitions missing for the staged candles, if the table is partitioned.
+
+    Runs in the loading transaction, which already holds a lock on currency_data, so a
+    separate connection creating the partitions would wait for it.
+
+    Args:
+        cursor: psycopg2 cursor of the loading transaction.
+        pairs (dict): Instrument ids to sub-partition new months by, keyed by currency pair.
+
+    Returns:
+        bool: Whether currency_data is partitioned.
+    """
+    cursor.execute(LIST_PARTITIONS_SQL)
+    partitions = [row[0] for row in cursor.fetchall()]
+    if not partitions:
+        return False
+    cursor.execute(f"SELECT min(timestamp), max(timestamp) FROM {STAGING_TABLE}")
+    start, end = cursor.fetchone()
+    if start is None:
+        return True
+    for statement in plan_partitions([name for name in partitions if name], start, end, pairs):
+        cursor.execute(statement)
+    return True
+
+
+def copy_currency_data(data, update_existing=False, currency_pair='EUR/USD', engine=None,
+                       granularity=DEFAULT_GRANULARITY, rollup=refresh_rollups):
+    """
+    Stream currency data into currency_data through a COPY into a temporary staging table.
+
+    Args:
+        data (iterable): Currency data points to load; a generator keeps memory usage flat.
+        update_existing (bool): Overwrite existing candles whose values changed.
+        currency_pair (str): The currency pair the data points belong to.
+        engine (Engine): Optional PostgreSQL engine; the default engine is used otherwise.
+        granularity (str): OANDA granularity code of the data points.
+        rollup (callable): Refreshes the rollups of loaded H1 candles once they are committed, see
+            refresh_loaded_rollups; None leaves them to the caller.
+
+    Returns:
+        dict: Number of 'inserted', 'updated' and 'skipped' data points.
+    """
+    engine = engine or get_engine()
+    # Registered before the load starts, so the instruments are committed whatever happens to the COPY
+    instrument_id = get_instrument_id(engine, currency_pair)
+    series_granularity_id = granularity_id(granularity)
+    pairs = get_instrument_ids(engine, partition_pairs())
+    total = 0
+    first = last = None
+
+    def copy_lines():
+        nonlocal total, first, last
+        for record in data:
+            total += 1
+            row = create_currency_data_row(record, instrument_id, series_granularity_id)
+            first = row['timestamp'] if first is None else min(first, row['timestamp'])
+            last = row['timestamp'] if last is None else max(last, row['timestamp'])
+            yield format_copy_line(row)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # The staging table only lives for this transaction; seq preserves the streaming order
+        cursor.execute(f"""
+            CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS
+            SELECT {', '.join(COPY_COLUMNS)} FROM currency_data WITH NO DATA
+        """)
+        cursor.execute(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN seq BIGSERIAL")
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({', '.join(COPY_COLUMNS)}) FROM STDIN",
+                           IteratorFile(copy_lines()))
+        partitioned = ensure_staged_partitions(cursor, pairs)
+        cursor.execute(build_merge_sql(update_existing, partitioned))
+        inserted, updated = cursor.fetchone()
+        connection.commit()
+
+        counts = {'inserted': inserted, 'updated': updated, 'skipped': total - inserted - updated}
+        logging.info(f"Copied {total} records: {counts['inserted']} inserted, "
+                     f"{counts['updated']} updated, {counts['skipped']} skipped")
+        refresh_loaded_rollups(rollup, currency_pair, granularity, first, last, counts, engine)
+        return counts
+
+    except Exception as e:
+        connection.rollback()
+        logging.error(f"Error copying data into the database: {e}")
+        raise
+    finally:
+        connection.close()
@@ -1,6 +1,8 @@
 import requests
 import os
 from utils.env_loader import load_environment
+from scripts.oanda_client import get_client
+from scripts.candle_cache import fetch_candles
 import logging
 
 # Loading environment variables
@@ -11,28 +13,44 @@ logging.basicConfig(level=logging.INFO)
 
 # Constants
 OANDA_API_KEY = os.getenv("OANDA_API_KEY")
-OANDA_API_URL = "https://api-fxpractice.oanda.com/v3/instruments/EUR_USD/candles"
 GRANULARITY = "D"  # Daily data
 
-def fetch_ohlc_data(instrument="EUR_USD", from_time=None, count=100):
-    headers = {"Authorization": f"Bearer {OANDA_API_KEY}"}
-    params = {"granularity": GRANULARITY, "count": count}
+def fetch_ohlc_data(instrument="EUR_USD", from_time=None, count=100, to_time=None, granularity=GRANULARITY):
+    """
+    Fetch OHLC candles from the OANDA API.
+
+    Args:
+        instrument (str): The instrument to fetch candles for (e.g., 'EUR_USD').
+        from_time (datetime): Optional UTC start of the range.
+        count (int): Number of candles to fetch; ignored when to_time is given.
+        to_time (datetime): Optional UTC end of the range.
+        granularity (str): OANDA granularity code (e.g., 'D', 'H1', 'M5').
+
+    Returns:
+        list: List of raw candles.
+    """
+    params = {}
+    # OANDA rejects count together with both from and to
+    if to_time is None:
+        params["count"] = count
 
     # Formatting the from_time to ISO 8601 (UTC with 'Z' at the end, no offsets)
     if from_time:
-        # Set time to midnight UTC for daily data and format it properly
-        from_time_utc = from_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        params["from"] = from_time_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if granularity == "D":
+            # Set time to midnight UTC for daily data and format it properly
+            from_time = from_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        params["from"] = from_time.strftime("%Y-%m-%dT%H:%M:%SZ")
         print(f"Fetching data from {params['from']}")  # Debug print statement
+    if to_time:
+        params["to"] = to_time.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     try:
-        response = requests.get(OANDA_API_URL, headers=headers, params=params)
-        response.raise_for_status()
+        # The shared client reuses pooled keep-alive connections; cached candles skip the network
+        return fetch_candles(get_client(OANDA_API_KEY), instrument, granularity, **params)
     except requests.exceptions.HTTPError as e:
         print(f"HTTP Error: {e}")
-        print(f"Request URL was: {response.url}")
+        print(f"Request URL was: {e.response.url}")
         raise
-    return response.json()["candles"]
 
 def fetch_data(currency_pair="EUR_USD"):
     """
@@ -2,36 +2,28 @@
 This module handles fetching forex data EURUSD and basic cleaning of the data
 """
 
-import requests
 from requests.exceptions import HTTPError, ConnectionError, Timeout
 import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
+from scripts.oanda_client import get_client
+from scripts.candle_cache import fetch_candles
 
 # Function to fetch EUR/USD data from OANDA API
-def fetch_forex_data(api_key):
-    """Fetches and returns historical daily forex data for EUR/USD from the OANDA API.
+def fetch_forex_data(api_key, instrument='EUR_USD'):
+    """Fetches and returns historical daily forex data for an instrument from the OANDA API.
 
         Args:
             api_key (str): OANDA API key for authorisation.
+            instrument (str): The instrument to fetch, EUR/USD by default.
 
         Returns:
-            pd.DataFrame: Dataframe containing the time and close prices for EUR/USD.
+            pd.DataFrame: Dataframe containing the time and close prices for the instrument.
         """
-    # Defining the API endpoint and set necessary headers and query parameters
-    url = "https://api-fxpractice.oanda.com/v3/instruments/EUR_USD/candles"
-    headers = {'Authorization': f'Bearer {api_key}'}
-    params = {
-        'count': 500,
-        'granularity': 'D'
-    }
-
-    # Making the API request and parse the response into JSON
+    # Making the API request through the shared pooled client and the local candle cache
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()  # Will raise an exception for HTTP errors
-        data = response.json()
+        candles = fetch_candles(get_client(api_key), instrument, 'D', count=500)
     except HTTPError as http_err:
         # Handling specific HTTP errors based on status codes
         status_code = http_err.response.status_code
@@ -50,7 +42,7 @@ def fetch_forex_data(api_key):
         return None
 
     # Extracting prices and times into a DataFrame
-    prices = [{'time': x['time'], 'close': x['mid']['c']} for x in data['candles']]
+    prices = [{'time': x['time'], 'close': x['mid']['c']} for x in candles]
 
     # Converting the list of prices to a DataFrame,
     df = pd.DataFrame(prices)
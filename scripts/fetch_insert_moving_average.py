@@ -1,10 +1,14 @@
 from datetime import datetime, timedelta
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 from database.db_connect import get_session
+from database.dimensions import get_instrument_id, find_instrument_id, granularity_id, DEFAULT_GRANULARITY
 from database.schema.create_tables import CurrencyData, MovingAverage
+from database.schema.partitions import ensure_partitions
 import logging
 from scripts.fetch_data import fetch_ohlc_data
+from scripts.indicators import parse_closes, moving_averages
+import math
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,41 +18,116 @@ logging.basicConfig(level=logging.INFO)
 
 MOVING_AVG_WINDOWS = [5, 50]  # Moving average window sizes
 
-def get_latest_timestamp():
+def get_latest_timestamp(currency_pair="EUR/USD", granularity=DEFAULT_GRANULARITY):
     """
-    Fetch the latest timestamp in the currency_data table.
+    Fetch the latest timestamp of one series in the currency_data table.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+
+    Returns:
+        datetime: The latest stored candle of the series, or None if it has none.
     """
     session = get_session()()
     try:
-        latest_record = session.query(CurrencyData).order_by(desc(CurrencyData.timestamp)).first()
-        if latest_record:
-            return latest_record.timestamp
-        return None
+        instrument_id = find_instrument_id(session, currency_pair)
+        if instrument_id is None:
+            return None
+        return session.query(func.max(CurrencyData.timestamp)) \
+            .filter(CurrencyData.instrument_id == instrument_id,
+                    CurrencyData.granularity_id == granularity_id(granularity)) \
+            .scalar()
     finally:
         session.close()
 
 
-def calculate_moving_averages(data, windows=MOVING_AVG_WINDOWS):
+def get_trailing_closes(count, currency_pair="EUR/USD"):
+    """
+    Fetch the most recent close prices stored in the currency_data table.
+
+    Args:
+        count (int): Maximum number of closes to fetch.
+        currency_pair (str): The currency pair.
+
+    Returns:
+        list: Close prices, oldest first; empty for a pair that is not registered.
+    """
+    if count <= 0:
+        return []
+    session = get_session()()
+    try:
+        instrument_id = find_instrument_id(session, currency_pair)
+        if instrument_id is None:
+            return []
+        rows = session.query(CurrencyData.close) \
+            .filter(CurrencyData.instrument_id == instrument_id,
+                    CurrencyData.granularity_id == granularity_id(DEFAULT_GRANULARITY)) \
+            .order_by(desc(CurrencyData.timestamp)) \
+            .limit(count) \
+            .all()
+        return [row.close for row in reversed(rows)]
+    finally:
+        session.close()
+
+
+def calculate_moving_average_columns(data, windows=MOVING_AVG_WINDOWS, history=None):
     """
     Calculate moving averages for each specified window size.
+
+    Args:
+        data (list): List of raw candles.
+        windows (list): Window sizes.
+        history (list): Closes stored before the first candle, oldest first; with at least
+            max(windows) - 1 of them every new candle gets a value.
+
+    Returns:
+        dict: Moving average column (np.ndarray aligned with data, NaN without enough history) keyed by window size.
+    """
+    return moving_averages(parse_closes(data), windows, history)
+
+
+def calculate_moving_averages(data, windows=MOVING_AVG_WINDOWS):
+    """
+    Calculate moving averages for each specified window size and store them in the candles.
+
+    Kept for callers expecting 'moving_avg_<window>' keys; new code should use calculate_moving_average_columns.
     """
-    for window in windows:
+    columns = calculate_moving_average_columns(data, windows)
+    for window, column in columns.items():
         for i in range(window - 1, len(data)):
-            window_data = data[i - window + 1:i + 1]
-            moving_avg = sum(float(item['mid']['c']) for item in window_data) / window
-            data[i][f"moving_avg_{window}"] = moving_avg
+            data[i][f"moving_avg_{window}"] = float(column[i])
     return data
 
 
-def insert_currency_and_moving_avg_data(data):
+def insert_currency_and_moving_avg_data(data, moving_avg_columns=None, currency_pair="EUR/USD"):
+    """
+    Insert candles and their moving averages.
+
+    Args:
+        data (list): List of raw candles.
+        moving_avg_columns (dict): Moving average columns keyed by window size; when omitted the
+            'moving_avg_<window>' keys set by calculate_moving_averages are used.
+        currency_pair (str): The currency pair of the candles.
+    """
+    if moving_avg_columns is None:
+        moving_avg_columns = {
+            window: [record.get(f"moving_avg_{window}", math.nan) for record in data]
+            for window in MOVING_AVG_WINDOWS
+        }
     session = get_session()()
     try:
         new_records = []
         moving_avg_records = []
-        for record in data:
-            timestamp = datetime.strptime(record['time'][:19], '%Y-%m-%dT%H:%M:%S')
+        timestamps = [datetime.strptime(record['time'][:19], '%Y-%m-%dT%H:%M:%S') for record in data]
+        if timestamps:
+            ensure_partitions(session.get_bind(), min(timestamps), max(timestamps))
+        instrument_id = get_instrument_id(session, currency_pair)
+        for i, record in enumerate(data):
+            timestamp = timestamps[i]
             currency_data = CurrencyData(
-                currency_pair="EUR/USD",
+                instrument_id=instrument_id,
+                granularity_id=granularity_id(DEFAULT_GRANULARITY),
                 timestamp=timestamp,
                 open=float(record['mid']['o']),
                 high=float(record['mid']['h']),
@@ -60,13 +139,13 @@ def insert_currency_and_moving_avg_data(data):
             session.flush()  # Flush to get currency_data.id for moving averages
 
             # Inserting moving averages for specified windows
-            for window in MOVING_AVG_WINDOWS:
-                if f"moving_avg_{window}" in record:
+            for window, column in moving_avg_columns.items():
+                if not math.isnan(column[i]):
                     moving_avg_record = MovingAverage(
                         currency_data_id=currency_data.id,
                         timestamp=timestamp,
                         window_size=window,
-                        moving_average=record[f"moving_avg_{window}"]
+                        moving_average=float(column[i])
                     )
                     moving_avg_records.append(moving_avg_record)
 
@@ -84,24 +163,31 @@ def insert_currency_and_moving_avg_data(data):
         session.close()
 
 
-def main():
-    # Checking for the latest timestamp in the database
-    latest_timestamp = get_latest_timestamp()
+def main(currency_pair="EUR/USD"):
+    """
+    Fetch the daily candles of a pair stored since its latest one and insert them with their moving averages.
+
+    Args:
+        currency_pair (str): The currency pair, e.g. 'EUR/USD'.
+    """
+    instrument = currency_pair.replace('/', '_')
+    # Checking for the latest timestamp of this pair's daily series in the database
+    latest_timestamp = get_latest_timestamp(currency_pair)
 
     if latest_timestamp:
         # Calculating the start date for fetching data as the day after the latest timestamp
         from_time = latest_timestamp + timedelta(days=1)
-        data = fetch_ohlc_data(from_time=from_time)
+        data = fetch_ohlc_data(instrument, from_time=from_time)
         logging.info(f"Fetched {len(data)} new records from OANDA API starting from {from_time}")
 
-        # Calculating moving averages and insert data into the database
-        data_with_moving_avg = calculate_moving_averages(data)
-        insert_currency_and_moving_avg_data(data_with_moving_avg)
+        # Continuing the moving averages from the closes already stored, so the first new candles get values too
+        history = get_trailing_closes(max(MOVING_AVG_WINDOWS) - 1, currency_pair)
+        insert_currency_and_moving_avg_data(data, calculate_moving_average_columns(data, history=history),
+                                            currency_pair)
     else:
         # If no data exists, fetching the initial set of data (last 100 days, for example)
-        data = fetch_ohlc_data()
-        data_with_moving_avg = calculate_moving_averages(data)
-        insert_currency_and_moving_avg_data(data_with_moving_avg)
+        data = fetch_ohlc_data(instrument)
+        insert_currency_and_moving_avg_data(data, calculate_moving_average_columns(data), currency_pair)
         logging.info(f"Fetched and inserted the initial {len(data)} records from OANDA API")
 
 
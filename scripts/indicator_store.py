@@ -0,0 +1,253 @@
+"""
+This module reads and writes indicator values in the wide candle_indicators table.
+
+Each candle has one row holding all of its indicators as a JSON object, instead of one
+moving_average row per candle and window. Writes merge new values into the existing object, so
+indicators computed by separate runs accumulate in the same row.
+
+    python -m scripts.indicator_store migrate   # copy moving_average rows into candle_indicators
+"""
+
+import argparse
+import logging
+import math
+from sqlalchemy import select, and_, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from database.db_connect import get_session, get_engine
+from database.dimensions import get_instrument_id, find_instrument_id, granularity_id, DEFAULT_GRANULARITY
+from database.schema.create_tables import CurrencyData, MovingAverage, CandleIndicators
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Rows per statement when writing indicators
+INDICATOR_BATCH_SIZE = 1000
+
+# Primary key of candle_indicators, the conflict target of every write
+INDICATOR_KEY_COLUMNS = ('instrument_id', 'granularity_id', 'timestamp')
+
+# CurrencyData columns returned next to the indicators
+CANDLE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def build_indicator_rows(instrument_id, granularity_id, timestamps, columns):
+    """
+    Turn indicator columns into one row per candle, dropping values that are not available yet.
+
+    Args:
+        instrument_id (int): Id of the currency pair.
+        granularity_id (int): Id of the candle granularity.
+        timestamps (list): Candle timestamps.
+        columns (dict): Indicator arrays aligned with timestamps, keyed by name.
+
+    Returns:
+        list: Row dicts for candle_indicators; candles without any value are left out.
+    """
+    rows = []
+    for i, timestamp in enumerate(timestamps):
+        values = {name: float(column[i]) for name, column in columns.items() if not math.isnan(column[i])}
+        if values:
+            rows.append({'instrument_id': instrument_id, 'granularity_id': granularity_id, 'timestamp': timestamp,
+                         'values': values})
+    return rows
+
+
+def _write_batch_postgresql(session, rows):
+    """Upsert rows, merging the JSONB objects of existing rows with ||."""
+    statement = pg_insert(CandleIndicators.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(INDICATOR_KEY_COLUMNS),
+        set_={'values': CandleIndicators.__table__.c['values'].op('||')(statement.excluded['values'])},
+    )
+    session.execute(statement, rows)
+
+
+def _write_batch_generic(session, rows):
+    """Merge rows into existing ones in Python, for databases without JSONB."""
+    timestamps = [row['timestamp'] for row in rows]
+    # One range query covers the batch, as all rows belong to the same series
+    existing = {
+        record.timestamp: record
+        for record in session.query(CandleIndicators).filter(
+            CandleIndicators.instrument_id == rows[0]['instrument_id'],
+            CandleIndicators.granularity_id == rows[0]['granularity_id'],
+            CandleIndicators.timestamp.between(min(timestamps), max(timestamps)))
+    }
+    for row in rows:
+        record = existing.get(row['timestamp'])
+        if record is None:
+            session.add(CandleIndicators(**row))
+        else:
+            record.values = {**record.values, **row['values']}
+
+
+def write_indicators(currency_pair, timestamps, columns, session=None, granularity=DEFAULT_GRANULARITY):
+    """
+    Store indicator columns in candle_indicators, merging them with values already stored.
+
+    Args:
+        currency_pair (str): The currency pair.
+        timestamps (list): Candle timestamps.
+        columns (dict): Indicator arrays aligned with timestamps, keyed by name, e.g. from compute_indicators.
+        session (Session): Optional session to use; a new one is created and committed otherwise.
+        granularity (str): OANDA granularity code of the candles.
+
+    Returns:
+        int: Number of rows written.
+    """
+    own_session = session is None
+    session = session or get_session()()
+    write_batch = _write_batch_postgresql if session.get_bind().dialect.name == 'postgresql' else _write_batch_generic
+    try:
+        rows = build_indicator_rows(get_instrument_id(session, currency_pair), granularity_id(granularity),
+                                    timestamps, columns)
+        for start in range(0, len(rows), INDICATOR_BATCH_SIZE):
+            write_batch(session, rows[start:start + INDICATOR_BATCH_SIZE])
+        session.commit()
+        logging.info(f"Stored indicators for {len(rows)} {currency_pair} candles")
+        return len(rows)
+    except SQLAlchemyError as e:
+        session.rollback()
+        logging.error(f"Error storing indicators: {e}")
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+
+def build_range_query(instrument_id, granularity_id, from_time=None, to_time=None, names=None):
+    """
+    Build the query reading candles and their indicators for a time range.
+
+    Args:
+        instrument_id (int): Id of the currency pair.
+        granularity_id (int): Id of the candle granularity.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        names (list): Indicators to read as separate columns; None reads the whole values object.
+
+    Returns:
+        sqlalchemy.sql.Select: Query ordered by timestamp.
+    """
+    values = CandleIndicators.__table__.c['values']
+    if names is None:
+        indicator_columns = [values.label('indicators')]
+    else:
+        indicator_columns = [values[name].as_float().label(name) for name in names]
+    conditions = [CurrencyData.instrument_id == instrument_id, CurrencyData.granularity_id == granularity_id]
+    # The range is repeated for candle_indicators, as the planner does not carry it across the outer join
+    join_conditions = [CandleIndicators.instrument_id == CurrencyData.instrument_id,
+                       CandleIndicators.granularity_id == CurrencyData.granularity_id,
+                       CandleIndicators.timestamp == CurrencyData.timestamp]
+    if from_time is not None:
+        conditions.append(CurrencyData.timestamp >= from_time)
+        join_conditions.append(CandleIndicators.timestamp >= from_time)
+    if to_time is not None:
+        conditions.append(CurrencyData.timestamp < to_time)
+        join_conditions.append(CandleIndicators.timestamp < to_time)
+    return select(*[getattr(CurrencyData, column) for column in CANDLE_COLUMNS], *indicator_columns) \
+        .outerjoin(CandleIndicators, and_(*join_conditions)) \
+        .where(*conditions) \
+        .order_by(CurrencyData.timestamp)
+
+
+def read_candles_with_indicators(currency_pair, from_time=None, to_time=None, names=None, session=None,
+                                 granularity=DEFAULT_GRANULARITY):
+    """
+    Read candles of a time range together with their indicators.
+
+    Args:
+        currency_pair (str): The currency pair.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        names (list): Indicators to return; None returns every stored indicator.
+        session (Session): Optional session to use.
+        granularity (str): OANDA granularity code of the candles.
+
+    Returns:
+        list: One dict per candle with the CurrencyData columns and the indicator values
+        (None where an indicator has no value); empty for a pair that is not registered.
+    """
+    own_session = session is None
+    session = session or get_session()()
+    try:
+        instrument_id = find_instrument_id(session, currency_pair)
+        if instrument_id is None:
+            return []
+        query = build_range_query(instrument_id, granularity_id(granularity), from_time, to_time, names)
+        result = session.execute(query)
+        rows = []
+        for row in result.mappings():
+            row = dict(row)
+            if names is None:
+                row.update(row.pop('indicators') or {})
+            rows.append(row)
+        return rows
+    finally:
+        if own_session:
+            session.close()
+
+
+def migrate_moving_averages(engine=None):
+    """
+    Copy every moving_average row into candle_indicators with a single INSERT ... SELECT.
+
+    Each window becomes the key sma_<window>; values already in candle_indicators are kept and
+    merged, so the migration can be rerun safely. The moving_average table itself is left untouched.
+
+    Args:
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        int: Number of candle_indicators rows written.
+    """
+    engine = engine or get_engine()
+    postgresql = engine.dialect.name == 'postgresql'
+    # Each window becomes the key compute_indicators uses for simple moving averages
+    if postgresql:
+        key = func.concat('sma_', MovingAverage.window_size)
+    else:
+        key = literal('sma_').op('||')(MovingAverage.window_size)
+    aggregate = func.jsonb_object_agg if postgresql else func.json_group_object
+    source = select(
+        CurrencyData.instrument_id,
+        CurrencyData.granularity_id,
+        CurrencyData.timestamp,
+        aggregate(key, MovingAverage.moving_average),
+    ).select_from(MovingAverage) \
+        .join(CurrencyData, CurrencyData.id == MovingAverage.currency_data_id) \
+        .group_by(CurrencyData.instrument_id, CurrencyData.granularity_id, CurrencyData.timestamp)
+    columns = [*INDICATOR_KEY_COLUMNS, 'values']
+
+    table = CandleIndicators.__table__
+    if postgresql:
+        statement = pg_insert(table).from_select(columns, source)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(INDICATOR_KEY_COLUMNS),
+            set_={'values': table.c['values'].op('||')(statement.excluded['values'])},
+        )
+    else:
+        # SQLite needs a WHERE clause to tell the SELECT from the upsert clause; json_patch merges the objects
+        statement = sqlite_insert(table).from_select(columns, source.where(literal(True)))
+        statement = statement.on_conflict_do_update(
+            index_elements=list(INDICATOR_KEY_COLUMNS),
+            set_={'values': func.json_patch(table.c['values'], statement.excluded['values'])},
+        )
+
+    with engine.begin() as connection:
+        written = connection.execute(statement).rowcount
+    logging.info(f"Migrated moving averages of {written} candles into candle_indicators")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the wide candle_indicators table.")
+    parser.add_argument('command', choices=['migrate'], help="migrate: copy moving_average rows into candle_indicators")
+    parser.parse_args()
+    migrate_moving_averages()
+
+
+if __name__ == "__main__":
+    main()
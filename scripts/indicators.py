@@ -0,0 +1,367 @@
+"""
+This module computes technical indicators on NumPy arrays.
+
+Candle prices are parsed once into float arrays and every indicator is returned as a column array
+aligned with the input candles, with NaN where there is not enough history yet.
+
+compute_indicators evaluates a declarative list of indicator specs in one pass, e.g.
+
+    specs = [{'indicator': 'sma', 'period': 50}, {'indicator': 'rsi', 'period': 14},
+             {'indicator': 'macd', 'fast': 12, 'slow': 26, 'signal': 9}]
+    columns, state = compute_indicators(prices, specs)
+    new_columns, state = compute_indicators(new_prices, specs, state)
+
+and returns a state that lets the next call continue the series from new candles only.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Rolling sums are restarted from scratch at least every this many rows, so rounding errors of the
+# cumulative sums cannot build up over long series
+ANCHOR_INTERVAL = 4096
+
+
+def parse_prices(data, field='c'):
+    """
+    Parse one mid price field of raw OANDA candles into a float array.
+
+    Args:
+        data (list): List of raw candles.
+        field (str): Price field: 'o', 'h', 'l' or 'c'.
+
+    Returns:
+        np.ndarray: Prices as float64.
+    """
+    return np.fromiter((item['mid'][field] for item in data), dtype=np.float64, count=len(data))
+
+
+def parse_closes(data):
+    """
+    Parse the close prices of raw OANDA candles into a float array.
+
+    Args:
+        data (list): List of raw candles.
+
+    Returns:
+        np.ndarray: Close prices as float64.
+    """
+    return parse_prices(data, 'c')
+
+
+def rolling_mean(values, window, anchor_interval=ANCHOR_INTERVAL):
+    """
+    Calculate the simple moving average of an array in O(n).
+
+    The values are centred on their first element and summed block by block; each block's
+    cumulative sum starts window-1 rows before the block, so no sum runs over more than
+    anchor_interval + window rows.
+
+    Args:
+        values (np.ndarray): Input series.
+        window (int): Window size.
+        anchor_interval (int): Rows per block of cumulative sums.
+
+    Returns:
+        np.ndarray: Moving averages, NaN for the first window-1 rows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window < 1:
+        raise ValueError(f"Window size must be positive, got {window}")
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+
+    offset = values[0]
+    block = max(anchor_interval, window)
+    for start in range(window - 1, len(values), block):
+        stop = min(start + block, len(values))
+        # Sums of the windows ending at start..stop-1, from a cumulative sum over start-window+1..stop-1
+        cumulative = np.cumsum(values[start - window + 1:stop] - offset)
+        sums = cumulative[window - 1:].copy()
+        sums[1:] -= cumulative[:-window]
+        result[start:stop] = sums / window + offset
+    return result
+
+
+def moving_averages(closes, windows, history=None):
+    """
+    Calculate simple moving averages for several window sizes.
+
+    Passing the closes preceding the series as history continues the averages from an earlier
+    run: only max(windows) - 1 trailing closes are needed for the first new rows to get values.
+
+    Args:
+        closes (np.ndarray): Close prices.
+        windows (list): Window sizes.
+        history (np.ndarray): Closes immediately before closes, oldest first.
+
+    Returns:
+        dict: Moving average column aligned with closes, keyed by window size.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if history is None or len(history) == 0:
+        return {window: rolling_mean(closes, window) for window in windows}
+    history = np.asarray(history, dtype=np.float64)
+    combined = np.concatenate([history, closes])
+    return {window: rolling_mean(combined, window)[len(history):] for window in windows}
+
+
+def rolling_std(values, window):
+    """
+    Calculate the rolling population standard deviation in O(n).
+
+    Args:
+        values (np.ndarray): Input series.
+        window (int): Window size.
+
+    Returns:
+        np.ndarray: Standard deviations, NaN for the first window-1 rows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.array([])
+    centred = values - values[0]
+    variance = rolling_mean(centred ** 2, window) - rolling_mean(centred, window) ** 2
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def exponential_average(values, alpha, initial=None, period=None):
+    """
+    Calculate an exponential moving average y[t] = alpha * x[t] + (1 - alpha) * y[t-1].
+
+    Without an initial value the average is seeded with the simple average of the first `period`
+    values, as in TA-Lib, and the rows before it are NaN. Leading NaN values are skipped.
+
+    Args:
+        values (np.ndarray): Input series.
+        alpha (float): Smoothing factor.
+        initial (float): Average before the first value, carried over from an earlier run.
+        period (int): Seed length when no initial value is given.
+
+    Returns:
+        np.ndarray: Exponential averages.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return result
+    first = valid[0]
+
+    if initial is None:
+        seed_end = first + period
+        if seed_end > len(values):
+            return result
+        initial = values[first:seed_end].mean()
+        result[seed_end - 1] = initial
+        first = seed_end
+    if first < len(values):
+        # pandas runs the recursion in compiled code; the carried value is prepended as its first row
+        series = pd.Series(np.concatenate([[initial], values[first:]]))
+        result[first:] = series.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+    return result
+
+
+def true_range(high, low, close, previous_close=None):
+    """
+    Calculate the true range max(high - low, |high - previous close|, |low - previous close|).
+
+    Args:
+        high (np.ndarray): High prices.
+        low (np.ndarray): Low prices.
+        close (np.ndarray): Close prices.
+        previous_close (float): Close before the first row; without it the first range is high - low.
+
+    Returns:
+        np.ndarray: True ranges.
+    """
+    if len(close) == 0:
+        return np.array([])
+    previous = np.concatenate([[np.nan if previous_close is None else previous_close], close[:-1]])
+    ranges = np.vstack([high - low, np.abs(high - previous), np.abs(low - previous)])
+    return np.nanmax(ranges, axis=0)
+
+
+def _last(values):
+    """Return the last value of an array, NaN when it is empty."""
+    return values[-1] if len(values) else np.nan
+
+
+def _sma(prices, spec, carried, offset):
+    period = spec['period']
+    return {spec['name']: rolling_mean(prices['close'], period)[offset:]}, None
+
+
+def _ema(prices, spec, carried, offset):
+    period = spec['period']
+    alpha = 2.0 / (period + 1)
+    if carried is not None:
+        values = exponential_average(prices['close'][offset:], alpha, initial=carried['ema'])
+    else:
+        values = exponential_average(prices['close'], alpha, period=period)[offset:]
+    return {spec['name']: values}, {'ema': _last(values)}
+
+
+def _rsi(prices, spec, carried, offset):
+    period = spec['period']
+    alpha = 1.0 / period  # Wilder's smoothing
+    close = prices['close']
+    if carried is not None:
+        change = np.diff(close[offset - 1:])
+        average_gain = exponential_average(np.maximum(change, 0.0), alpha, initial=carried['average_gain'])
+        average_loss = exponential_average(np.maximum(-change, 0.0), alpha, initial=carried['average_loss'])
+    else:
+        change = np.concatenate([[np.nan], np.diff(close)])
+        average_gain = exponential_average(np.maximum(change, 0.0, where=~np.isnan(change), out=change.copy()),
+                                           alpha, period=period)[offset:]
+        average_loss = exponential_average(np.maximum(-change, 0.0, where=~np.isnan(change), out=change.copy()),
+                                           alpha, period=period)[offset:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(average_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + average_gain / average_loss))
+    values[np.isnan(average_gain)] = np.nan
+    return {spec['name']: values}, {'average_gain': _last(average_gain), 'average_loss': _last(average_loss)}
+
+
+def _atr(prices, spec, carried, offset):
+    period = spec['period']
+    alpha = 1.0 / period  # Wilder's smoothing
+    if carried is not None:
+        ranges = true_range(prices['high'][offset:], prices['low'][offset:], prices['close'][offset:],
+                            previous_close=prices['close'][offset - 1])
+        values = exponential_average(ranges, alpha, initial=carried['atr'])
+    else:
+        ranges = true_range(prices['high'], prices['low'], prices['close'])
+        values = exponential_average(ranges, alpha, period=period)[offset:]
+    return {spec['name']: values}, {'atr': _last(values)}
+
+
+def _macd(prices, spec, carried, offset):
+    fast, slow, signal = spec['fast'], spec['slow'], spec['signal']
+    close = prices['close']
+    if carried is not None:
+        fast_ema = exponential_average(close[offset:], 2.0 / (fast + 1), initial=carried['fast_ema'])
+        slow_ema = exponential_average(close[offset:], 2.0 / (slow + 1), initial=carried['slow_ema'])
+        line = fast_ema - slow_ema
+        signal_line = exponential_average(line, 2.0 / (signal + 1), initial=carried['signal'])
+    else:
+        fast_ema = exponential_average(close, 2.0 / (fast + 1), period=fast)
+        slow_ema = exponential_average(close, 2.0 / (slow + 1), period=slow)
+        line = fast_ema - slow_ema
+        signal_line = exponential_average(line, 2.0 / (signal + 1), period=signal)
+        fast_ema, slow_ema, line, signal_line = (column[offset:] for column in (fast_ema, slow_ema, line, signal_line))
+    name = spec['name']
+    columns = {name: line, f"{name}_signal": signal_line, f"{name}_hist": line - signal_line}
+    return columns, {'fast_ema': _last(fast_ema), 'slow_ema': _last(slow_ema), 'signal': _last(signal_line)}
+
+
+def _bollinger(prices, spec, carried, offset):
+    period, width = spec['period'], spec.get('width', 2.0)
+    middle = rolling_mean(prices['close'], period)[offset:]
+    deviation = rolling_std(prices['close'], period)[offset:]
+    name = spec['name']
+    columns = {f"{name}_middle": middle, f"{name}_upper": middle + width * deviation,
+               f"{name}_lower": middle - width * deviation}
+    return columns, None
+
+
+# Indicator name -> (function, spec keys forming the default column name, rows of history it needs)
+INDICATORS = {
+    'sma': (_sma, ('period',), lambda spec: spec['period']),
+    'ema': (_ema, ('period',), lambda spec: spec['period']),
+    'rsi': (_rsi, ('period',), lambda spec: spec['period'] + 1),
+    'atr': (_atr, ('period',), lambda spec: spec['period']),
+    'macd': (_macd, ('fast', 'slow', 'signal'), lambda spec: spec['slow'] + spec['signal']),
+    'bollinger': (_bollinger, ('period',), lambda spec: spec['period']),
+}
+
+DEFAULT_INDICATOR_SPECS = [
+    {'indicator': 'sma', 'period': 5},
+    {'indicator': 'sma', 'period': 50},
+    {'indicator': 'ema', 'period': 20},
+    {'indicator': 'rsi', 'period': 14},
+    {'indicator': 'atr', 'period': 14},
+    {'indicator': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+    {'indicator': 'bollinger', 'period': 20, 'width': 2.0},
+]
+
+
+def normalise_spec(spec):
+    """
+    Validate an indicator spec and fill in its column name.
+
+    Args:
+        spec (dict): Spec with an 'indicator' key, its parameters and an optional 'name'.
+
+    Returns:
+        dict: Copy of the spec with 'name' set, e.g. 'rsi_14' or 'macd_12_26_9'.
+    """
+    if spec.get('indicator') not in INDICATORS:
+        raise ValueError(f"Unknown indicator {spec.get('indicator')!r}; expected one of {sorted(INDICATORS)}")
+    _, keys, _ = INDICATORS[spec['indicator']]
+    missing = [key for key in keys if key not in spec]
+    if missing:
+        raise ValueError(f"Indicator spec {spec} is missing {missing}")
+    name = spec.get('name') or '_'.join([spec['indicator']] + [str(spec[key]) for key in keys])
+    return {**spec, 'name': name}
+
+
+def prices_from_candles(data):
+    """
+    Parse raw OANDA candles into the OHLC arrays used by compute_indicators.
+
+    Args:
+        data (list): List of raw candles.
+
+    Returns:
+        dict: 'open', 'high', 'low' and 'close' arrays, named like the CurrencyData columns.
+    """
+    return {column: parse_prices(data, field) for column, field in
+            (('open', 'o'), ('high', 'h'), ('low', 'l'), ('close', 'c'))}
+
+
+def compute_indicators(prices, specs=DEFAULT_INDICATOR_SPECS, state=None):
+    """
+    Compute several indicators in one pass over OHLC arrays.
+
+    The returned state holds the trailing prices the windowed indicators need and the last values
+    of the recursive ones (EMA, RSI, ATR, MACD). Passing it back with the prices that follow
+    continues every indicator exactly as if the whole series had been computed at once.
+
+    Args:
+        prices (dict): 'high', 'low' and 'close' arrays (and optionally 'open'), oldest first.
+        specs (list): Indicator specs, see normalise_spec.
+        state (dict): State returned by the previous call for the preceding prices.
+
+    Returns:
+        tuple: Columns keyed by name aligned with prices, and the state after the last row.
+    """
+    specs = [normalise_spec(spec) for spec in specs]
+    fields = [field for field in ('high', 'low', 'close') if field in prices]
+    prices = {field: np.asarray(prices[field], dtype=np.float64) for field in fields}
+    length = len(prices['close'])
+
+    tail = (state or {}).get('tail', {})
+    offset = len(tail.get('close', ()))
+    if offset:
+        prices = {field: np.concatenate([tail[field], prices[field]]) for field in fields}
+    carried = (state or {}).get('carried', {}) if offset else {}
+
+    columns, new_carried = {}, {}
+    for spec in specs:
+        function, _, _ = INDICATORS[spec['indicator']]
+        spec_state = carried.get(spec['name'])
+        spec_columns, spec_carried = function(prices, spec, spec_state, offset)
+        if length == 0:
+            spec_carried = spec_state
+        columns.update(spec_columns)
+        # Recursive indicators are only carried once they have a value; until then the tail holds all history
+        if spec_carried is not None and not any(np.isnan(value) for value in spec_carried.values()):
+            new_carried[spec['name']] = spec_carried
+
+    history = max([INDICATORS[spec['indicator']][2](spec) for spec in specs], default=1)
+    new_state = {
+        'tail': {field: prices[field][-history:].copy() for field in fields},
+        'carried': new_carried,
+    }
+    return columns, new_state
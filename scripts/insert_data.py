@@ -2,14 +2,28 @@
 This module handles the insertion of currency data into the database.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, or_, literal_column, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
 from database.db_connect import get_session
+from database.dimensions import (get_instrument_id, find_instrument_id, granularity_id, DEFAULT_GRANULARITY,
+                                 GRANULARITIES)
 from database.schema.create_tables import CurrencyData
+from database.schema.partitions import ensure_partitions
 from scripts.fetch_data import fetch_data
+from scripts.rollups import refresh_rollups, ROLLUP_BASE
 import logging
 
-def record_exists(session, currency_pair, timestamp):
+# Rows per INSERT statement; keeps each statement well below PostgreSQL's bind parameter limit
+UPSERT_BATCH_SIZE = 1000
+
+# Columns identifying a candle (the conflict target) and the columns that can change on re-fetch
+CURRENCY_DATA_KEY_COLUMNS = ('instrument_id', 'granularity_id', 'timestamp')
+CURRENCY_DATA_VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def record_exists(session, currency_pair, timestamp, granularity=DEFAULT_GRANULARITY):
     """
     Check if a record already exists in the database.
 
@@ -17,49 +31,75 @@ def record_exists(session, currency_pair, timestamp):
         session (Session): SQLAlchemy session object.
         currency_pair (str): The currency pair (e.g., 'EUR/USD').
         timestamp (datetime): The timestamp of the record.
+        granularity (str): OANDA granularity code of the candle.
 
     Returns:
-        bool: True if the record exists, False otherwise.
+        bool: True if the record exists, False otherwise, also for a pair that is not registered.
     """
-    return session.query(CurrencyData).filter_by(currency_pair=currency_pair, timestamp=timestamp).first() is not None
+    instrument_id = find_instrument_id(session, currency_pair)
+    if instrument_id is None:
+        return False
+    return session.query(CurrencyData).filter_by(instrument_id=instrument_id,
+                                                 granularity_id=granularity_id(granularity),
+                                                 timestamp=timestamp).first() is not None
 
-def create_currency_data_record(record):
+def create_currency_data_row(record, instrument_id, granularity_id=granularity_id(DEFAULT_GRANULARITY)):
     """
-    Create a CurrencyData record from raw data.
+    Create a plain currency_data row from raw data.
 
     Args:
         record (dict): A dictionary containing raw data for a single record.
+        instrument_id (int): Id of the instrument the record belongs to (see get_instrument_id).
+        granularity_id (int): Id of the candle granularity.
 
     Returns:
-        CurrencyData: An instance of CurrencyData populated with the provided data.
+        dict: Column values for a single currency_data row.
     """
     time_str = record['time'][:26] + 'Z'
     timestamp = datetime.strptime(time_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-    return CurrencyData(
-        currency_pair='EUR/USD',
-        timestamp=timestamp,
-        open=float(record['mid']['o']),
-        high=float(record['mid']['h']),
-        low=float(record['mid']['l']),
-        close=float(record['mid']['c']),
-        volume=record['volume']
-    )
-
-def insert_currency_data(data):
+    return {
+        'instrument_id': instrument_id,
+        'granularity_id': granularity_id,
+        'timestamp': timestamp,
+        'open': float(record['mid']['o']),
+        'high': float(record['mid']['h']),
+        'low': float(record['mid']['l']),
+        'close': float(record['mid']['c']),
+        'volume': record['volume'],
+    }
+
+def create_currency_data_record(record, instrument_id, granularity_id=granularity_id(DEFAULT_GRANULARITY)):
+    """
+    Create a CurrencyData record from raw data.
+
+    Args:
+        record (dict): A dictionary containing raw data for a single record.
+        instrument_id (int): Id of the instrument the record belongs to.
+        granularity_id (int): Id of the candle granularity.
+
+    Returns:
+        CurrencyData: An instance of CurrencyData populated with the provided data.
+    """
+    return CurrencyData(**create_currency_data_row(record, instrument_id, granularity_id))
+
+def insert_currency_data(data, currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY):
     """
     Insert fetched currency data into the database.
 
     Args:
         data (list): List of currency data points to insert.
+        currency_pair (str): The currency pair the data points belong to.
+        granularity (str): OANDA granularity code of the data points.
     """
     Session = get_session()
     session = Session()
     try:
+        instrument_id = get_instrument_id(session, currency_pair)
         new_records = []
         for record in data:
             # Create record and check if it exists
-            currency_data = create_currency_data_record(record)
-            if not record_exists(session, currency_data.currency_pair, currency_data.timestamp):
+            currency_data = create_currency_data_record(record, instrument_id, granularity_id(granularity))
+            if not record_exists(session, currency_pair, currency_data.timestamp, granularity):
                 new_records.append(currency_data)
             else:
                 logging.info(f"Record already exists for timestamp {currency_data.timestamp}")
@@ -78,6 +118,213 @@ def insert_currency_data(data):
     finally:
         session.close()
 
+def _upsert_batch_postgresql(session, rows, update_existing):
+    """
+    Upsert a batch with a single INSERT ... ON CONFLICT statement.
+
+    Args:
+        session (Session): SQLAlchemy session bound to a PostgreSQL engine.
+        rows (list): Deduplicated currency_data rows.
+        update_existing (bool): Overwrite changed values of existing candles.
+
+    Returns:
+        dict: Inserted, updated and skipped counts for the batch.
+    """
+    table = CurrencyData.__table__
+    stmt = pg_insert(table)
+    if update_existing:
+        # Only touch rows whose values actually changed so unchanged candles count as skipped
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(CURRENCY_DATA_KEY_COLUMNS),
+            set_={column: stmt.excluded[column] for column in CURRENCY_DATA_VALUE_COLUMNS},
+            where=or_(*(table.c[column].is_distinct_from(stmt.excluded[column])
+                        for column in CURRENCY_DATA_VALUE_COLUMNS))
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(CURRENCY_DATA_KEY_COLUMNS))
+
+    # xmax is 0 for freshly inserted tuples and non-zero for tuples rewritten by DO UPDATE
+    stmt = stmt.returning(literal_column('xmax = 0').label('inserted'))
+    # Executed as executemany so SQLAlchemy batches the rows into multi-row VALUES with a cached statement
+    returned = session.execute(stmt, rows).scalars().all()
+    inserted = sum(1 for was_inserted in returned if was_inserted)
+    return {
+        'inserted': inserted,
+        'updated': len(returned) - inserted,
+        'skipped': len(rows) - len(returned),
+    }
+
+def _upsert_batch_partitioned(session, rows, update_existing):
+    """
+    Upsert a batch into a partitioned currency_data table.
+
+    PostgreSQL cannot return xmax from a partitioned table, so new candles are counted by
+    looking up which keys of the batch already exist before the upsert.
+
+    Args:
+        session (Session): SQLAlchemy session bound to a PostgreSQL engine.
+        rows (list): Deduplicated currency_data rows of one instrument and granularity.
+        update_existing (bool): Overwrite changed values of existing candles.
+
+    Returns:
+        dict: Inserted, updated and skipped counts for the batch.
+    """
+    table = CurrencyData.__table__
+    existing = session.execute(
+        select(func.count()).select_from(table).where(
+            table.c.instrument_id == rows[0]['instrument_id'],
+            table.c.granularity_id == rows[0]['granularity_id'],
+            table.c.timestamp.in_([row['timestamp'] for row in rows]))
+    ).scalar()
+    stmt = pg_insert(table)
+    if update_existing:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(CURRENCY_DATA_KEY_COLUMNS),
+            set_={column: stmt.excluded[column] for column in CURRENCY_DATA_VALUE_COLUMNS},
+            where=or_(*(table.c[column].is_distinct_from(stmt.excluded[column])
+                        for column in CURRENCY_DATA_VALUE_COLUMNS))
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(CURRENCY_DATA_KEY_COLUMNS))
+    returned = len(session.execute(stmt.returning(table.c.id), rows).all())
+    inserted = len(rows) - existing
+    return {
+        'inserted': inserted,
+        'updated': returned - inserted,
+        'skipped': len(rows) - returned,
+    }
+
+def _upsert_batch_generic(session, rows, update_existing):
+    """
+    Upsert a batch on databases without INSERT ... ON CONFLICT RETURNING support (e.g. SQLite).
+
+    Existing candles for the batch are loaded with one range query instead of one query per row.
+
+    Args:
+        session (Session): SQLAlchemy session object.
+        rows (list): Deduplicated currency_data rows of one instrument and granularity.
+        update_existing (bool): Overwrite changed values of existing candles.
+
+    Returns:
+        dict: Inserted, updated and skipped counts for the batch.
+    """
+    timestamps = [row['timestamp'] for row in rows]
+    existing = {
+        record.timestamp: record
+        for record in session.query(CurrencyData.id, CurrencyData.timestamp,
+                                    *(getattr(CurrencyData, column) for column in CURRENCY_DATA_VALUE_COLUMNS))
+        .filter(CurrencyData.instrument_id == rows[0]['instrument_id'],
+                CurrencyData.granularity_id == rows[0]['granularity_id'],
+                CurrencyData.timestamp.between(min(timestamps), max(timestamps)))
+    }
+
+    new_rows, changed_rows = [], []
+    for row in rows:
+        current = existing.get(row['timestamp'])
+        if current is None:
+            new_rows.append(row)
+        elif update_existing and any(getattr(current, column) != row[column]
+                                     for column in CURRENCY_DATA_VALUE_COLUMNS):
+            changed_rows.append(dict(row, id=current.id))
+
+    if new_rows:
+        session.execute(insert(CurrencyData), new_rows)
+    if changed_rows:
+        session.execute(update(CurrencyData), changed_rows)
+    return {
+        'inserted': len(new_rows),
+        'updated': len(changed_rows),
+        'skipped': len(rows) - len(new_rows) - len(changed_rows),
+    }
+
+def refresh_loaded_rollups(rollup, currency_pair, granularity, first, last, counts, engine):
+    """
+    Refresh the rollup buckets of a committed load, if it changed candles the rollups are built from.
+
+    Args:
+        rollup (callable): refresh_rollups or a replacement taking the same arguments; None skips it.
+        currency_pair (str): The currency pair of the load.
+        granularity (str): OANDA granularity code of the load.
+        first (datetime): Earliest loaded candle; None for an empty load.
+        last (datetime): Latest loaded candle.
+        counts (dict): Inserted, updated and skipped counts of the load.
+        engine: SQLAlchemy engine the candles were committed to.
+    """
+    if rollup is None or granularity != ROLLUP_BASE or first is None or not (counts['inserted'] or counts['updated']):
+        return
+    rollup(currency_pair, first, last + timedelta(seconds=GRANULARITIES[granularity][1]), engine=engine)
+
+def upsert_currency_data(data, update_existing=False, currency_pair='EUR/USD', session=None,
+                         granularity=DEFAULT_GRANULARITY, rollup=refresh_rollups):
+    """
+    Insert fetched currency data in set-based batches instead of checking each record individually.
+
+    On PostgreSQL every batch is a single INSERT ... ON CONFLICT (instrument_id, granularity_id,
+    timestamp) statement; other databases fall back to one range lookup plus bulk insert/update per batch.
+
+    Args:
+        data (iterable): Currency data points to insert.
+        update_existing (bool): Overwrite existing candles whose values changed (DO UPDATE)
+            instead of leaving them untouched (DO NOTHING).
+        currency_pair (str): The currency pair the data points belong to.
+        session (Session): Optional session to use; a new one is created and closed otherwise.
+        granularity (str): OANDA granularity code of the data points.
+        rollup (callable): Refreshes the rollups of loaded H1 candles once they are committed, see
+            refresh_loaded_rollups; None leaves them to the caller.
+
+    Returns:
+        dict: Number of 'inserted', 'updated' and 'skipped' data points.
+    """
+    owns_session = session is None
+    if owns_session:
+        session = get_session()()
+    try:
+        # Resolved once for the whole load; every row of it shares the instrument and granularity
+        instrument_id = get_instrument_id(session, currency_pair)
+        series_granularity_id = granularity_id(granularity)
+
+        # Later duplicates win, and a statement may not touch the same candle twice
+        rows_by_key = {}
+        total = 0
+        for record in data:
+            row = create_currency_data_row(record, instrument_id, series_granularity_id)
+            rows_by_key[tuple(row[column] for column in CURRENCY_DATA_KEY_COLUMNS)] = row
+            total += 1
+        rows = list(rows_by_key.values())
+        counts = {'inserted': 0, 'updated': 0, 'skipped': total - len(rows)}
+
+        bind = session.get_bind()
+        if bind.dialect.name == 'postgresql':
+            upsert_batch = _upsert_batch_postgresql
+            if rows:
+                # Months without a partition would otherwise land in the default partition
+                timestamps = [row['timestamp'] for row in rows]
+                if ensure_partitions(bind, min(timestamps), max(timestamps)) is not None:
+                    upsert_batch = _upsert_batch_partitioned
+        else:
+            upsert_batch = _upsert_batch_generic
+
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch_counts = upsert_batch(session, rows[start:start + UPSERT_BATCH_SIZE], update_existing)
+            for key, value in batch_counts.items():
+                counts[key] += value
+
+        session.commit()
+        logging.info(f"Upserted currency data: {counts['inserted']} inserted, "
+                     f"{counts['updated']} updated, {counts['skipped']} skipped")
+        if rows:
+            timestamps = [row['timestamp'] for row in rows]
+            refresh_loaded_rollups(rollup, currency_pair, granularity, min(timestamps), max(timestamps), counts, bind)
+        return counts
+
+    except SQLAlchemyError as e:
+        session.rollback()
+        logging.error(f"Error upserting data into the database: {e}")
+        raise
+    finally:
+        if owns_session:
+            session.close()
+
 if __name__ == "__main__":
     data = fetch_data()
-    insert_currency_data(data)
+    upsert_currency_data(data)
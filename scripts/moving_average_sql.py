@@ -0,0 +1,158 @@
+"""
+This module computes moving averages inside the database with window functions.
+
+Instead of pulling candles into Python and writing the averages back, each window size is filled
+with a single INSERT ... SELECT avg(close) OVER (... ROWS BETWEEN w-1 PRECEDING AND CURRENT ROW).
+A time range can be refreshed on its own: its existing averages are deleted and recomputed,
+reading only the w-1 candles before the range as extra history.
+
+    python -m scripts.moving_average_sql --pair EUR/USD --from 2024-01-01
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func, literal, and_
+from database.db_connect import get_engine
+from database.dimensions import get_instrument_id, granularity_id, DEFAULT_GRANULARITY
+from database.schema.create_tables import CurrencyData, MovingAverage
+from scripts.fetch_insert_moving_average import MOVING_AVG_WINDOWS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+
+def _range_filter(instrument_id, granularity_id, from_time=None, to_time=None):
+    """Return the WHERE clause selecting the candles of one series in [from_time, to_time)."""
+    conditions = [CurrencyData.instrument_id == instrument_id, CurrencyData.granularity_id == granularity_id]
+    if from_time is not None:
+        conditions.append(CurrencyData.timestamp >= from_time)
+    if to_time is not None:
+        conditions.append(CurrencyData.timestamp < to_time)
+    return and_(*conditions)
+
+
+def get_lookback_start(connection, instrument_id, granularity_id, from_time, rows):
+    """
+    Find the timestamp of the earliest candle needed to average the first candles of a range.
+
+    Args:
+        connection: SQLAlchemy connection.
+        instrument_id (int): Id of the currency pair.
+        granularity_id (int): Id of the candle granularity.
+        from_time (datetime): Start of the range, or None for the whole history.
+        rows (int): Number of candles needed before from_time.
+
+    Returns:
+        datetime: Timestamp of the earliest of the `rows` candles before from_time, from_time when
+        there are none, or None when from_time is None.
+    """
+    if from_time is None or rows <= 0:
+        return from_time
+    preceding = select(CurrencyData.timestamp) \
+        .where(_range_filter(instrument_id, granularity_id, to_time=from_time)) \
+        .order_by(CurrencyData.timestamp.desc()) \
+        .limit(rows) \
+        .subquery()
+    earliest = connection.execute(select(func.min(preceding.c.timestamp))).scalar()
+    return earliest if earliest is not None else from_time
+
+
+def build_moving_average_insert(window, instrument_id, granularity_id, lookback_start=None, from_time=None,
+                                to_time=None):
+    """
+    Build the INSERT ... SELECT filling the averages of one window size.
+
+    Rows with fewer than `window` candles of history get no average, as in the Python engine.
+
+    Args:
+        window (int): Window size.
+        instrument_id (int): Id of the currency pair.
+        granularity_id (int): Id of the candle granularity.
+        lookback_start (datetime): Earliest candle read as history.
+        from_time (datetime): First candle that receives an average.
+        to_time (datetime): End of the range, exclusive.
+
+    Returns:
+        sqlalchemy.sql.dml.Insert: The statement.
+    """
+    ordering = {'partition_by': (CurrencyData.instrument_id, CurrencyData.granularity_id),
+                'order_by': CurrencyData.timestamp}
+    averages = select(
+        CurrencyData.id,
+        CurrencyData.timestamp,
+        func.avg(CurrencyData.close).over(rows=(-(window - 1), 0), **ordering).label('moving_average'),
+        func.row_number().over(**ordering).label('row_number'),
+    ).where(_range_filter(instrument_id, granularity_id, lookback_start, to_time)).subquery()
+
+    conditions = [averages.c.row_number >= window]
+    if from_time is not None:
+        conditions.append(averages.c.timestamp >= from_time)
+    source = select(
+        averages.c.id,
+        averages.c.timestamp,
+        literal(window),
+        averages.c.moving_average,
+    ).where(*conditions)
+
+    columns = [MovingAverage.currency_data_id, MovingAverage.timestamp, MovingAverage.window_size,
+               MovingAverage.moving_average]
+    return insert(MovingAverage).from_select(columns, source)
+
+
+def refresh_moving_averages(currency_pair="EUR/USD", from_time=None, to_time=None, windows=MOVING_AVG_WINDOWS,
+                            engine=None, granularity=DEFAULT_GRANULARITY):
+    """
+    Recompute the moving averages of a pair inside the database.
+
+    Existing averages of the given windows for candles in [from_time, to_time) are replaced in one transaction.
+
+    Args:
+        currency_pair (str): The currency pair.
+        from_time (datetime): Start of the range; None refreshes from the first candle.
+        to_time (datetime): End of the range, exclusive; None refreshes up to the latest candle.
+        windows (list): Window sizes.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+        granularity (str): OANDA granularity code of the candles.
+
+    Returns:
+        dict: Number of averages inserted, keyed by window size.
+    """
+    engine = engine or get_engine()
+    series_granularity_id = granularity_id(granularity)
+    counts = {}
+    with engine.begin() as connection:
+        instrument_id = get_instrument_id(connection, currency_pair)
+        range_ids = select(CurrencyData.id).where(
+            _range_filter(instrument_id, series_granularity_id, from_time, to_time))
+        connection.execute(
+            delete(MovingAverage).where(
+                MovingAverage.window_size.in_(windows),
+                MovingAverage.currency_data_id.in_(range_ids),
+            )
+        )
+
+        lookback_start = get_lookback_start(connection, instrument_id, series_granularity_id, from_time,
+                                            max(windows) - 1)
+        for window in windows:
+            statement = build_moving_average_insert(window, instrument_id, series_granularity_id, lookback_start,
+                                                    from_time, to_time)
+            counts[window] = connection.execute(statement).rowcount
+
+    logging.info(f"Refreshed moving averages for {currency_pair}: {counts}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute moving averages inside the database.")
+    parser.add_argument('--pair', default="EUR/USD", help="Currency pair, e.g. EUR/USD")
+    parser.add_argument('--granularity', default=DEFAULT_GRANULARITY, help="OANDA granularity code, e.g. D")
+    parser.add_argument('--from', dest='from_time', type=datetime.fromisoformat, help="Range start (ISO date)")
+    parser.add_argument('--to', dest='to_time', type=datetime.fromisoformat, help="Range end, exclusive (ISO date)")
+    parser.add_argument('--windows', type=int, nargs='+', default=MOVING_AVG_WINDOWS, help="Window sizes")
+    args = parser.parse_args()
+    refresh_moving_averages(args.pair, args.from_time, args.to_time, args.windows, granularity=args.granularity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+This module provides a pooled HTTP client for the OANDA v3 REST API.
+
+A single keep-alive requests.Session is shared by all calls, so repeated requests reuse open
+TCP+TLS connections, and several instruments and granularities can be fetched concurrently.
+Every request goes through the shared RequestScheduler, which enforces the rate limit and
+retries transient failures.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from scripts.rate_limiter import get_scheduler
+
+OANDA_API_BASE_URL = "https://api-fxpractice.oanda.com/v3"
+DEFAULT_MAX_CONCURRENCY = 8
+REQUEST_TIMEOUT = 30  # Seconds to wait for OANDA before giving up on a request
+
+# Shared clients, one per API key
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class OandaClient:
+    """
+    OANDA API client owning a keep-alive connection pool.
+
+    Attributes:
+        session (requests.Session): Session whose pool holds up to max_concurrency connections.
+        max_concurrency (int): Default number of requests fetch_many runs in parallel.
+        timeout (float): Request timeout in seconds.
+        scheduler (RequestScheduler): Rate limiter and retry policy applied to every request.
+    """
+
+    def __init__(self, api_key, base_url=OANDA_API_BASE_URL, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 timeout=REQUEST_TIMEOUT, scheduler=None):
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.scheduler = scheduler or get_scheduler()
+
+        # Pool size matches the concurrency so parallel requests never discard connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def get_candles(self, instrument, granularity='D', **params):
+        """
+        Fetch candles for a single instrument and granularity.
+
+        Args:
+            instrument (str): The instrument to fetch (e.g., 'EUR_USD').
+            granularity (str): OANDA granularity code.
+            **params: Additional query parameters such as count, from or to.
+
+        Returns:
+            list: List of raw candles.
+        """
+        url = f"{self.base_url}/instruments/{instrument}/candles"
+        params = {'granularity': granularity, **params}
+        response = self.scheduler.request(lambda: self.session.get(url, params=params, timeout=self.timeout))
+        response.raise_for_status()
+        return response.json()['candles']
+
+    def fetch_many(self, instruments, granularities=('D',), max_concurrency=None, **params):
+        """
+        Fetch candles for several instruments and granularities concurrently.
+
+        A failing instrument does not affect the others; its error is logged and it gets an empty list.
+
+        Args:
+            instruments (list): Instruments to fetch (e.g., ['EUR_USD', 'GBP_USD']).
+            granularities (list or str): One or more OANDA granularity codes.
+            max_concurrency (int): Maximum number of parallel requests; defaults to the client setting.
+            **params: Query parameters applied to every request.
+
+        Returns:
+            dict: Candles keyed by instrument, then by granularity.
+        """
+        if isinstance(granularities, str):
+            granularities = [granularities]
+        jobs = [(instrument, granularity) for instrument in instruments for granularity in granularities]
+        workers = max(1, min(max_concurrency or self.max_concurrency, len(jobs)))
+
+        def fetch(job):
+            instrument, granularity = job
+            try:
+                return self.get_candles(instrument, granularity, **params)
+            except Exception as e:
+                logging.error(f"Error fetching {instrument} {granularity} from OANDA API: {e}")
+                return []
+
+        results = {instrument: {} for instrument in instruments}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (instrument, granularity), candles in zip(jobs, executor.map(fetch, jobs)):
+                results[instrument][granularity] = candles
+        return results
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.session.close()
+
+
+def get_client(api_key=None):
+    """
+    Return the shared client for an API key, creating it on first use.
+
+    Args:
+        api_key (str): OANDA API key; defaults to the OANDA_API_KEY environment variable.
+
+    Returns:
+        OandaClient: The shared client.
+    """
+    api_key = api_key or os.getenv('OANDA_API_KEY')
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = OandaClient(api_key)
+        return client
@@ -0,0 +1,212 @@
+"""
+This module handles rate limiting and retrying of OANDA API requests.
+
+A RequestScheduler enforces a shared requests-per-second budget with a token bucket, pauses
+every caller on 429 responses and on 503 responses carrying Retry-After, honouring Retry-After
+when given, and retries transient failures with jittered exponential backoff. It is thread-safe,
+so one scheduler can sit under all fetch functions and concurrent backfills.
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.exceptions import ConnectionError, Timeout
+
+# OANDA allows 120 requests per second per account; stay safely below it by default
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv('OANDA_REQUESTS_PER_SECOND', 100))
+DEFAULT_MAX_RETRIES = 5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 120  # Seconds; longer server-requested pauses are capped
+
+# Scheduler shared by all OANDA clients, created on first use
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at a constant rate.
+
+    Callers reserve a token under the lock and sleep outside it, so waiting callers are served
+    in arrival order without holding the lock while sleeping.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until it is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for the given number of seconds, e.g. after a 429 or 503 response.
+
+        Args:
+            seconds (float): Length of the pause.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+
+    Args:
+        value (str): Header value.
+        now (datetime): Current UTC time, used for HTTP dates.
+
+    Returns:
+        float: Seconds to wait, or None when the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class RequestScheduler:
+    """
+    Rate-limited, retrying executor for HTTP requests.
+
+    Attributes:
+        bucket (TokenBucket): Shared requests-per-second budget.
+        stats (dict): Counters of 'requests' sent, requests 'throttled' by the local budget or
+            by a 429 or 503 pause, 'retried' attempts and requests that 'failed' after all retries.
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=0.5, backoff_cap=30.0, retry_statuses=RETRY_STATUS_CODES,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_statuses = set(retry_statuses)
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'retried': 0, 'failed': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        """
+        Return a copy of the counters.
+        """
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def backoff(self, attempt):
+        """
+        Return a full-jitter exponential backoff delay for a retry attempt.
+
+        Args:
+            attempt (int): Zero-based number of the failed attempt.
+
+        Returns:
+            float: Seconds to wait before the next attempt.
+        """
+        return self._rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def request(self, send):
+        """
+        Send a request within the rate budget, retrying transient failures.
+
+        Args:
+            send (callable): Function performing the request and returning a requests.Response.
+
+        Returns:
+            requests.Response: The first non-retryable response, or the last response once
+            retries are exhausted.
+
+        Raises:
+            ConnectionError, Timeout: When the request still fails after all retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.bucket.acquire() > 0:
+                self._count('throttled')
+            self._count('requests')
+
+            try:
+                response = send()
+            except (ConnectionError, Timeout) as e:
+                if attempt == self.max_retries:
+                    self._count('failed')
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"OANDA request failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in self.retry_statuses:
+                    return response
+                if attempt == self.max_retries:
+                    self._count('failed')
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is not None:
+                    delay = min(retry_after, MAX_RETRY_AFTER)
+                else:
+                    delay = self.backoff(attempt)
+                # A 429 always throttles the shared budget; a 503 only when the server says how long
+                if response.status_code == 429 or (response.status_code == 503 and retry_after is not None):
+                    # The budget is shared, so every caller backs off, not just this one
+                    self.bucket.pause(delay)
+                    self._count('throttled')
+                logging.warning(f"OANDA returned {response.status_code}, retrying in {delay:.2f}s")
+
+            self._count('retried')
+            self._sleep(delay)
+
+
+def get_scheduler():
+    """
+    Return the process-wide scheduler shared by all OANDA clients.
+
+    Returns:
+        RequestScheduler: The shared scheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
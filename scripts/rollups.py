@@ -0,0 +1,209 @@
+"""
+This module derives higher-timeframe candles from ingested H1 candles and keeps them up to date.
+
+Each level is built from the one below it, H1 -> H4 -> D -> W, and stored in candle_rollup.
+Refreshing a time range only recomputes the buckets overlapping it: the range is widened to whole
+buckets of each level in turn, those buckets are deleted and rebuilt from the level below, and
+every other bucket is left alone. Range queries at a rolled-up granularity then read candle_rollup
+instead of rescanning currency_data.
+
+The loaders, upsert_currency_data and copy_currency_data, refresh the buckets of the H1 candles
+they commit, and the backfill those of each committed group, so the rollups follow every load.
+Candles written to currency_data any other way need a refresh over their range.
+
+Buckets start at 00:00 UTC, and weeks on Monday, so daily and weekly rollups differ from the D
+and W candles OANDA aligns to 17:00 New York.
+
+    python -m scripts.rollups --pair EUR/USD --from 2024-01-01
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy import select, insert, delete, literal
+from database.db_connect import get_engine
+from database.dimensions import GRANULARITIES, find_instrument_id, granularity_id
+from database.schema.create_tables import CurrencyData, CandleRollup
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Each rolled-up granularity and the granularity it is built from, in build order
+ROLLUP_SOURCES = {'H4': 'H1', 'D': 'H4', 'W': 'D'}
+
+# Granularity of the ingested candles at the bottom of the chain
+ROLLUP_BASE = 'H1'
+
+# Buckets are counted from these instants; weekly buckets start on Mondays
+BUCKET_EPOCH = datetime(1970, 1, 1)
+WEEK_EPOCH = datetime(1970, 1, 5)
+
+# Columns returned by read_candles
+CANDLE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Return the start of the bucket containing a timestamp.
+
+    Args:
+        timestamp (datetime): A UTC timestamp.
+        granularity (str): OANDA granularity code of the bucket, e.g. 'H4'.
+
+    Returns:
+        datetime: The start of the bucket.
+    """
+    epoch = WEEK_EPOCH if granularity == 'W' else BUCKET_EPOCH
+    size = timedelta(seconds=GRANULARITIES[granularity][1])
+    return epoch + (timestamp - epoch) // size * size
+
+
+def bucket_range(from_time, to_time, granularity):
+    """
+    Widen [from_time, to_time) to the whole buckets overlapping it.
+
+    Args:
+        from_time (datetime): Start of the range; None for the first bucket.
+        to_time (datetime): End of the range, exclusive; None for the last bucket.
+        granularity (str): OANDA granularity code of the buckets.
+
+    Returns:
+        tuple: (start, end) of the buckets, each None when the range is open on that side.
+    """
+    start = bucket_start(from_time, granularity) if from_time is not None else None
+    end = None
+    if to_time is not None:
+        end = bucket_start(to_time, granularity)
+        if end < to_time:
+            end += timedelta(seconds=GRANULARITIES[granularity][1])
+    return start, end
+
+
+def aggregate_candles(candles, granularity):
+    """
+    Combine candles ordered by timestamp into one candle per bucket.
+
+    Args:
+        candles (iterable): Rows with timestamp, open, high, low, close, volume and candle_count,
+            ordered by timestamp.
+        granularity (str): OANDA granularity code of the buckets.
+
+    Returns:
+        list: Row dicts for candle_rollup, without the instrument and granularity ids.
+    """
+    rows = []
+    for start, bucket in groupby(candles, key=lambda candle: bucket_start(candle.timestamp, granularity)):
+        bucket = list(bucket)
+        rows.append({
+            'timestamp': start,
+            'open': bucket[0].open,
+            'high': max(candle.high for candle in bucket),
+            'low': min(candle.low for candle in bucket),
+            'close': bucket[-1].close,
+            'volume': sum(candle.volume for candle in bucket),
+            'candle_count': sum(candle.candle_count for candle in bucket),
+        })
+    return rows
+
+
+def _series_query(instrument_id, granularity, start=None, end=None):
+    """
+    Build the query reading one series in [start, end): rollups from candle_rollup, other granularities
+    from currency_data, which count as one candle each.
+    """
+    if granularity in ROLLUP_SOURCES:
+        table, candle_count = CandleRollup, CandleRollup.candle_count
+    else:
+        table, candle_count = CurrencyData, literal(1).label('candle_count')
+    conditions = [table.instrument_id == instrument_id, table.granularity_id == granularity_id(granularity)]
+    if start is not None:
+        conditions.append(table.timestamp >= start)
+    if end is not None:
+        conditions.append(table.timestamp < end)
+    columns = [getattr(table, column) for column in CANDLE_COLUMNS]
+    return select(*columns, candle_count).where(*conditions).order_by(table.timestamp)
+
+
+def refresh_rollups(currency_pair="EUR/USD", from_time=None, to_time=None, engine=None):
+    """
+    Rebuild the rollup buckets of a pair overlapping [from_time, to_time) at every level.
+
+    All levels are replaced in one transaction, so readers never see an H4 bucket that disagrees
+    with its D bucket.
+
+    Args:
+        currency_pair (str): The currency pair.
+        from_time (datetime): Start of the changed H1 candles; None rebuilds from the first candle.
+        to_time (datetime): End of the changed H1 candles, exclusive; None rebuilds up to the latest candle.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        dict: Number of buckets written, keyed by granularity.
+    """
+    engine = engine or get_engine()
+    instrument_id = find_instrument_id(engine, currency_pair)
+    if instrument_id is None:
+        logging.warning(f"No candles of {currency_pair} to roll up; the pair is not registered")
+        return {granularity: 0 for granularity in ROLLUP_SOURCES}
+    counts = {}
+    start, end = from_time, to_time
+    with engine.begin() as connection:
+        for granularity, source in ROLLUP_SOURCES.items():
+            # Each level's buckets contain the changed buckets of the level below
+            start, end = bucket_range(start, end, granularity)
+            conditions = [CandleRollup.instrument_id == instrument_id,
+                          CandleRollup.granularity_id == granularity_id(granularity)]
+            if start is not None:
+                conditions.append(CandleRollup.timestamp >= start)
+            if end is not None:
+                conditions.append(CandleRollup.timestamp < end)
+            connection.execute(delete(CandleRollup).where(*conditions))
+
+            candles = connection.execute(_series_query(instrument_id, source, start, end))
+            rows = aggregate_candles(candles, granularity)
+            for row in rows:
+                row.update(instrument_id=instrument_id, granularity_id=granularity_id(granularity))
+            if rows:
+                connection.execute(insert(CandleRollup), rows)
+            counts[granularity] = len(rows)
+
+    logging.info(f"Refreshed rollups for {currency_pair}: {counts}")
+    return counts
+
+
+def read_candles(currency_pair, granularity, from_time=None, to_time=None, engine=None):
+    """
+    Read the candles of a pair at any granularity, from candle_rollup for rolled-up granularities.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code, e.g. 'H1' or 'W'.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        list: One dict per candle with timestamp, open, high, low, close, volume and candle_count;
+            empty for a pair never loaded, which is not registered by the read.
+    """
+    engine = engine or get_engine()
+    instrument_id = find_instrument_id(engine, currency_pair)
+    if instrument_id is None:
+        return []
+    query = _series_query(instrument_id, granularity, from_time, to_time)
+    with engine.connect() as connection:
+        return [dict(row) for row in connection.execute(query).mappings()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the H4, D and W rollups of H1 candles.")
+    parser.add_argument('--pair', default="EUR/USD", help="Currency pair, e.g. EUR/USD")
+    parser.add_argument('--from', dest='from_time', type=datetime.fromisoformat, help="Range start (ISO date)")
+    parser.add_argument('--to', dest='to_time', type=datetime.fromisoformat, help="Range end, exclusive (ISO date)")
+    args = parser.parse_args()
+    refresh_rollups(args.pair, args.from_time, args.to_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,25 @@
 import numpy as np
-import pandas as pd
-from sqlalchemy import create_engine
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler
 from datetime import datetime, timedelta
-import os
-from utils.env_loader import load_environment
+from database.queries import read_series_frame
 
 
-def get_db_connection():
+def fetch_data(currency_pair='EUR/USD', look_back_days=100, engine=None):
     """
-    Establishes a connection to the database.
-    """
-    # Loading environment variables from .env file for database connection
-    load_environment()
-    db_user = os.getenv('DB_USER')
-    db_password = os.getenv('DB_PASS')
-    db_host = os.getenv('DB_HOST')
-    db_name = os.getenv('DB_NAME')
-
-    connection_string = f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}"
-    engine = create_engine(connection_string)
-    return engine
-
-
-def fetch_data(currency_pair='EUR/USD', look_back_days=100):
-    """
-    Fetches historical data from the database for a specified currency pair.
+    Fetches historical daily closes from the database for a specified currency pair.
 
     Args:
         currency_pair (str): The currency pair to fetch data for (e.g., 'EUR/USD').
         look_back_days (int): Number of days of historical data to fetch.
+        engine: SQLAlchemy engine; defaults to the shared pooled engine.
 
     Returns:
-        DataFrame: DataFrame containing historical data for the currency pair.
-    """
-    engine = get_db_connection()
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=look_back_days)
-
-    query = f"""
-        SELECT timestamp, close
-        FROM currency_data
-        WHERE currency_pair = '{currency_pair}'
-          AND timestamp >= '{start_date}'
-          AND timestamp <= '{end_date}'
-        ORDER BY timestamp ASC
+        DataFrame: 'timestamp' (datetime64) and 'close' (float64) columns ordered by timestamp.
     """
-    data = pd.read_sql(query, engine)
+    start_date = datetime.now() - timedelta(days=look_back_days)
+    data = read_series_frame(currency_pair, 'D', from_time=start_date, columns=('timestamp', 'close'), engine=engine)
     print(data)
-    engine.dispose()  # Closing the database connection
     return data
 
 
@@ -67,23 +38,62 @@ def scale_data(data):
     return data, scaler
 
 
-def prepare_data_for_lstm(data, window_size=30):
+def build_sequences(features, target, window_size=30):
+    """
+    Cut a series into overlapping sequences and the value following each, without copying.
+
+    Args:
+        features (np.array): Series of shape (rows, features); memory-mapped arrays stay on disk.
+        target (np.array): Target value of every row, shape (rows,).
+        window_size (int): The number of past observations to use for each sequence.
+
+    Returns:
+        X, y: Read-only views of shape (samples, timesteps, features) and (samples,).
+    """
+    if len(features) <= window_size:
+        return np.empty((0, window_size, features.shape[1])), np.empty(0)
+    # The last row only serves as a target; windows come out as (samples, features, timesteps)
+    X = sliding_window_view(features[:-1], window_size, axis=0).transpose(0, 2, 1)
+    y = target[window_size:]
+    y.flags.writeable = False
+    return X, y
+
+
+def prepare_data_for_lstm(data, window_size=30, feature_columns=('scaled_close',), target_column='scaled_close'):
     """
     Prepares data for LSTM by creating sequences of specified window size.
 
+    The sequences are read-only strided views of one (rows, features) array rather than copies of
+    every window, so they take no more memory than the series itself.
+
     Args:
         data (DataFrame): The historical currency data with scaled values.
         window_size (int): The number of past observations to use for each sequence.
+        feature_columns (tuple): Columns fed to the model at every timestep, e.g. scaled OHLCV and indicators.
+        target_column (str): Column predicted one step after each sequence.
 
     Returns:
-        X, y: Arrays for training and testing.
+        X, y: Arrays of shape (samples, timesteps, features) and (samples,).
+    """
+    features = data[list(feature_columns)].to_numpy(dtype=np.float64)
+    target = data[target_column].to_numpy(dtype=np.float64)
+    return build_sequences(features, target, window_size)
+
+
+def iter_sequence_batches(X, y, batch_size=32):
+    """
+    Lazily yields contiguous copies of consecutive batches of sequences, e.g. for model.fit.
+
+    Args:
+        X (np.array): Sequences of shape (samples, timesteps, features).
+        y (np.array): Targets aligned with X.
+        batch_size (int): Sequences per batch.
+
+    Yields:
+        tuple: (X_batch, y_batch); only one batch is copied at a time.
     """
-    data_values = data['scaled_close'].values  # Using scaled 'close' values for training
-    X, y = [], []
-    for i in range(len(data_values) - window_size):
-        X.append(data_values[i:i + window_size])
-        y.append(data_values[i + window_size])
-    return np.array(X), np.array(y)
+    for start in range(0, len(X), batch_size):
+        yield np.ascontiguousarray(X[start:start + batch_size]), np.ascontiguousarray(y[start:start + batch_size])
 
 
 def split_data(X, y, test_size=0.2):
@@ -109,11 +119,13 @@ def reshape_for_lstm(X):
     Reshapes the data to be compatible with LSTM input.
 
     Args:
-        X (np.array): Array of input features.
+        X (np.array): Array of input features, (samples, timesteps) or already (samples, timesteps, features).
 
     Returns:
-        np.array: Reshaped array with dimensions (samples, timesteps, features).
+        np.array: Array with dimensions (samples, timesteps, features); 3D input is returned as is.
     """
+    if X.ndim == 3:
+        return X
     return X.reshape((X.shape[0], X.shape[1], 1))
 
 
@@ -1,23 +1,29 @@
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
+from tensorflow.keras.optimizers import Adam
 
-def create_lstm_model(input_shape, dropout_rate=0.2):
+def create_lstm_model(input_shape, dropout_rate=0.2, units=50, layers=2, activation='relu', learning_rate=0.001):
     """
     Builds and compiles an LSTM model for time series forecasting.
 
     Args:
         input_shape (tuple): Shape of the input data (timesteps, features).
         dropout_rate (float): Dropout rate to prevent overfitting.
+        units (int): Units of every LSTM layer.
+        layers (int): Number of stacked LSTM layers.
+        activation (str): Activation of the LSTM layers.
+        learning_rate (float): Learning rate of the Adam optimizer.
 
     Returns:
         model: Compiled LSTM model.
     """
     model = Sequential()
-    model.add(LSTM(50, activation='relu', input_shape=input_shape, return_sequences=True))
-    model.add(Dropout(dropout_rate))
-    model.add(LSTM(50, activation='relu'))
-    model.add(Dropout(dropout_rate))
+    for layer in range(layers):
+        # Every LSTM but the last passes its whole sequence on to the next
+        options = {'input_shape': input_shape} if layer == 0 else {}
+        model.add(LSTM(units, activation=activation, return_sequences=layer < layers - 1, **options))
+        model.add(Dropout(dropout_rate))
     model.add(Dense(1))
 
-    model.compile(optimizer='adam', loss='mse')
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
     return model
@@ -2,6 +2,28 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error
 import numpy as np
 
 
+def directional_accuracy(y_true, y_pred):
+    """
+    Computes the fraction of steps where the predicted move has the direction of the actual move.
+
+    Both moves are measured from the previous true value, the last close the model has seen, so
+    the first target, whose previous close is only part of its input sequence, is not scored.
+
+    Args:
+        y_true (np.array): True values of consecutive steps.
+        y_pred (np.array): Predicted values of the same steps.
+
+    Returns:
+        float: Fraction of matching directions, NaN for fewer than two steps.
+    """
+    y_true, y_pred = np.ravel(y_true), np.ravel(y_pred)
+    if len(y_true) < 2:
+        return float('nan')
+    actual = np.sign(y_true[1:] - y_true[:-1])
+    predicted = np.sign(y_pred[1:] - y_true[:-1])
+    return float(np.mean(actual == predicted))
+
+
 def evaluate_model(model, X_test, y_test, scaler):
     """
     Evaluates the LSTM model on test data and computes evaluation metrics.
@@ -13,7 +35,7 @@ def evaluate_model(model, X_test, y_test, scaler):
         scaler: Scaler used to inverse transform predictions.
 
     Returns:
-        dict: Dictionary containing RMSE and MAE scores.
+        dict: Dictionary containing RMSE, MAE and directional accuracy scores.
     """
     # Making predictions
     y_pred_scaled = model.predict(X_test)
@@ -25,8 +47,10 @@ def evaluate_model(model, X_test, y_test, scaler):
     # Calculating metrics
     rmse = np.sqrt(mean_squared_error(y_true, y_pred))
     mae = mean_absolute_error(y_true, y_pred)
+    accuracy = directional_accuracy(y_true, y_pred)
 
     print(f"RMSE: {rmse:.4f}")
     print(f"MAE: {mae:.4f}")
+    print(f"Directional Accuracy: {accuracy:.2%}")
 
-    return {"RMSE": rmse, "MAE": mae}
\ No newline at end of file
+    return {"RMSE": rmse, "MAE": mae, "Directional Accuracy": accuracy}
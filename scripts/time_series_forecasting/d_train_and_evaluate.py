@@ -1,6 +1,9 @@
-from a_data_preparation import main as prepare_data
-from b_lstm_model import create_lstm_model
-from c_evaluate_model import evaluate_model
+import argparse
+from scripts.time_series_forecasting.a_data_preparation import main as prepare_data
+from scripts.time_series_forecasting.input_pipeline import main as prepare_datasets, build_feature_set_datasets
+from scripts.time_series_forecasting.feature_store import main as load_prepared_data, load_features
+from scripts.time_series_forecasting.b_lstm_model import create_lstm_model
+from scripts.time_series_forecasting.c_evaluate_model import evaluate_model
 from tensorflow.keras.callbacks import EarlyStopping
 import matplotlib.pyplot as plt
 
@@ -18,24 +21,39 @@ def plot_training_history(history):
     plt.legend()
     plt.show()
 
-def train_and_evaluate():
+def train_and_evaluate(pipeline='numpy', feature_store=False):
     """
     Full pipeline to train and evaluate the LSTM model.
+
+    Args:
+        pipeline (str): 'numpy' trains on in-memory sequence arrays, 'tf.data' on the prefetched datasets of
+            input_pipeline, which window the series batch by batch.
+        feature_store (bool): Memory-map the scaled data from the feature store, preparing it only
+            when the candles changed since it was last materialised.
     """
     # Step 1: Preparing data
-    X_train, X_test, y_train, y_test, scaler = prepare_data()
+    if pipeline == 'tf.data':
+        if feature_store:
+            feature_set = load_features()
+            train_data, X_test, y_test = build_feature_set_datasets(feature_set, batch_size=32)
+            scaler = feature_set['scaler']
+        else:
+            train_data, X_test, y_test, scaler = prepare_datasets(batch_size=32)
+        input_shape = tuple(train_data.element_spec[0].shape[1:])
+        fit_data = {'x': train_data, 'validation_data': X_test}
+    else:
+        X_train, X_test, y_train, y_test, scaler = load_prepared_data() if feature_store else prepare_data()
+        input_shape = (X_train.shape[1], X_train.shape[2])
+        fit_data = {'x': X_train, 'y': y_train, 'validation_data': (X_test, y_test), 'batch_size': 32}
 
     # Step 2: Building LSTM model
-    input_shape = (X_train.shape[1], X_train.shape[2])
     model = create_lstm_model(input_shape)
 
     # Step 3: Training model with early stopping
     early_stopping = EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
     history = model.fit(
-        X_train, y_train,
-        validation_data=(X_test, y_test),
+        **fit_data,
         epochs=50,
-        batch_size=32,
         callbacks=[early_stopping],
         verbose=1
     )
@@ -53,4 +71,10 @@ def train_and_evaluate():
     return evaluation_metrics
 
 if __name__ == "__main__":
-    train_and_evaluate()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train and evaluate the LSTM model.")
+    parser.add_argument('--pipeline', choices=['numpy', 'tf.data'], default='numpy',
+                        help="Input pipeline: in-memory arrays or streaming tf.data datasets")
+    parser.add_argument('--feature-store', action='store_true',
+                        help="Read the prepared data from the feature store instead of preparing it again")
+    args = parser.parse_args()
+    train_and_evaluate(args.pipeline, args.feature_store)
\ No newline at end of file
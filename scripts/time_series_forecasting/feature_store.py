@@ -0,0 +1,344 @@
+"""
+This module materialises scaled LSTM training data to disk and memory-maps it back.
+
+A feature set is keyed by currency pair, granularity, date range, window size and feature
+columns. Its scaled features, targets and timestamps are saved as .npy files, with the unscaled
+features and targets for consumers that fit their own scalers such as walk_forward, next to a
+manifest holding the fitted MinMaxScaler parameters, the train/test split and the watermark of the source
+candles: how many there were, the latest timestamp and a checksum of their values. Loading compares
+that watermark with the database and only re-reads and re-scales the candles when it has moved,
+whether by new candles or by corrected ones, so a hyperparameter sweep prepares its data once and
+every trial maps the same files through the page cache.
+
+Each version directory is named by its watermark and a digest of its arrays, written under a
+temporary name and renamed into place; CURRENT names the latest one and the
+FEATURE_STORE_KEEP_VERSIONS most recently materialised are kept.
+
+    python -m scripts.time_series_forecasting.feature_store --pair EUR/USD --window-size 30
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, time, timedelta, timezone
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from database.dimensions import DEFAULT_GRANULARITY
+from database.queries import read_series, read_watermark
+from scripts.time_series_forecasting.a_data_preparation import build_sequences, split_data
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Root directory of the store
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'feature_store')
+
+# Versions kept per feature set, the current one included
+FEATURE_STORE_KEEP_VERSIONS = 3
+
+# Arrays of a version, each saved as <name>.npy
+ARRAY_NAMES = ('features', 'targets', 'timestamps', 'raw_features', 'raw_targets')
+
+# Scaled values are stored as float32, the precision the model trains in
+FEATURE_DTYPE = np.dtype('float32')
+
+# Format of the timestamps in feature set and version names
+NAME_TIME_FORMAT = '%Y%m%dT%H%M%S'
+
+# Hex digits of the array digest in version names
+DIGEST_LENGTH = 12
+
+# Significant digits of the stored checksum; the database and NumPy may sum in a different order
+CHECKSUM_DIGITS = 12
+
+# Candle values summed by the checksum of read_watermark
+CHECKSUM_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+
+def feature_set_name(currency_pair, granularity, from_time, to_time, window_size, columns, test_size):
+    """
+    Name the directory of a feature set, e.g. 'EUR_USD_D_start_latest_w30_test0.2_close'.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        from_time (datetime): Start of the range; None for the first candle.
+        to_time (datetime): End of the range, exclusive; None for the latest candle.
+        window_size (int): Timesteps per sequence.
+        columns (tuple): Feature columns, in model input order.
+        test_size (float): Fraction of the sequences used as test set.
+
+    Returns:
+        str: A name usable as a directory on any platform.
+    """
+    start = from_time.strftime(NAME_TIME_FORMAT) if from_time is not None else 'start'
+    end = to_time.strftime(NAME_TIME_FORMAT) if to_time is not None else 'latest'
+    return f"{currency_pair.replace('/', '_')}_{granularity}_{start}_{end}_w{window_size}_test{test_size:g}_{'-'.join(columns)}"
+
+
+def watermark_record(watermark):
+    """Return a watermark from read_watermark in the JSON form stored in manifests."""
+    last_timestamp, checksum = watermark['last_timestamp'], watermark['checksum']
+    if last_timestamp is not None:
+        last_timestamp = np.datetime64(last_timestamp, 'us').item().isoformat()
+    if checksum is not None:
+        checksum = float(f"{checksum:.{CHECKSUM_DIGITS}g}")
+    return {'rows': int(watermark['rows']), 'last_timestamp': last_timestamp, 'checksum': checksum}
+
+
+def version_name(watermark, digest):
+    """Name the version directory of a watermark record and array digest, e.g. '20240125T000000_250_3f2a9c01b7de'."""
+    last_timestamp = datetime.fromisoformat(watermark['last_timestamp'])
+    return f"{last_timestamp.strftime(NAME_TIME_FORMAT)}_{watermark['rows']}_{digest[:DIGEST_LENGTH]}"
+
+
+def array_digest(arrays):
+    """Return the SHA-256 hex digest of the bytes of arrays, in order."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def scaler_params(scaler):
+    """Return the parameters of a fitted MinMaxScaler as JSON-serialisable lists."""
+    return {'feature_range': list(scaler.feature_range), 'data_min': scaler.data_min_.tolist(),
+            'data_max': scaler.data_max_.tolist()}
+
+
+def build_scaler(params):
+    """
+    Rebuild a fitted MinMaxScaler from scaler_params.
+
+    Fitting on the stored minima and maxima alone reproduces the original scaling exactly.
+    """
+    scaler = MinMaxScaler(feature_range=tuple(params['feature_range']))
+    return scaler.fit(np.array([params['data_min'], params['data_max']]))
+
+
+def _write_atomic(path, text):
+    """Write a small text file so readers see either the old or the new content."""
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temporary, 'w') as file:
+        file.write(text)
+    os.replace(temporary, path)
+
+
+def _read_manifest(version_path):
+    with open(os.path.join(version_path, MANIFEST_FILE)) as file:
+        return json.load(file)
+
+
+def current_version(set_path):
+    """
+    Return the path of the current version of a feature set.
+
+    Args:
+        set_path (str): Directory of the feature set.
+
+    Returns:
+        str: Path of the version directory, or None if nothing has been materialised.
+    """
+    try:
+        with open(os.path.join(set_path, CURRENT_FILE)) as file:
+            version_path = os.path.join(set_path, file.read().strip())
+    except FileNotFoundError:
+        return None
+    return version_path if os.path.isdir(version_path) else None
+
+
+def prune_versions(set_path, keep=FEATURE_STORE_KEEP_VERSIONS):
+    """Delete all but the keep most recently materialised versions of a feature set, never the current one."""
+    current = current_version(set_path)
+    versions = [entry for entry in os.scandir(set_path) if entry.is_dir() and not entry.name.startswith('.')]
+    # Corrected candles give a new version with the same watermark prefix, so names alone do not order them
+    versions.sort(key=lambda entry: (entry.stat().st_mtime_ns, entry.name), reverse=True)
+    for entry in versions[keep:]:
+        if entry.path != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def materialise_features(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                         window_size=30, columns=('close',), test_size=0.2, root=None, engine=None):
+    """
+    Read, scale and save a feature set as a new version and make it current.
+
+    Features are scaled per column and the close target by its own scaler over the whole range, as
+    scale_data does, so evaluate_model can inverse transform predictions with the target scaler.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        from_time (datetime): Start of the range, inclusive.
+        to_time (datetime): End of the range, exclusive.
+        window_size (int): Timesteps per sequence.
+        columns (tuple): Feature columns, names from SERIES_DTYPES other than 'timestamp'.
+        test_size (float): Fraction of the sequences used as test set.
+        root (str): Store directory; defaults to FEATURE_STORE_DIR.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        str: Path of the version directory.
+    """
+    columns = tuple(columns)
+    set_path = os.path.join(root or FEATURE_STORE_DIR, feature_set_name(
+        currency_pair, granularity, from_time, to_time, window_size, columns, test_size))
+    read_columns = ('timestamp',) + tuple(dict.fromkeys(columns + CHECKSUM_COLUMNS))
+    arrays = read_series(currency_pair, granularity, from_time, to_time, read_columns, engine)
+
+    timestamps = arrays['timestamp']
+    if not len(timestamps):
+        raise ValueError(f"No {granularity} candles for {currency_pair} to build features from")
+    # The watermark of the rows actually read, which may be newer than the one that triggered the read
+    checksum = float(np.sum([arrays[column] for column in CHECKSUM_COLUMNS], axis=0).sum())
+    watermark = watermark_record({'rows': len(timestamps), 'last_timestamp': timestamps[-1], 'checksum': checksum})
+
+    feature_scaler = MinMaxScaler(feature_range=(0, 1))
+    features = feature_scaler.fit_transform(np.column_stack([arrays[column] for column in columns]))
+    target_scaler = MinMaxScaler(feature_range=(0, 1))
+    targets = target_scaler.fit_transform(arrays['close'].reshape(-1, 1)).ravel()
+    samples = max(len(timestamps) - window_size, 0)
+    manifest = {
+        'currency_pair': currency_pair,
+        'granularity': granularity,
+        'from_time': from_time.isoformat() if from_time is not None else None,
+        'to_time': to_time.isoformat() if to_time is not None else None,
+        'window_size': window_size,
+        'columns': list(columns),
+        'test_size': test_size,
+        'split_index': int(samples * (1 - test_size)),
+        'watermark': watermark,
+        'feature_scaler': scaler_params(feature_scaler),
+        'target_scaler': scaler_params(target_scaler),
+        'created_at': datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+    }
+
+    stored = {'features': features.astype(FEATURE_DTYPE), 'targets': targets.astype(FEATURE_DTYPE),
+              'timestamps': timestamps, 'raw_features': np.column_stack([arrays[column] for column in columns]),
+              'raw_targets': arrays['close']}
+    os.makedirs(set_path, exist_ok=True)
+    version = version_name(watermark, array_digest(stored[name] for name in ARRAY_NAMES))
+    version_path = os.path.join(set_path, version)
+    temporary = os.path.join(set_path, f".{version}.{uuid.uuid4().hex}")
+    os.makedirs(temporary)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(temporary, f'{name}.npy'), stored[name])
+    with open(os.path.join(temporary, MANIFEST_FILE), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    try:
+        os.rename(temporary, version_path)
+        logging.info(f"Materialised {len(timestamps)} {granularity} candles of {currency_pair} to {version_path}")
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors=True)
+        if not os.path.isdir(version_path):
+            raise
+        # The name holds the digest of the arrays, so the existing version has exactly these values
+        logging.info(f"Feature set {version_path} already holds these {len(timestamps)} candles")
+    _write_atomic(os.path.join(set_path, CURRENT_FILE), version)
+    prune_versions(set_path)
+    return version_path
+
+
+def open_feature_set(version_path):
+    """
+    Memory-map the arrays of a feature set version.
+
+    Args:
+        version_path (str): Version directory, e.g. from materialise_features.
+
+    Returns:
+        dict: The manifest entries plus read-only memory-mapped 'features' (rows, features),
+            'targets' (rows,), 'timestamps' and their unscaled float64 'raw_features' and
+            'raw_targets', the rebuilt 'scaler' of the targets and
+            'feature_scaler', and the 'path' of the version.
+    """
+    feature_set = _read_manifest(version_path)
+    for name in ARRAY_NAMES:
+        feature_set[name] = np.load(os.path.join(version_path, f'{name}.npy'), mmap_mode='r')
+    feature_set['scaler'] = build_scaler(feature_set['target_scaler'])
+    feature_set['feature_scaler'] = build_scaler(feature_set['feature_scaler'])
+    feature_set['path'] = version_path
+    return feature_set
+
+
+def load_features(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, from_time=None, to_time=None,
+                  window_size=30, columns=('close',), test_size=0.2, root=None, engine=None, refresh=False):
+    """
+    Open the current version of a feature set, materialising it first if the source candles changed.
+
+    Takes the same arguments as materialise_features.
+
+    Args:
+        refresh (bool): Re-read and re-scale the candles even if the watermark is unchanged; a version
+            with identical arrays is kept rather than rewritten.
+
+    Returns:
+        dict: The feature set, see open_feature_set.
+    """
+    columns = tuple(columns)
+    set_path = os.path.join(root or FEATURE_STORE_DIR, feature_set_name(
+        currency_pair, granularity, from_time, to_time, window_size, columns, test_size))
+    version_path = current_version(set_path)
+    if version_path is not None and not refresh:
+        manifest = _read_manifest(version_path)
+        watermark = watermark_record(read_watermark(currency_pair, granularity, from_time, to_time, engine))
+        if manifest['watermark'] == watermark:
+            logging.info(f"Feature set {version_path} is up to date")
+            return open_feature_set(version_path)
+        logging.info(f"Source watermark moved from {manifest['watermark']} to {watermark}")
+    return open_feature_set(materialise_features(currency_pair, granularity, from_time, to_time, window_size,
+                                                 columns, test_size, root, engine))
+
+
+def training_arrays(feature_set):
+    """
+    Cut a feature set into the training and test sequences of a_data_preparation.main.
+
+    The sequences are read-only views of the memory-mapped arrays, so nothing is read into memory
+    until the model touches it.
+
+    Args:
+        feature_set (dict): A feature set from load_features.
+
+    Returns:
+        X_train, X_test, y_train, y_test, scaler: Sequences, targets and the target scaler.
+    """
+    X, y = build_sequences(feature_set['features'], feature_set['targets'], feature_set['window_size'])
+    X_train, X_test, y_train, y_test = split_data(X, y, feature_set['test_size'])
+    return X_train, X_test, y_train, y_test, feature_set['scaler']
+
+
+def main(currency_pair='EUR/USD', granularity='D', window_size=30, columns=('close',), look_back_days=100):
+    """
+    Load the feature set of a pair from the store, the stored counterpart of a_data_preparation.main.
+
+    Like fetch_data it covers the last look_back_days, but from midnight, so every run of a day
+    shares one feature set instead of keying a new one by the second.
+
+    Returns:
+        X_train, X_test, y_train, y_test, scaler: Prepared and split data for LSTM and scaler.
+    """
+    from_time = datetime.combine(datetime.now().date() - timedelta(days=look_back_days), time())
+    return training_arrays(load_features(currency_pair, granularity, from_time, window_size=window_size,
+                                         columns=columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialise scaled LSTM features to the feature store.")
+    parser.add_argument('--pair', default="EUR/USD", help="Currency pair, e.g. EUR/USD")
+    parser.add_argument('--granularity', default='D', help="OANDA granularity code of the candles")
+    parser.add_argument('--from', dest='from_time', type=datetime.fromisoformat, help="Range start (ISO date)")
+    parser.add_argument('--to', dest='to_time', type=datetime.fromisoformat, help="Range end, exclusive (ISO date)")
+    parser.add_argument('--window-size', type=int, default=30, help="Timesteps per sequence")
+    parser.add_argument('--columns', nargs='+', default=['close'], help="Feature columns, e.g. close volume")
+    parser.add_argument('--refresh', action='store_true', help="Rebuild even if the source data is unchanged")
+    args = parser.parse_args()
+    load_features(args.pair, args.granularity, args.from_time, args.to_time, args.window_size, args.columns,
+                  refresh=args.refresh)
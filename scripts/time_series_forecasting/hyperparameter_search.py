@@ -0,0 +1,254 @@
+"""
+This module searches LSTM hyperparameters by training candidates in parallel worker processes.
+
+Configurations are drawn from a search space of units, layers, window size, dropout, learning
+rate and batch size, and pruned by successive halving: every surviving trial trains up to the
+rung's epoch budget, only the best 1/eta by validation loss go on to a budget eta times larger,
+and the others stop there. Trials resume from their saved model at each rung, so no epoch is
+trained twice.
+
+The data is prepared once per window size through the feature store and workers memory-map it,
+so the pool shares one copy of it through the page cache. Each worker pins TensorFlow's intra-op
+and inter-op thread pools so the pool does not oversubscribe the cores. The leaderboard ranks the
+trials by how far they got and their validation loss, with the test metrics of evaluate_model.
+
+    python -m scripts.time_series_forecasting.hyperparameter_search --trials 27 --workers 4
+"""
+
+import argparse
+import csv
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from database.dimensions import DEFAULT_GRANULARITY
+from scripts.time_series_forecasting.feature_store import load_features, open_feature_set, training_arrays
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Values tried for each hyperparameter
+SEARCH_SPACE = {
+    'units': [32, 50, 64],
+    'layers': [1, 2],
+    'window_size': [20, 30, 60],
+    'dropout_rate': [0.1, 0.2],
+    'learning_rate': [0.001, 0.0005],
+    'batch_size': [32, 64],
+}
+
+# Successive halving: epochs of the first rung, cap of the last and the fraction kept per rung
+MIN_EPOCHS = 2
+MAX_EPOCHS = 18
+ETA = 3
+
+# Fraction of the training sequences, taken from their end, used for the validation loss
+VALIDATION_SPLIT = 0.1
+
+LEADERBOARD_COLUMNS = ('rank', 'trial', 'rung', 'epochs', 'val_loss', 'RMSE', 'MAE', 'Directional Accuracy', 'units',
+                       'layers', 'window_size', 'dropout_rate', 'learning_rate', 'batch_size', 'model_path')
+
+
+def sample_configurations(space=None, trials=None, seed=None):
+    """
+    Draw distinct configurations from a search space.
+
+    Args:
+        space (dict): Values tried for each hyperparameter; defaults to SEARCH_SPACE.
+        trials (int): Number of configurations; None for the whole grid.
+        seed (int): Sampling seed.
+
+    Returns:
+        list: Configuration dicts, in random order when sampled and grid order otherwise.
+    """
+    space = space or SEARCH_SPACE
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if trials is None or trials >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, trials)
+
+
+def rung_epochs(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    """Return the cumulative epoch budget of every rung, e.g. [2, 6, 18]."""
+    budgets = [min_epochs]
+    while budgets[-1] < max_epochs:
+        budgets.append(min(budgets[-1] * eta, max_epochs))
+    return budgets
+
+
+def successive_halving(configurations, run_rung, min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    """
+    Train configurations rung by rung, keeping the best 1/eta of them after each rung.
+
+    Args:
+        configurations (list): Configuration dicts.
+        run_rung (callable): run_rung(trials, epochs) trains every trial dict up to epochs in total
+            and returns one result dict per trial, in order, holding at least 'val_loss'.
+        min_epochs (int): Epochs of the first rung.
+        max_epochs (int): Epochs of the last rung.
+        eta (int): Reduction factor between rungs.
+
+    Returns:
+        list: One dict per trial with its configuration, 'trial', 'rung', 'epochs' and the result
+            of the last rung it trained in.
+    """
+    trials = [{'trial': index, **configuration} for index, configuration in enumerate(configurations)]
+    survivors = trials
+    for rung, epochs in enumerate(rung_epochs(min_epochs, max_epochs, eta)):
+        logging.info(f"Rung {rung}: training {len(survivors)} trials to {epochs} epochs")
+        for trial, result in zip(survivors, run_rung(survivors, epochs)):
+            trial.update(result, rung=rung, epochs=epochs)
+        if len(survivors) == 1:
+            break
+        survivors = sorted(survivors, key=lambda trial: trial['val_loss'])[:max(1, len(survivors) // eta)]
+    return trials
+
+
+def pin_threads(intra_op_threads, inter_op_threads):
+    """
+    Limit the thread pools of TensorFlow in a worker; runs before the worker executes any op.
+
+    Args:
+        intra_op_threads (int): Threads used inside one op, e.g. a matrix multiplication.
+        inter_op_threads (int): Ops run concurrently.
+    """
+    os.environ['OMP_NUM_THREADS'] = str(intra_op_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def train_trial(trial, epochs, feature_set_path, model_dir):
+    """
+    Train one trial up to epochs in total, resuming from its saved model, and evaluate it.
+
+    Runs in a worker process.
+
+    Args:
+        trial (dict): Configuration with 'trial' and, after the first rung, the 'epochs' already trained.
+        epochs (int): Epochs trained in total after this call.
+        feature_set_path (str): Feature store version holding the data for the trial's window size.
+        model_dir (str): Directory of the saved trial models.
+
+    Returns:
+        dict: 'val_loss' after the last epoch, the metrics of evaluate_model on the test set and 'model_path'.
+    """
+    from tensorflow.keras.models import load_model
+    from scripts.time_series_forecasting.b_lstm_model import create_lstm_model
+    from scripts.time_series_forecasting.c_evaluate_model import evaluate_model
+
+    X_train, X_test, y_train, y_test, scaler = training_arrays(open_feature_set(feature_set_path))
+    model_path = os.path.join(model_dir, f"trial_{trial['trial']}.keras")
+    trained_epochs = trial.get('epochs', 0)
+    if trained_epochs:
+        # The saved model keeps the optimizer state, so training continues where the last rung stopped
+        model = load_model(model_path)
+    else:
+        model = create_lstm_model((X_train.shape[1], X_train.shape[2]), dropout_rate=trial['dropout_rate'],
+                                  units=trial['units'], layers=trial['layers'],
+                                  learning_rate=trial['learning_rate'])
+    history = model.fit(X_train, y_train, validation_split=VALIDATION_SPLIT, batch_size=trial['batch_size'],
+                        initial_epoch=trained_epochs, epochs=epochs, verbose=0)
+    model.save(model_path)
+    metrics = evaluate_model(model, X_test, y_test, scaler)
+    return {'val_loss': float(history.history['val_loss'][-1]), 'model_path': model_path,
+            **{name: float(value) for name, value in metrics.items()}}
+
+
+def write_leaderboard(trials, path):
+    """
+    Rank trials by the rung they reached, then validation loss, and write them to a CSV file.
+
+    Args:
+        trials (list): Trial dicts from successive_halving.
+        path (str): CSV file to write.
+
+    Returns:
+        list: The trials in rank order, each with its 'rank'.
+    """
+    ranked = sorted(trials, key=lambda trial: (-trial['rung'], trial['val_loss']))
+    for rank, trial in enumerate(ranked, start=1):
+        trial['rank'] = rank
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=LEADERBOARD_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(ranked)
+    logging.info(f"Wrote the leaderboard of {len(ranked)} trials to {path}")
+    return ranked
+
+
+def run_search(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, space=None, trials=None, workers=None,
+               intra_op_threads=None, inter_op_threads=1, min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA,
+               leaderboard_path='models/leaderboard.csv', model_dir='models/search', seed=None, root=None,
+               engine=None):
+    """
+    Run a successive halving search on a pool of worker processes and write its leaderboard.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        space (dict): Values tried for each hyperparameter; defaults to SEARCH_SPACE.
+        trials (int): Configurations sampled from the space; None for the whole grid.
+        workers (int): Worker processes; defaults to the number of CPUs.
+        intra_op_threads (int): TensorFlow intra-op threads per worker; defaults to an equal share of the CPUs.
+        inter_op_threads (int): TensorFlow inter-op threads per worker.
+        min_epochs (int): Epochs of the first rung.
+        max_epochs (int): Epochs of the last rung.
+        eta (int): Reduction factor between rungs.
+        leaderboard_path (str): CSV file of the leaderboard.
+        model_dir (str): Directory of the saved trial models.
+        seed (int): Sampling seed.
+        root (str): Feature store directory.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        list: The trials in rank order.
+    """
+    configurations = sample_configurations(space, trials, seed)
+    # Data is prepared once per window size, here, and only memory-mapped by the workers
+    feature_set_paths = {
+        window_size: load_features(currency_pair, granularity, window_size=window_size, root=root,
+                                   engine=engine)['path']
+        for window_size in sorted({configuration['window_size'] for configuration in configurations})
+    }
+    os.makedirs(model_dir, exist_ok=True)
+
+    cpus = os.cpu_count() or 1
+    workers = workers or cpus
+    intra_op_threads = intra_op_threads or max(1, cpus // workers)
+    logging.info(f"Searching {len(configurations)} configurations on {workers} workers with "
+                 f"{intra_op_threads} intra-op and {inter_op_threads} inter-op threads each")
+
+    # Workers are spawned rather than forked, so each starts TensorFlow with its own pinned thread pools
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=pin_threads, initargs=(intra_op_threads, inter_op_threads)) as pool:
+        def run_rung(rung_trials, epochs):
+            return list(pool.map(train_trial, rung_trials, itertools.repeat(epochs),
+                                 [feature_set_paths[trial['window_size']] for trial in rung_trials],
+                                 itertools.repeat(model_dir)))
+
+        results = successive_halving(configurations, run_rung, min_epochs, max_epochs, eta)
+    return write_leaderboard(results, leaderboard_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search LSTM hyperparameters with successive halving.")
+    parser.add_argument('--pair', default="EUR/USD", help="Currency pair, e.g. EUR/USD")
+    parser.add_argument('--granularity', default='D', help="OANDA granularity code of the candles")
+    parser.add_argument('--trials', type=int, help="Configurations sampled from the search space (default: all)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: number of CPUs)")
+    parser.add_argument('--intra-op-threads', type=int, help="TensorFlow intra-op threads per worker")
+    parser.add_argument('--inter-op-threads', type=int, default=1, help="TensorFlow inter-op threads per worker")
+    parser.add_argument('--min-epochs', type=int, default=MIN_EPOCHS, help="Epochs of the first rung")
+    parser.add_argument('--max-epochs', type=int, default=MAX_EPOCHS, help="Epochs of the last rung")
+    parser.add_argument('--eta', type=int, default=ETA, help="Reduction factor between rungs")
+    parser.add_argument('--leaderboard', default='models/leaderboard.csv', help="CSV file of the leaderboard")
+    parser.add_argument('--seed', type=int, help="Sampling seed")
+    args = parser.parse_args()
+    run_search(args.pair, args.granularity, trials=args.trials, workers=args.workers,
+               intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads,
+               min_epochs=args.min_epochs, max_epochs=args.max_epochs, eta=args.eta,
+               leaderboard_path=args.leaderboard, seed=args.seed)
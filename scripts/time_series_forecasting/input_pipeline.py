@@ -0,0 +1,148 @@
+"""
+This module builds streaming tf.data input pipelines for LSTM training.
+
+Instead of materialising every training sequence before model.fit, the pipeline holds the scaled
+series once and cuts the windows batch by batch, in the way of
+tf.keras.utils.timeseries_dataset_from_array: a dataset of sequence start indices is shuffled per
+sequence, batched, and a parallel map gathers each batch of windows from the series. With caching
+the series is copied once into a float32 tensor, window_size times smaller than its windows; without
+it windows are read straight from the array, e.g. a memory-mapped feature store file. Batches are
+prefetched so the next one is ready while the current one trains.
+"""
+
+import numpy as np
+import tensorflow as tf
+from scripts.time_series_forecasting.a_data_preparation import fetch_data, scale_data
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def make_dataset(features, targets, window_size=30, batch_size=32, cache=True, shuffle=False, seed=None):
+    """
+    Build a dataset of (sequence, target) batches, with the target following each sequence.
+
+    Sequences match those of prepare_data_for_lstm: sequence i covers rows i to i + window_size - 1
+    and its target is row i + window_size.
+
+    Args:
+        features (np.array): Series of shape (rows, features).
+        targets (np.array): Target value of every row, shape (rows,).
+        window_size (int): Timesteps per sequence.
+        batch_size (int): Sequences per batch.
+        cache (bool): Keep the series in memory as a float32 tensor after reading it once; when
+            False windows are read from the arrays for every batch. Windows are never cached.
+        shuffle (bool): Shuffle the sequences in every epoch, as model.fit does with arrays.
+        seed (int): Shuffle seed.
+
+    Returns:
+        tf.data.Dataset: Batches of shape (batch, timesteps, features) and (batch,).
+    """
+    samples = max(len(features) - window_size, 0)
+    offsets = np.arange(window_size)
+    if cache:
+        series = tf.constant(np.asarray(features, dtype=np.float32))
+        labels = tf.constant(np.asarray(targets[window_size:], dtype=np.float32))
+
+        def cut(indices):
+            return tf.gather(series, indices[:, None] + offsets), tf.gather(labels, indices)
+    else:
+        def read(indices):
+            return (np.asarray(features[indices[:, None] + offsets], dtype=np.float32),
+                    np.asarray(targets[indices + window_size], dtype=np.float32))
+
+        def cut(indices):
+            X, y = tf.numpy_function(read, [indices], (tf.float32, tf.float32))
+            X.set_shape((None, window_size, features.shape[1]))
+            y.set_shape((None,))
+            return X, y
+
+    # Only the start indices are shuffled, 8 bytes per sequence
+    dataset = tf.data.Dataset.range(samples)
+    if shuffle:
+        dataset = dataset.shuffle(max(samples, 1), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(cut, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
+
+
+def split_series(features, targets, window_size=30, test_size=0.2):
+    """
+    Split a series chronologically so the sequences of each part match those of split_data.
+
+    The test part starts window_size rows before its first target, so no sequence is lost at the split.
+
+    Args:
+        features (np.array): Series of shape (rows, features).
+        targets (np.array): Target value of every row.
+        window_size (int): Timesteps per sequence.
+        test_size (float): Fraction of the sequences used as test set.
+
+    Returns:
+        tuple: (train_features, train_targets, test_features, test_targets), all views of the inputs.
+    """
+    split_index = int((len(features) - window_size) * (1 - test_size))
+    train_end = split_index + window_size
+    return features[:train_end], targets[:train_end], features[split_index:], targets[split_index:]
+
+
+def build_datasets(data, window_size=30, batch_size=32, test_size=0.2, feature_columns=('scaled_close',),
+                   target_column='scaled_close', cache=True, shuffle=True):
+    """
+    Build the training and test datasets of a scaled DataFrame.
+
+    Args:
+        data (DataFrame): Scaled currency data, e.g. from scale_data.
+        window_size (int): Timesteps per sequence.
+        batch_size (int): Sequences per batch.
+        test_size (float): Fraction of the sequences used as test set.
+        feature_columns (tuple): Columns fed to the model at every timestep.
+        target_column (str): Column predicted one step after each sequence.
+        cache (bool): Keep the series in memory, see make_dataset.
+        shuffle (bool): Shuffle the training sequences in every epoch, as model.fit does with arrays.
+
+    Returns:
+        tuple: (train_dataset, test_dataset, y_test), y_test holding the test targets in order.
+    """
+    features = data[list(feature_columns)].to_numpy(dtype=np.float32)
+    targets = data[target_column].to_numpy(dtype=np.float32)
+    train_features, train_targets, test_features, test_targets = split_series(features, targets, window_size,
+                                                                              test_size)
+    train_dataset = make_dataset(train_features, train_targets, window_size, batch_size, cache=cache, shuffle=shuffle)
+    test_dataset = make_dataset(test_features, test_targets, window_size, batch_size, cache=cache)
+    return train_dataset, test_dataset, test_targets[window_size:]
+
+
+def build_feature_set_datasets(feature_set, batch_size=32, cache=True, shuffle=True):
+    """
+    Build the training and test datasets of a feature set from the feature store.
+
+    The split stored with the feature set is used. Without caching, windows are read from the
+    memory-mapped arrays for every batch, so the series never has to fit in memory.
+
+    Args:
+        feature_set (dict): A feature set from feature_store.load_features.
+        batch_size (int): Sequences per batch.
+        cache (bool): Keep the series in memory, see make_dataset.
+        shuffle (bool): Shuffle the training sequences in every epoch.
+
+    Returns:
+        tuple: (train_dataset, test_dataset, y_test), y_test holding the test targets in order.
+    """
+    features, targets = feature_set['features'], feature_set['targets']
+    window_size, split_index = feature_set['window_size'], feature_set['split_index']
+    train_end = split_index + window_size
+    train_dataset = make_dataset(features[:train_end], targets[:train_end], window_size, batch_size, cache=cache,
+                                 shuffle=shuffle)
+    test_dataset = make_dataset(features[split_index:], targets[split_index:], window_size, batch_size, cache=cache)
+    return train_dataset, test_dataset, targets[train_end:]
+
+
+def main(window_size=30, batch_size=32):
+    """
+    Fetch and scale the data and build its datasets, the tf.data counterpart of a_data_preparation.main.
+
+    Returns:
+        train_dataset, test_dataset, y_test, scaler: Datasets, test targets and the scaler.
+    """
+    data, scaler = scale_data(fetch_data())
+    train_dataset, test_dataset, y_test = build_datasets(data, window_size, batch_size)
+    return train_dataset, test_dataset, y_test, scaler
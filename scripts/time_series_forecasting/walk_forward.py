@@ -0,0 +1,322 @@
+"""
+This module backtests the LSTM with walk-forward and expanding-window evaluation.
+
+The sequences of a feature set are cut into an initial training block followed by consecutive
+test blocks, and the last N complete blocks, up to the latest sequences, are the folds. In an
+expanding backtest every fold trains on all sequences before its test block; in a walk-forward one
+on the train_size sequences just before it. Each fold fits its own scalers on its training rows
+only, from the unscaled series of the feature store, so no test value leaks into the scaling. Each
+fold is scored by evaluate_model, so the report shows RMSE, MAE and directional accuracy regime by
+regime rather than for one 80/20 split.
+
+Independent folds train in parallel worker processes with pinned thread pools. With warm_start,
+each fold instead starts from the weights of the previous fold and only fine-tunes, so folds run
+one after another.
+
+Every fold result is cached under a key hashed from the fold's unscaled rows and their timestamps,
+its sizes, the model parameters and, when warm-starting, the key of the previous fold. Re-running
+a backtest skips the folds whose key is unchanged. With explicit test_size and train_size the
+blocks stay put as new candles arrive: once a further test block of candles has come in, the
+folds move on by one block and only the new last fold is trained. Warm-started folds are the
+exception, as each key holds the chain of folds before it and the new first fold has none. With
+the default sizes the blocks are recomputed from the number of sequences, so every fold changes
+with every new candle.
+
+    python -m scripts.time_series_forecasting.walk_forward --folds 5 --mode walk_forward
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from database.dimensions import DEFAULT_GRANULARITY
+from scripts.time_series_forecasting.a_data_preparation import build_sequences
+from scripts.time_series_forecasting.feature_store import load_features, open_feature_set
+from scripts.time_series_forecasting.hyperparameter_search import pin_threads, VALIDATION_SPLIT
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Directory of the cached fold results and weights
+WALK_FORWARD_CACHE_DIR = os.getenv('WALK_FORWARD_CACHE_DIR', 'walk_forward_cache')
+
+# 'expanding' trains every fold from the first sequence, 'walk_forward' on a fixed-size window
+FOLD_MODES = ('expanding', 'walk_forward')
+
+# Model and training parameters of every fold
+DEFAULT_PARAMS = {
+    'units': 50,
+    'layers': 2,
+    'dropout_rate': 0.2,
+    'learning_rate': 0.001,
+    'batch_size': 32,
+    'epochs': 20,
+    'patience': 5,
+}
+
+# Parameters passed on to create_lstm_model
+MODEL_PARAMS = ('units', 'layers', 'dropout_rate', 'learning_rate')
+
+METRICS = ('RMSE', 'MAE', 'Directional Accuracy')
+
+
+def make_folds(samples, n_folds=5, test_size=None, train_size=None, mode='expanding'):
+    """
+    Lay out the folds of a backtest over a number of sequences.
+
+    The first train_size sequences only train; test blocks of test_size sequences follow them, and
+    the folds are the last n_folds blocks that are complete. With both sizes given, sequences after
+    the last complete block wait for the next fold, and the folds before them keep their place.
+
+    Args:
+        samples (int): Number of sequences.
+        n_folds (int): Number of folds.
+        test_size (int): Sequences per test block; defaults to samples // (n_folds + 1).
+        train_size (int): Sequences before the first test block, and the training window of a
+            walk-forward backtest; defaults to all sequences not used by the n_folds test blocks,
+            so the last fold ends at the last sequence.
+        mode (str): One of FOLD_MODES.
+
+    Returns:
+        list: One dict per fold with 'fold', 'train_start', 'train_end', 'test_start' and 'test_end',
+            half-open ranges of sequence indices.
+
+    Raises:
+        ValueError: If the mode is unknown or the folds do not fit in the sequences.
+    """
+    if mode not in FOLD_MODES:
+        raise ValueError(f"Unknown fold mode {mode!r}; expected one of {', '.join(FOLD_MODES)}")
+    test_size = test_size or samples // (n_folds + 1)
+    train_size = train_size or samples - n_folds * test_size
+    if n_folds < 1 or test_size < 1 or train_size < 1 or train_size + n_folds * test_size > samples:
+        raise ValueError(f"{n_folds} folds of {test_size} test sequences after {train_size} training sequences "
+                         f"do not fit in {samples} sequences")
+    first_block = (samples - train_size) // test_size - n_folds
+    folds = []
+    for fold in range(n_folds):
+        test_start = train_size + (first_block + fold) * test_size
+        folds.append({
+            'fold': fold,
+            'train_start': 0 if mode == 'expanding' else test_start - train_size,
+            'train_end': test_start,
+            'test_start': test_start,
+            'test_end': test_start + test_size,
+        })
+    return folds
+
+
+def fold_key(fold, feature_set, params, previous_key=None):
+    """
+    Hash everything a fold result depends on into its cache key.
+
+    The key covers the fold's own unscaled rows rather than the scaled feature set, whose scaling
+    spans the whole series and so changes with every new high or low.
+
+    Args:
+        fold (dict): A fold from make_folds.
+        feature_set (dict): The feature set the fold is cut from.
+        params (dict): Model and training parameters.
+        previous_key (str): Key of the fold whose weights this one starts from, if any.
+
+    Returns:
+        str: Hex digest identifying the fold result.
+    """
+    window_size = feature_set['window_size']
+    digest = hashlib.sha256(json.dumps({
+        'train_size': fold['train_end'] - fold['train_start'],
+        'test_size': fold['test_end'] - fold['test_start'],
+        'window_size': window_size,
+        'columns': feature_set['columns'],
+        'params': params,
+        'previous': previous_key,
+    }, sort_keys=True).encode())
+    # Sequence i reads rows i to i + window_size, so these rows are all the fold ever sees
+    rows = slice(fold['train_start'], fold['test_end'] + window_size)
+    for name in ('timestamps', 'raw_features', 'raw_targets'):
+        digest.update(np.ascontiguousarray(feature_set[name][rows]).tobytes())
+    return digest.hexdigest()[:32]
+
+
+def fold_sequences(fold, feature_set):
+    """
+    Scale the rows of a fold with scalers fit on its training rows only and cut them into sequences.
+
+    Args:
+        fold (dict): A fold from make_folds.
+        feature_set (dict): The feature set the fold is cut from, with its unscaled arrays.
+
+    Returns:
+        X_train, X_test, y_train, y_test, scaler: Sequences, targets and the target scaler of the fold.
+    """
+    window_size = feature_set['window_size']
+    # Rows of the training sequences and their targets, then of the test ones
+    train_rows = slice(fold['train_start'], fold['train_end'] + window_size)
+    rows = slice(fold['train_start'], fold['test_end'] + window_size)
+    feature_scaler = MinMaxScaler(feature_range=(0, 1)).fit(feature_set['raw_features'][train_rows])
+    scaler = MinMaxScaler(feature_range=(0, 1)).fit(feature_set['raw_targets'][train_rows].reshape(-1, 1))
+    features = feature_scaler.transform(feature_set['raw_features'][rows])
+    targets = scaler.transform(feature_set['raw_targets'][rows].reshape(-1, 1)).ravel()
+    X, y = build_sequences(features, targets, window_size)
+    split = fold['train_end'] - fold['train_start']
+    return X[:split], X[split:], y[:split], y[split:], scaler
+
+
+def read_cached_fold(key, cache_dir, need_weights=False):
+    """Return the cached result of a fold key, or None if it was never trained or its weights are gone."""
+    try:
+        with open(os.path.join(cache_dir, f'{key}.json')) as file:
+            result = json.load(file)
+    except FileNotFoundError:
+        return None
+    if need_weights and not os.path.exists(result['weights_path']):
+        return None
+    return result
+
+
+def train_fold(fold, key, feature_set_path, params, cache_dir, initial_weights=None):
+    """
+    Train and evaluate one fold and cache its result and weights.
+
+    Runs in a worker process.
+
+    Args:
+        fold (dict): A fold from make_folds.
+        key (str): Cache key of the fold.
+        feature_set_path (str): Feature store version the fold is cut from.
+        params (dict): Model and training parameters.
+        cache_dir (str): Directory of the cached fold results.
+        initial_weights (str): Weights file of the previous fold to fine-tune from, if any.
+
+    Returns:
+        dict: The fold with its 'key', METRICS, 'weights_path' and whether it was 'warm_started'.
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+    from scripts.time_series_forecasting.b_lstm_model import create_lstm_model
+    from scripts.time_series_forecasting.c_evaluate_model import evaluate_model
+
+    X_train, X_test, y_train, y_test, scaler = fold_sequences(fold, open_feature_set(feature_set_path))
+    model = create_lstm_model((X_train.shape[1], X_train.shape[2]), **{name: params[name] for name in MODEL_PARAMS})
+    if initial_weights:
+        model.load_weights(initial_weights)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=params['patience'], restore_best_weights=True)
+    model.fit(X_train, y_train, validation_split=VALIDATION_SPLIT, epochs=params['epochs'],
+              batch_size=params['batch_size'], callbacks=[early_stopping], verbose=0)
+
+    weights_path = os.path.join(cache_dir, f'{key}.weights.h5')
+    model.save_weights(weights_path)
+    metrics = evaluate_model(model, X_test, y_test, scaler)
+    result = {**fold, 'key': key, 'weights_path': weights_path, 'warm_started': bool(initial_weights),
+              **{name: float(metrics[name]) for name in METRICS}}
+
+    # Written last and renamed into place, so a cached result always has its weights
+    temporary = os.path.join(cache_dir, f'.{key}.{os.getpid()}.json')
+    with open(temporary, 'w') as file:
+        json.dump(result, file, indent=2)
+    os.replace(temporary, os.path.join(cache_dir, f'{key}.json'))
+    return result
+
+
+def fold_report(results):
+    """
+    Tabulate fold results.
+
+    Args:
+        results (list): Fold results from run_walk_forward.
+
+    Returns:
+        DataFrame: Boundaries and METRICS per fold, indexed by fold, with a 'mean' row.
+    """
+    columns = ['train_start', 'train_end', 'test_start', 'test_end', *METRICS, 'cached']
+    report = pd.DataFrame(results, columns=['fold', *columns]).set_index('fold')
+    report.loc['mean', list(METRICS)] = report[list(METRICS)].mean()
+    return report
+
+
+def run_walk_forward(currency_pair='EUR/USD', granularity=DEFAULT_GRANULARITY, window_size=30, n_folds=5,
+                     test_size=None, train_size=None, mode='expanding', params=None, warm_start=False, workers=None,
+                     intra_op_threads=None, inter_op_threads=1, cache_dir=None, root=None, engine=None):
+    """
+    Backtest the LSTM over the folds of a pair's feature set, skipping folds cached by earlier runs.
+
+    Args:
+        currency_pair (str): The currency pair.
+        granularity (str): OANDA granularity code of the candles.
+        window_size (int): Timesteps per sequence.
+        n_folds (int): Number of folds.
+        test_size (int): Sequences per test block, see make_folds.
+        train_size (int): Sequences before the first test block, see make_folds.
+        mode (str): One of FOLD_MODES.
+        params (dict): Overrides of DEFAULT_PARAMS.
+        warm_start (bool): Start each fold from the weights of the previous one; folds then run in turn.
+        workers (int): Worker processes; defaults to the number of CPUs, capped at the folds to train.
+        intra_op_threads (int): TensorFlow intra-op threads per worker; defaults to an equal share of the CPUs.
+        inter_op_threads (int): TensorFlow inter-op threads per worker.
+        cache_dir (str): Directory of the cached fold results; defaults to WALK_FORWARD_CACHE_DIR.
+        root (str): Feature store directory.
+        engine: SQLAlchemy engine; defaults to the shared engine.
+
+    Returns:
+        list: One result dict per fold, in order, each marked 'cached' if it was skipped.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    cache_dir = cache_dir or WALK_FORWARD_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    feature_set = load_features(currency_pair, granularity, window_size=window_size, root=root, engine=engine)
+    folds = make_folds(len(feature_set['targets']) - window_size, n_folds, test_size, train_size, mode)
+
+    keys, previous_key = [], None
+    for fold in folds:
+        keys.append(fold_key(fold, feature_set, params, previous_key if warm_start else None))
+        previous_key = keys[-1]
+    results = [read_cached_fold(key, cache_dir, need_weights=warm_start) for key in keys]
+    for fold, result in zip(folds, results):
+        if result is not None:
+            # A cached fold may have had another position among the folds of the run that trained it
+            result.update(fold, cached=True)
+    pending = [index for index, result in enumerate(results) if result is None]
+    logging.info(f"{mode} backtest of {currency_pair}: {len(folds) - len(pending)} of {len(folds)} folds cached")
+    if not pending:
+        return results
+
+    cpus = os.cpu_count() or 1
+    workers = 1 if warm_start else min(workers or cpus, len(pending))
+    intra_op_threads = intra_op_threads or max(1, cpus // workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=pin_threads, initargs=(intra_op_threads, inter_op_threads)) as pool:
+        if warm_start:
+            for index in pending:
+                initial_weights = results[index - 1]['weights_path'] if index else None
+                results[index] = pool.submit(train_fold, folds[index], keys[index], feature_set['path'], params,
+                                             cache_dir, initial_weights).result()
+        else:
+            trained = pool.map(train_fold, [folds[index] for index in pending], [keys[index] for index in pending],
+                               repeat(feature_set['path']), repeat(params), repeat(cache_dir))
+            for index, result in zip(pending, trained):
+                results[index] = result
+    for index in pending:
+        results[index]['cached'] = False
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the LSTM model.")
+    parser.add_argument('--pair', default="EUR/USD", help="Currency pair, e.g. EUR/USD")
+    parser.add_argument('--granularity', default='D', help="OANDA granularity code of the candles")
+    parser.add_argument('--window-size', type=int, default=30, help="Timesteps per sequence")
+    parser.add_argument('--folds', type=int, default=5, help="Number of folds")
+    parser.add_argument('--test-size', type=int, help="Sequences per test block")
+    parser.add_argument('--train-size', type=int, help="Sequences before the first test block")
+    parser.add_argument('--mode', choices=FOLD_MODES, default='expanding', help="Training window of the folds")
+    parser.add_argument('--warm-start', action='store_true', help="Fine-tune each fold from the previous one")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+    fold_results = run_walk_forward(args.pair, args.granularity, args.window_size, args.folds, args.test_size,
+                                    args.train_size, args.mode, warm_start=args.warm_start, workers=args.workers)
+    print(fold_report(fold_results))
@@ -0,0 +1,137 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from scripts.backfill import split_range, fetch_window, iter_pages, run_backfill, main, BackfillCheckpoint
+
+
+def fake_candles(instrument, from_time=None, to_time=None, granularity='H1', **kwargs):
+    """Return one complete hourly candle per hour of the requested range."""
+    candles = []
+    current = from_time
+    while current <= to_time:  # OANDA may include a candle starting exactly at 'to'
+        candles.append({'complete': True, 'volume': 1, 'time': current.strftime('%Y-%m-%dT%H:%M:%S.000000000Z'),
+                        'mid': {'o': '1.1', 'h': '1.2', 'l': '1.0', 'c': '1.15'}})
+        current += timedelta(hours=1)
+    return candles
+
+
+class TestBackfill(unittest.TestCase):
+    """
+    Tests for splitting, fetching and resuming paginated backfills.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.temp_dir.name, 'checkpoint.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_split_range(self):
+        """Test that a range is split into page-sized, contiguous windows."""
+        start = datetime(2020, 1, 1)
+        windows = split_range(start, start + timedelta(hours=25), 'H1', page_size=10)
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0], (start, start + timedelta(hours=10)))
+        self.assertEqual(windows[-1], (start + timedelta(hours=20), start + timedelta(hours=25)))
+
+    @patch('scripts.backfill.fetch_ohlc_data', side_effect=fake_candles)
+    def test_fetch_window_drops_boundary_candles(self, mock_fetch):
+        """Test that candles starting at the window end are left to the next window."""
+        start = datetime(2020, 1, 1)
+        candles = fetch_window('EUR_USD', 'H1', (start, start + timedelta(hours=3)))
+
+        self.assertEqual([c['time'][11:13] for c in candles], ['00', '01', '02'])
+        mock_fetch.assert_called_once_with('EUR_USD', from_time=start, to_time=start + timedelta(hours=3),
+                                           granularity='H1')
+
+    @patch('scripts.backfill.fetch_ohlc_data')
+    def test_iter_pages_bounds_concurrency_and_keeps_order(self, mock_fetch):
+        """Test that pages are fetched concurrently but never with more than max_workers requests."""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def slow_fetch(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return fake_candles(*args, **kwargs)
+
+        mock_fetch.side_effect = slow_fetch
+        windows = split_range(datetime(2020, 1, 1), datetime(2020, 1, 3), 'H1', page_size=2)
+        pages = list(iter_pages('EUR_USD', 'H1', windows, max_workers=3))
+
+        self.assertEqual([window for window, _ in pages], windows)
+        self.assertEqual(sum(len(candles) for _, candles in pages), 48)
+        self.assertLessEqual(peak[0], 3)
+        self.assertGreater(peak[0], 1)
+
+    @patch('scripts.backfill.fetch_ohlc_data', side_effect=fake_candles)
+    def test_run_backfill_resumes_from_checkpoint(self, mock_fetch):
+        """Test that a crashed backfill resumes after the last committed window."""
+        start, end = datetime(2020, 1, 1), datetime(2020, 1, 2)
+        loaded = []
+        refreshed = []
+        calls = [0]
+
+        def flaky_loader(data, currency_pair, granularity, rollup):
+            calls[0] += 1
+            candles = list(data)
+            if calls[0] == 3:
+                raise RuntimeError("database went away")
+            loaded.extend(candles)
+            return {'inserted': len(candles), 'updated': 0, 'skipped': 0}
+
+        with self.assertRaises(RuntimeError):
+            run_backfill('EUR_USD', start, end, 'H1', checkpoint_path=self.checkpoint_path,
+                         max_workers=2, windows_per_commit=2, page_size=4, loader=flaky_loader,
+                         rollup=lambda pair, from_time, to_time: refreshed.append((from_time, to_time)))
+        checkpoint = BackfillCheckpoint(self.checkpoint_path, 'EUR_USD', 'H1', start, end)
+        self.assertEqual(checkpoint.load(), start + timedelta(hours=16))
+
+        totals = run_backfill('EUR_USD', start, end, 'H1', checkpoint_path=self.checkpoint_path,
+                              max_workers=2, windows_per_commit=2, page_size=4, loader=flaky_loader,
+                              rollup=lambda pair, from_time, to_time: refreshed.append((from_time, to_time)))
+
+        self.assertEqual(totals['inserted'], 8)
+        self.assertEqual(len(loaded), 24)
+        self.assertEqual(len({candle['time'] for candle in loaded}), 24)
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+        # Rollups follow every committed group, and only that group
+        self.assertEqual(refreshed, [(start + timedelta(hours=hours), start + timedelta(hours=hours + 8))
+                                     for hours in (0, 8, 16)])
+
+    def test_checkpoint_ignored_for_other_job(self):
+        """Test that a checkpoint of a different backfill is not used to resume."""
+        start, end = datetime(2020, 1, 1), datetime(2020, 1, 2)
+        BackfillCheckpoint(self.checkpoint_path, 'EUR_USD', 'H1', start, end).save(start + timedelta(hours=5))
+
+        self.assertIsNone(BackfillCheckpoint(self.checkpoint_path, 'GBP_USD', 'H1', start, end).load())
+
+    @patch('scripts.backfill.run_backfill')
+    def test_main_resumes_stored_range_end(self, mock_run_backfill):
+        """Test that a rerun without --to continues the unfinished backfill rather than starting a new one."""
+        start, end = datetime(2020, 1, 1), datetime(2020, 1, 2)
+        BackfillCheckpoint(self.checkpoint_path, 'EUR_USD', 'H1', start, end).save(start + timedelta(hours=5))
+
+        with patch('sys.argv', ['backfill', '--granularity', 'H1', '--from', '2020-01-01',
+                                '--checkpoint', self.checkpoint_path]):
+            main()
+        self.assertEqual(mock_run_backfill.call_args.args[2], end)
+
+        with patch('sys.argv', ['backfill', '--granularity', 'H1', '--from', '2019-01-01',
+                                '--checkpoint', self.checkpoint_path]):
+            main()
+        self.assertGreater(mock_run_backfill.call_args.args[2], end)
+
+
+if __name__ == '__main__':
+    unittest.main()
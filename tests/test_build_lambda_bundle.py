@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from scripts.build_lambda_bundle import is_excluded, copy_tree, compile_tree, SOURCE_DIR
+
+
+class TestBuildLambdaBundle(unittest.TestCase):
+    """
+    Tests for the Lambda bundle build step.
+    """
+
+    def test_is_excluded(self):
+        """Test that unused dialects, test suites and caches are dropped while runtime code is kept."""
+        self.assertTrue(is_excluded('sqlalchemy/testing/fixtures.py'))
+        self.assertTrue(is_excluded('sqlalchemy/dialects/mysql'))
+        self.assertTrue(is_excluded('sqlalchemy/dialects/postgresql/provision.py'))
+        self.assertTrue(is_excluded('idna/uts46data.py'))
+        self.assertTrue(is_excluded('database/__pycache__'))
+        self.assertFalse(is_excluded('sqlalchemy/dialects/postgresql/psycopg2.py'))
+        self.assertFalse(is_excluded('database/insert_data.py'))
+
+    def test_boto3_is_runtime_provided_unless_kept(self):
+        """Test that boto3 is dropped by default and trimmed to the used services when kept."""
+        self.assertTrue(is_excluded('botocore/client.py'))
+        self.assertTrue(is_excluded('boto3-1.34.112.dist-info'))
+        self.assertFalse(is_excluded('botocore/client.py', keep_boto3=True))
+        self.assertFalse(is_excluded('botocore/data/endpoints.json', keep_boto3=True))
+        self.assertFalse(is_excluded('botocore/data/secretsmanager/2017-10-17/service-2.json.gz', keep_boto3=True))
+        self.assertTrue(is_excluded('botocore/data/s3/2006-03-01/service-2.json.gz', keep_boto3=True))
+
+    def test_copy_and_compile_tree(self):
+        """Test that the copied tree skips excluded files and gets precompiled bytecode."""
+        with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as build_dir:
+            for path in ('lambda_function.py', 'sqlalchemy/testing/util.py', 'requirements.txt'):
+                full_path = os.path.join(source_dir, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, 'w') as file:
+                    file.write("VALUE = 1\n")
+            output_dir = os.path.join(build_dir, 'bundle')
+
+            self.assertEqual(copy_tree(source_dir, output_dir), 1)
+            self.assertTrue(compile_tree(output_dir))
+            self.assertEqual(sorted(os.listdir(output_dir)), ['__pycache__', 'lambda_function.py'])
+            self.assertTrue(os.listdir(os.path.join(output_dir, '__pycache__'))[0].startswith('lambda_function.'))
+
+    def test_handler_imports_from_built_bundle(self):
+        """Test that the handler imports from the trimmed bundle alone, without the excluded packages."""
+        with tempfile.TemporaryDirectory() as build_dir:
+            output_dir = os.path.join(build_dir, 'bundle')
+            copy_tree(SOURCE_DIR, output_dir)
+            self.assertTrue(compile_tree(output_dir))
+
+            # The bundle comes first on sys.path, so its trimmed sqlalchemy shadows the installed one
+            env = {**os.environ, 'PYTHONPATH': output_dir, 'PYTHONDONTWRITEBYTECODE': '1',
+                   'AWS_LAMBDA_FUNCTION_NAME': 'test'}
+            command = [sys.executable, '-c', 'import lambda_function, sqlalchemy; print(sqlalchemy.__file__)']
+            result = subprocess.run(command, cwd=output_dir, env=env, capture_output=True, text=True)
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(result.stdout.strip().startswith(output_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from requests.exceptions import ConnectionError
+from scripts.candle_cache import CandleCache, fetch_candles
+
+NOW = datetime(2024, 1, 10, 12, 0)
+
+
+class FakeOanda:
+    """Serves hourly candles up to NOW, the last one incomplete, honouring from/to/count."""
+
+    def __init__(self):
+        self.calls = []
+        self.online = True
+
+    def candle(self, time):
+        close = f"{1 + time.hour / 100:.5f}"
+        return {'complete': time + timedelta(hours=1) <= NOW, 'volume': 1,
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S.000000000Z'),
+                'mid': {'o': close, 'h': close, 'l': close, 'c': close}}
+
+    def __call__(self, **params):
+        if not self.online:
+            raise ConnectionError("offline")
+        self.calls.append(params)
+        start = datetime(2024, 1, 1)
+        times = [start + timedelta(hours=i) for i in range(int((NOW - start).total_seconds() // 3600) + 1)]
+        if 'from' in params:
+            lower = datetime.strptime(params['from'], '%Y-%m-%dT%H:%M:%SZ')
+            times = [t for t in times if t >= lower]
+        if 'to' in params:
+            upper = datetime.strptime(params['to'], '%Y-%m-%dT%H:%M:%SZ')
+            times = [t for t in times if t <= upper]
+        if 'count' in params:
+            times = times[-params['count']:] if 'from' not in params else times[:params['count']]
+        return [self.candle(t) for t in times]
+
+
+class TestCandleCache(unittest.TestCase):
+    """
+    Tests for the on-disk OANDA candle cache.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'candles.sqlite')
+        self.cache = CandleCache(self.path, clock=lambda: NOW)
+        self.oanda = FakeOanda()
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_range_is_served_from_disk_after_first_fetch(self):
+        """Test that a repeated historical range needs no network request."""
+        start, end = datetime(2024, 1, 2), datetime(2024, 1, 3)
+        first = self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end)
+        second = self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end)
+
+        self.assertEqual(len(first), 24)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.oanda.calls), 1)
+        self.assertEqual(self.cache.stats['hits'], 24)
+
+    def test_stats_are_exact_under_concurrent_reads(self):
+        """Test that counters lose no updates when a thread pool shares the cache."""
+        start, end = datetime(2024, 1, 2), datetime(2024, 1, 3)
+        self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end)
+        before = self.cache.snapshot()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end), range(200)))
+
+        self.assertEqual(self.cache.snapshot(), {**before, 'hits': before['hits'] + 200 * 24})
+
+    def test_only_uncached_tail_is_fetched(self):
+        """Test that extending a cached range only requests the missing tail."""
+        self.cache.get_range('EUR_USD', 'H1', self.oanda, datetime(2024, 1, 2), datetime(2024, 1, 3))
+        candles = self.cache.get_range('EUR_USD', 'H1', self.oanda, datetime(2024, 1, 2), datetime(2024, 1, 4))
+
+        self.assertEqual(len(candles), 48)
+        self.assertEqual(self.oanda.calls[-1]['from'], '2024-01-03T00:00:00Z')
+
+    def test_incomplete_candles_are_not_cached(self):
+        """Test that the forming candle is returned but refetched on the next call."""
+        latest = self.cache.get_latest('EUR_USD', 'H1', self.oanda, 5)
+        self.assertFalse(latest[-1]['complete'])
+
+        self.cache.get_latest('EUR_USD', 'H1', self.oanda, 5)
+        self.assertEqual(self.oanda.calls[-1], {'from': '2024-01-10T12:00:00Z', 'count': 5000})
+
+    def test_latest_combines_cache_and_tail(self):
+        """Test that latest-N requests return the same candles as the network would."""
+        expected = self.oanda(count=30)
+        self.cache.get_latest('EUR_USD', 'H1', self.oanda, 30)
+        self.assertEqual(self.cache.get_latest('EUR_USD', 'H1', self.oanda, 30), expected)
+        self.assertEqual(self.cache.get_from('EUR_USD', 'H1', self.oanda, datetime(2024, 1, 9, 10), 5),
+                         self.oanda(**{'from': '2024-01-09T10:00:00Z', 'count': 5}))
+
+    def test_cache_persists_and_works_offline(self):
+        """Test that a new process can serve cached ranges without network access."""
+        start, end = datetime(2024, 1, 2), datetime(2024, 1, 3)
+        self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end)
+        self.cache.close()
+
+        self.cache = CandleCache(self.path, clock=lambda: NOW)
+        self.oanda.online = False
+        self.assertEqual(len(self.cache.get_range('EUR_USD', 'H1', self.oanda, start, end)), 24)
+
+    def test_eviction_keeps_cache_under_size_limit(self):
+        """Test that least recently used series are evicted once the size limit is exceeded."""
+        self.cache.max_bytes = 64 * 1024
+        for instrument in ('EUR_USD', 'GBP_USD', 'USD_JPY', 'AUD_USD'):
+            self.cache.get_range(instrument, 'H1', self.oanda, datetime(2024, 1, 1), datetime(2024, 1, 10))
+
+        self.assertGreater(self.cache.stats['evictions'], 0)
+        self.assertLessEqual(self.cache._used_bytes(), self.cache.max_bytes)
+
+    def test_fetch_candles_without_cache_uses_client(self):
+        """Test that the client is called directly when no cache is configured."""
+        client = MagicMock()
+        client.get_candles.return_value = []
+        os.environ.pop('OANDA_CACHE_PATH', None)
+
+        fetch_candles(client, 'EUR_USD', 'D', count=10)
+
+        client.get_candles.assert_called_once_with('EUR_USD', 'D', count=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
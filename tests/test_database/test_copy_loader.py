@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+from scripts.copy_loader import IteratorFile, format_copy_line, build_merge_sql, copy_currency_data
+
+
+class TestCopyLoader(unittest.TestCase):
+
+    def test_iterator_file_reads_in_chunks(self):
+        """Test that IteratorFile only consumes the iterator as far as each read needs."""
+        consumed = []
+
+        def lines():
+            for i in range(5):
+                consumed.append(i)
+                yield f"line{i}\n"
+
+        stream = IteratorFile(lines())
+        self.assertEqual(stream.read(8), 'line0\nli')
+        self.assertEqual(consumed, [0, 1])
+        self.assertEqual(stream.read(), 'ne1\nline2\nline3\nline4\n')
+        self.assertEqual(stream.read(8), '')
+
+    def test_format_copy_line(self):
+        """Test that rows are rendered as tab-separated COPY text lines."""
+        row = {'instrument_id': 1, 'granularity_id': 19, 'timestamp': datetime(2023, 5, 1, 21, 0),
+               'open': 1.1, 'high': 1.2, 'low': 1.05, 'close': 1.15, 'volume': 1000}
+        self.assertEqual(format_copy_line(row), '1\t19\t2023-05-01 21:00:00\t1.1\t1.2\t1.05\t1.15\t1000.0\n')
+
+    def test_build_merge_sql(self):
+        """Test that the merge statement uses the (instrument_id, granularity_id, timestamp) conflict target."""
+        self.assertIn('ON CONFLICT (instrument_id, granularity_id, timestamp) DO NOTHING', build_merge_sql())
+        update_sql = build_merge_sql(update_existing=True)
+        self.assertIn('DO UPDATE SET open = EXCLUDED.open', update_sql)
+        self.assertIn('currency_data.close IS DISTINCT FROM EXCLUDED.close', update_sql)
+
+    def test_build_merge_sql_partitioned(self):
+        """Test that the partitioned merge counts existing keys instead of returning xmax."""
+        sql = build_merge_sql(update_existing=True, partitioned=True)
+        self.assertNotIn('xmax', sql)
+        self.assertIn('JOIN currency_data USING (instrument_id, granularity_id, timestamp)', sql)
+        self.assertIn('ON CONFLICT (instrument_id, granularity_id, timestamp) DO UPDATE', sql)
+
+    @patch('scripts.copy_loader.get_instrument_id', return_value=3)
+    def test_copy_currency_data(self, mock_get_instrument_id):
+        """Test that candles are streamed through copy_expert and merged in one statement."""
+        mock_engine = MagicMock()
+        mock_connection = mock_engine.raw_connection.return_value
+        mock_cursor = mock_connection.cursor.return_value
+        mock_cursor.fetchone.return_value = (1, 0)
+        copied = []
+        mock_cursor.copy_expert.side_effect = lambda sql, stream: copied.append(stream.read())
+
+        data = (
+            {'time': f'2023-05-0{day}T00:00:00.000000Z', 'mid': {'o': '1.1', 'h': '1.2', 'l': '1.0', 'c': '1.15'},
+             'volume': 10}
+            for day in (1, 2)
+        )
+        counts = copy_currency_data(data, engine=mock_engine)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 0, 'skipped': 1})
+        self.assertEqual(len(copied[0].splitlines()), 2)
+        self.assertTrue(copied[0].startswith('3\t19\t2023-05-01'))
+        mock_get_instrument_id.assert_called_once_with(mock_engine, 'EUR/USD')
+        copy_sql = mock_cursor.copy_expert.call_args[0][0]
+        self.assertTrue(copy_sql.startswith('COPY currency_data_staging'))
+        mock_connection.commit.assert_called_once()
+        mock_connection.close.assert_called_once()
+
+    @patch('scripts.copy_loader.get_instrument_id', return_value=3)
+    def test_copy_currency_data_refreshes_rollups(self, mock_get_instrument_id):
+        """Test that H1 loads refresh the rollups over the loaded candles once committed, and only if they changed."""
+        mock_engine = MagicMock()
+        mock_cursor = mock_engine.raw_connection.return_value.cursor.return_value
+        mock_cursor.copy_expert.side_effect = lambda sql, stream: stream.read()
+        rollup = MagicMock()
+        data = [{'time': f'2023-05-01T{hour:02d}:00:00.000000Z',
+                 'mid': {'o': '1.1', 'h': '1.2', 'l': '1.0', 'c': '1.15'}, 'volume': 10} for hour in (5, 3, 4)]
+
+        mock_cursor.fetchone.return_value = (0, 1)
+        copy_currency_data(data, engine=mock_engine, granularity='H1', rollup=rollup)
+        mock_cursor.fetchone.return_value = (0, 0)
+        copy_currency_data(data, engine=mock_engine, granularity='H1', rollup=rollup)
+        copy_currency_data(data, engine=mock_engine, rollup=rollup)
+
+        rollup.assert_called_once_with('EUR/USD', datetime(2023, 5, 1, 3), datetime(2023, 5, 1, 6), engine=mock_engine)
+
+    @patch('scripts.copy_loader.get_instrument_id', return_value=3)
+    def test_copy_currency_data_with_exception(self, mock_get_instrument_id):
+        """Test that a failed COPY rolls back and releases the connection."""
+        mock_engine = MagicMock()
+        mock_connection = mock_engine.raw_connection.return_value
+        mock_connection.cursor.return_value.copy_expert.side_effect = RuntimeError("COPY failed")
+
+        with self.assertRaises(RuntimeError):
+            copy_currency_data([], engine=mock_engine)
+
+        mock_connection.rollback.assert_called_once()
+        mock_connection.commit.assert_not_called()
+        mock_connection.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
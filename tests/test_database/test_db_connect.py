@@ -8,6 +8,12 @@ import database.db_connect as db_connect
 
 class TestDatabaseConnection(unittest.TestCase):
 
+    def setUp(self):
+        db_connect.dispose_engine()
+
+    def tearDown(self):
+        db_connect.dispose_engine()
+
     @patch('database.db_connect.create_engine')
     @patch('database.db_connect.os.getenv')
     def test_get_database_url(self, mock_getenv, mock_create_engine):
@@ -31,36 +37,89 @@ class TestDatabaseConnection(unittest.TestCase):
     @patch('database.db_connect.get_database_url')
     @patch('database.db_connect.create_engine')
     def test_get_engine(self, mock_create_engine, mock_get_database_url):
-        """Test getting the SQLAlchemy engine."""
+        """Test that the engine is created once with the default pool settings and SQL echo off."""
         # Setup mock return value for get_database_url
         mock_get_database_url.return_value = 'mock_database_url'
 
-        # Call the function
-        db_connect.get_engine()
+        # Call the function twice
+        with patch.dict('database.db_connect.os.environ', {}, clear=True):
+            first = db_connect.get_engine()
+            second = db_connect.get_engine()
+
+        # Assert create_engine was called once with the correct database URL and options
+        mock_create_engine.assert_called_once_with(
+            'mock_database_url', echo=False, pool_size=5, max_overflow=5,
+            pool_timeout=30, pool_recycle=300, pool_pre_ping=True)
+        self.assertIs(first, second)
+
+    def test_get_engine_options_from_environment(self):
+        """Test that pool settings and SQL echo can be configured through environment variables."""
+        environment = {'DB_ECHO': 'true', 'DB_POOL_SIZE': '2', 'DB_MAX_OVERFLOW': '0',
+                       'DB_POOL_RECYCLE': '60', 'DB_POOL_PRE_PING': 'false'}
+        with patch.dict('database.db_connect.os.environ', environment, clear=True):
+            options = db_connect.get_engine_options()
 
-        # Assert create_engine was called with the correct database URL
-        mock_create_engine.assert_called_once_with('mock_database_url', echo=True)
+        self.assertEqual(options, {'echo': True, 'pool_size': 2, 'max_overflow': 0,
+                                   'pool_timeout': 30, 'pool_recycle': 60, 'pool_pre_ping': False})
 
     @patch('database.db_connect.get_engine')
     @patch('database.db_connect.sessionmaker')
     def test_get_session(self, mock_sessionmaker, mock_get_engine):
-        """Test creating a new session."""
+        """Test that the session factory is created once and bound to the shared engine."""
         # Setup mock engine and sessionmaker
         mock_engine = MagicMock()
         mock_get_engine.return_value = mock_engine
         mock_session_factory = MagicMock()
         mock_sessionmaker.return_value = mock_session_factory
-        mock_session = MagicMock()
-        mock_session_factory.return_value = mock_session
 
-        # Call the function
-        result = db_connect.get_session()
+        # Call the function twice
+        first = db_connect.get_session()
+        second = db_connect.get_session()
 
-        # Assert sessionmaker was called with the correct engine
+        # Assert sessionmaker was called once with the correct engine
         mock_sessionmaker.assert_called_once_with(bind=mock_engine)
 
-        # Assert the returned session is as expected
-        self.assertEqual(result, mock_session)
+        # Assert the returned factory is shared
+        self.assertEqual(first, mock_session_factory)
+        self.assertIs(first, second)
+
+    @patch('database.db_connect.get_session')
+    def test_session_scope_commits(self, mock_get_session):
+        """Test that a successful block is committed and the session closed."""
+        mock_session = MagicMock()
+        mock_get_session.return_value = MagicMock(return_value=mock_session)
+
+        with db_connect.session_scope() as session:
+            self.assertIs(session, mock_session)
+
+        mock_session.commit.assert_called_once()
+        mock_session.rollback.assert_not_called()
+        mock_session.close.assert_called_once()
+
+    @patch('database.db_connect.get_session')
+    def test_session_scope_rolls_back(self, mock_get_session):
+        """Test that a failing block is rolled back, the session closed and the error re-raised."""
+        mock_session = MagicMock()
+        mock_get_session.return_value = MagicMock(return_value=mock_session)
+
+        with self.assertRaises(ValueError):
+            with db_connect.session_scope():
+                raise ValueError("boom")
+
+        mock_session.commit.assert_not_called()
+        mock_session.rollback.assert_called_once()
+        mock_session.close.assert_called_once()
+
+    @patch('database.db_connect.create_engine')
+    def test_dispose_engine(self, mock_create_engine):
+        """Test that disposing closes the pool and the next call builds a new engine."""
+        mock_create_engine.side_effect = [MagicMock(), MagicMock()]
+        first = db_connect.get_engine()
+
+        db_connect.dispose_engine()
+
+        first.dispose.assert_called_once()
+        self.assertIsNot(db_connect.get_engine(), first)
 
     @patch('database.db_connect.get_engine')
     def test_test_connection_success(self, mock_get_engine):
@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import (GRANULARITIES, normalise_instrument, default_pip_size, default_display_name,
+                                 granularity_id, seed_granularities, get_instrument_id, get_instrument_ids,
+                                 find_instrument_id, clear_dimension_cache)
+from database.schema.create_tables import Instrument, Granularity
+
+
+class TestDimensionNames(unittest.TestCase):
+
+    def test_normalise_instrument(self):
+        """Test that every spelling of a pair maps to the stored one."""
+        for name in ('EUR/USD', 'EUR_USD', 'eur_usd', ' EUR/USD '):
+            self.assertEqual(normalise_instrument(name), 'EUR/USD')
+
+    def test_default_pip_size(self):
+        """Test that pairs quoted in yen get a pip size of 0.01."""
+        self.assertEqual(default_pip_size('USD_JPY'), 0.01)
+        self.assertEqual(default_pip_size('EUR/USD'), 0.0001)
+
+    def test_default_display_name(self):
+        """Test that known currencies are spelled out and unknown instruments keep their name."""
+        self.assertEqual(default_display_name('EUR_USD'), 'Euro / US Dollar')
+        self.assertEqual(default_display_name('XAU/USD'), 'XAU/USD')
+
+    def test_granularity_id(self):
+        """Test that granularity codes map to their fixed ids and unknown codes are rejected."""
+        self.assertEqual(granularity_id('D'), 19)
+        self.assertEqual(granularity_id('H1'), 12)
+        with self.assertRaises(ValueError):
+            granularity_id('H5')
+
+    def test_granularity_ids_are_unique(self):
+        """Test that no two granularities share an id."""
+        ids = [id_ for id_, _ in GRANULARITIES.values()]
+        self.assertEqual(len(ids), len(set(ids)))
+
+
+class TestDimensionTables(unittest.TestCase):
+
+    def setUp(self):
+        clear_dimension_cache()
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def count(self, model):
+        with self.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(model)).scalar()
+
+    def test_seed_granularities_is_idempotent(self):
+        """Test that seeding twice inserts every granularity once."""
+        for _ in range(2):
+            with self.engine.begin() as connection:
+                seed_granularities(connection)
+
+        self.assertEqual(self.count(Granularity), len(GRANULARITIES))
+
+    def test_get_instrument_id_registers_once(self):
+        """Test that an instrument is registered on first use and found again under another spelling."""
+        instrument_id = get_instrument_id(self.engine, 'USD_JPY')
+        clear_dimension_cache()
+
+        self.assertEqual(get_instrument_id(self.engine, 'usd/jpy'), instrument_id)
+        self.assertEqual(self.count(Instrument), 1)
+        with self.engine.connect() as connection:
+            instrument = connection.execute(select(Instrument)).one()
+        self.assertEqual((instrument.name, instrument.display_name, instrument.pip_size),
+                         ('USD/JPY', 'US Dollar / Japanese Yen', 0.01))
+
+    def test_get_instrument_id_is_cached(self):
+        """Test that a resolved id is served from the cache without querying again."""
+        get_instrument_id(self.engine, 'EUR/USD')
+        with patch.object(self.engine, 'begin') as mock_begin:
+            get_instrument_id(self.engine, 'EUR_USD')
+        mock_begin.assert_not_called()
+
+    def test_get_instrument_id_from_session(self):
+        """Test that a session resolves through the engine it is bound to and shares its cache."""
+        session = sessionmaker(bind=self.engine)()
+        try:
+            self.assertEqual(get_instrument_id(session, 'GBP/USD'), get_instrument_id(self.engine, 'GBP/USD'))
+        finally:
+            session.close()
+
+    def test_find_instrument_id_never_registers(self):
+        """Test that the read-path lookup returns None for unknown instruments and finds them once registered."""
+        self.assertIsNone(find_instrument_id(self.engine, 'EURUSD'))
+        self.assertEqual(self.count(Instrument), 0)
+
+        instrument_id = get_instrument_id(self.engine, 'EUR/USD')
+        clear_dimension_cache()
+        self.assertEqual(find_instrument_id(self.engine, 'eur_usd'), instrument_id)
+
+    def test_get_instrument_ids(self):
+        """Test that names are mapped to ids as passed."""
+        ids = get_instrument_ids(self.engine, ['EUR/USD', 'GBP_USD'])
+
+        self.assertEqual(set(ids), {'EUR/USD', 'GBP_USD'})
+        self.assertEqual(len(set(ids.values())), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
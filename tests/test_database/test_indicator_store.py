@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import get_instrument_id, granularity_id
+from database.schema.create_tables import CandleIndicators, Instrument
+from scripts.insert_data import upsert_currency_data
+from scripts.moving_average_sql import refresh_moving_averages
+from scripts.indicator_store import (
+    write_indicators, read_candles_with_indicators, migrate_moving_averages, build_range_query)
+
+START = datetime(2024, 1, 1)
+D = granularity_id('D')
+
+
+def make_candles(closes):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (START + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class TestIndicatorStore(unittest.TestCase):
+    """
+    Tests for the wide candle_indicators storage on SQLite.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.closes = np.round(1.1 + np.arange(10) / 100, 5)
+        upsert_currency_data(make_candles(self.closes), currency_pair='EUR/USD', session=self.session)
+        self.timestamps = [START + timedelta(days=i) for i in range(10)]
+        self.eur_usd = get_instrument_id(self.session, 'EUR/USD')
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def test_write_merges_indicators_into_one_row(self):
+        """Test that separate writes accumulate in the same row and NaN values are skipped."""
+        sma = np.array([np.nan, np.nan] + list(self.closes[2:]))
+        written = write_indicators('EUR/USD', self.timestamps, {'sma_3': sma}, session=self.session)
+        write_indicators('EUR/USD', self.timestamps[5:], {'rsi_14': np.full(5, 55.0)}, session=self.session)
+
+        self.assertEqual(written, 8)
+        self.assertEqual(self.session.query(CandleIndicators).count(), 8)
+        row = self.session.get(CandleIndicators, (self.eur_usd, D, self.timestamps[9]))
+        self.assertEqual(row.values, {'sma_3': self.closes[9], 'rsi_14': 55.0})
+
+    def test_read_unknown_pair(self):
+        """Test that reading a pair that was never stored returns nothing and does not register it."""
+        self.assertEqual(read_candles_with_indicators('EURUSD', START, START + timedelta(days=5), session=self.session),
+                         [])
+        self.assertEqual(self.session.query(Instrument.name).all(), [('EUR/USD',)])
+
+    def test_read_candles_with_indicators(self):
+        """Test reading a date range with all or selected indicators."""
+        write_indicators('EUR/USD', self.timestamps, {'sma_3': self.closes, 'ema_5': self.closes + 1},
+                         session=self.session)
+
+        rows = read_candles_with_indicators('EUR/USD', self.timestamps[2], self.timestamps[5], session=self.session)
+        selected = read_candles_with_indicators('EUR/USD', self.timestamps[2], self.timestamps[5], names=['ema_5'],
+                                                session=self.session)
+
+        self.assertEqual([row['timestamp'] for row in rows], self.timestamps[2:5])
+        self.assertEqual(rows[0]['close'], self.closes[2])
+        self.assertEqual(rows[0]['sma_3'], self.closes[2])
+        self.assertEqual(set(selected[0]), {'timestamp', 'open', 'high', 'low', 'close', 'volume', 'ema_5'})
+        self.assertAlmostEqual(selected[0]['ema_5'], self.closes[2] + 1)
+
+    def test_migrate_moving_averages(self):
+        """Test that moving_average rows become sma_<window> keys merged with existing values."""
+        refresh_moving_averages('EUR/USD', windows=[2, 5], engine=self.engine)
+        write_indicators('EUR/USD', self.timestamps[9:], {'rsi_14': np.array([60.0])}, session=self.session)
+
+        self.assertEqual(migrate_moving_averages(self.engine), 9)
+        self.assertEqual(migrate_moving_averages(self.engine), 9)
+
+        self.session.expire_all()
+        row = self.session.get(CandleIndicators, (self.eur_usd, D, self.timestamps[9]))
+        self.assertEqual(set(row.values), {'sma_2', 'sma_5', 'rsi_14'})
+        self.assertAlmostEqual(row.values['sma_5'], self.closes[5:].mean())
+        self.assertEqual(set(self.session.get(CandleIndicators, (self.eur_usd, D, self.timestamps[1])).values), {'sma_2'})
+
+    def test_postgresql_range_query(self):
+        """Test that selected indicators are read as JSONB fields on PostgreSQL."""
+        sql = str(build_range_query(1, D, START, names=['rsi_14']).compile(dialect=postgresql.dialect()))
+
+        self.assertIn('LEFT OUTER JOIN candle_indicators', sql)
+        self.assertIn("candle_indicators.values ->> ", sql.replace('"', ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,14 @@
 import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
-from scripts.insert_data import record_exists, create_currency_data_record, insert_currency_data
-from database.schema.create_tables import CurrencyData
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import granularity_id
+from scripts.insert_data import record_exists, create_currency_data_record, insert_currency_data, upsert_currency_data
+from database.schema.create_tables import CurrencyData, Instrument
 import logging
 
 class TestInsertData(unittest.TestCase):
@@ -32,10 +37,11 @@ class TestInsertData(unittest.TestCase):
             'mid': {'o': '1.1000', 'h': '1.2000', 'l': '1.0500', 'c': '1.1500'},
             'volume': 1000
         }
-        currency_data = create_currency_data_record(record)
+        currency_data = create_currency_data_record(record, instrument_id=1)
 
         self.assertIsInstance(currency_data, CurrencyData)
-        self.assertEqual(currency_data.currency_pair, 'EUR/USD')
+        self.assertEqual(currency_data.instrument_id, 1)
+        self.assertEqual(currency_data.granularity_id, granularity_id('D'))
         self.assertEqual(currency_data.timestamp, datetime.strptime('2023-05-01T15:45:30.123456Z', '%Y-%m-%dT%H:%M:%S.%fZ'))
         self.assertEqual(currency_data.open, 1.1000)
         self.assertEqual(currency_data.high, 1.2000)
@@ -109,5 +115,135 @@ class TestInsertData(unittest.TestCase):
         mock_session.rollback.assert_called_once()
         mock_session.close.assert_called_once()
 
+
+def make_candle(time, close, volume=1000):
+    """Build a raw OANDA candle with the given close price."""
+    return {'time': time, 'mid': {'o': '1.1000', 'h': '1.2000', 'l': '1.0500', 'c': close}, 'volume': volume}
+
+
+class TestUpsertCurrencyData(unittest.TestCase):
+
+    def setUp(self):
+        # Set up an in-memory SQLite database so the SQLite-compatible path is exercised
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def test_upsert_inserts_new_records(self):
+        """Test that all new candles are inserted in one pass."""
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1500'),
+                make_candle('2023-05-02T00:00:00.000000Z', '1.1600')]
+
+        counts = upsert_currency_data(data, session=self.session)
+
+        self.assertEqual(counts, {'inserted': 2, 'updated': 0, 'skipped': 0})
+        self.assertEqual(self.session.query(CurrencyData).count(), 2)
+        self.assertEqual({candle.instrument.name for candle in self.session.query(CurrencyData)}, {'EUR/USD'})
+
+    def test_upsert_keeps_series_apart(self):
+        """Test that candles of other instruments and granularities with the same timestamp are separate rows."""
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1500')]
+
+        upsert_currency_data(data, session=self.session)
+        counts = [upsert_currency_data(data, currency_pair='EUR_USD', granularity='H1', session=self.session),
+                  upsert_currency_data(data, currency_pair='GBP/USD', session=self.session)]
+
+        self.assertEqual(counts, [{'inserted': 1, 'updated': 0, 'skipped': 0}] * 2)
+        self.assertEqual(self.session.query(Instrument.name).order_by(Instrument.id).all(),
+                         [('EUR/USD',), ('GBP/USD',)])
+        self.assertEqual(self.session.query(CurrencyData).count(), 3)
+
+    def test_upsert_skips_existing_records(self):
+        """Test that existing candles are left untouched when updates are disabled."""
+        upsert_currency_data([make_candle('2023-05-01T00:00:00.000000Z', '1.1500')], session=self.session)
+
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1550'),
+                make_candle('2023-05-02T00:00:00.000000Z', '1.1600')]
+        counts = upsert_currency_data(data, session=self.session)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 0, 'skipped': 1})
+        first = self.session.query(CurrencyData).order_by(CurrencyData.timestamp).first()
+        self.assertEqual(first.close, 1.15)
+
+    def test_upsert_updates_changed_records(self):
+        """Test that changed candles are updated and unchanged candles are skipped."""
+        upsert_currency_data([make_candle('2023-05-01T00:00:00.000000Z', '1.1500'),
+                              make_candle('2023-05-02T00:00:00.000000Z', '1.1600')], session=self.session)
+
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1550'),
+                make_candle('2023-05-02T00:00:00.000000Z', '1.1600'),
+                make_candle('2023-05-03T00:00:00.000000Z', '1.1700')]
+        counts = upsert_currency_data(data, update_existing=True, session=self.session)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'skipped': 1})
+        first = self.session.query(CurrencyData).order_by(CurrencyData.timestamp).first()
+        self.assertEqual(first.close, 1.155)
+
+    def test_record_exists_never_registers_pairs(self):
+        """Test that record_exists finds stored candles and answers False for an unknown pair without registering it."""
+        upsert_currency_data([make_candle('2023-05-01T00:00:00.000000Z', '1.1500')], session=self.session)
+
+        self.assertTrue(record_exists(self.session, 'EUR/USD', datetime(2023, 5, 1)))
+        self.assertFalse(record_exists(self.session, 'EUR/USD', datetime(2023, 5, 2)))
+        self.assertFalse(record_exists(self.session, 'EURUSD', datetime(2023, 5, 1)))
+        self.assertEqual(self.session.query(Instrument.name).all(), [('EUR/USD',)])
+
+    def test_upsert_deduplicates_batch(self):
+        """Test that duplicate candles within one batch are only written once."""
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1500'),
+                make_candle('2023-05-01T00:00:00.000000Z', '1.1550')]
+
+        counts = upsert_currency_data(data, session=self.session)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 0, 'skipped': 1})
+        self.assertEqual(self.session.query(CurrencyData).one().close, 1.155)
+
+    @patch('scripts.insert_data.get_instrument_id', return_value=1)
+    @patch('scripts.insert_data.ensure_partitions', return_value=None)
+    def test_upsert_postgresql_uses_on_conflict(self, mock_ensure_partitions, mock_get_instrument_id):
+        """Test that PostgreSQL batches are sent as a single INSERT ... ON CONFLICT statement."""
+        mock_session = MagicMock()
+        mock_session.get_bind.return_value.dialect.name = 'postgresql'
+        mock_session.execute.return_value.scalars.return_value.all.return_value = [True, False]
+
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1500'),
+                make_candle('2023-05-02T00:00:00.000000Z', '1.1600'),
+                make_candle('2023-05-03T00:00:00.000000Z', '1.1700')]
+        counts = upsert_currency_data(data, update_existing=True, session=mock_session)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'skipped': 1})
+        mock_session.execute.assert_called_once()
+        statement = mock_session.execute.call_args[0][0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertIn('ON CONFLICT (instrument_id, granularity_id, timestamp) DO UPDATE', sql)
+        self.assertIn('RETURNING xmax = 0', sql)
+        mock_session.commit.assert_called_once()
+        mock_session.close.assert_not_called()
+
+    @patch('scripts.insert_data.get_instrument_id', return_value=1)
+    @patch('scripts.insert_data.ensure_partitions', return_value=[])
+    def test_upsert_postgresql_partitioned(self, mock_ensure_partitions, mock_get_instrument_id):
+        """Test that partitions are prepared for the batch and counts come from the existing keys."""
+        mock_session = MagicMock()
+        mock_session.get_bind.return_value.dialect.name = 'postgresql'
+        mock_session.execute.return_value.scalar.return_value = 2  # Two candles of the batch already exist
+        mock_session.execute.return_value.all.return_value = [(3,), (4,)]  # One new and one changed candle
+
+        data = [make_candle('2023-05-01T00:00:00.000000Z', '1.1500'),
+                make_candle('2023-05-02T00:00:00.000000Z', '1.1600'),
+                make_candle('2023-06-03T00:00:00.000000Z', '1.1700')]
+        counts = upsert_currency_data(data, update_existing=True, session=mock_session)
+
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'skipped': 1})
+        mock_ensure_partitions.assert_called_once_with(mock_session.get_bind.return_value,
+                                                       datetime(2023, 5, 1), datetime(2023, 6, 3))
+        sql = str(mock_session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn('ON CONFLICT (instrument_id, granularity_id, timestamp) DO UPDATE', sql)
+        self.assertNotIn('xmax', sql)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,267 @@
+import os
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from sqlalchemy import create_engine, inspect, text, Float
+from sqlalchemy.exc import OperationalError
+from database.schema.migrations import upgrade, downgrade, current_version, applied_versions, IrreversibleMigrationError
+from database.schema.migrations.operations import Operations
+from database.dimensions import granularity_id
+from database.schema.partitions import create_partitioned_table, ensure_partitions
+
+# Tables as created before the unique key, the indexes and the instrument table were added to the models
+LEGACY_CURRENCY_DATA = """
+    CREATE TABLE currency_data (
+        id INTEGER PRIMARY KEY, currency_pair VARCHAR NOT NULL, timestamp DATETIME NOT NULL,
+        open FLOAT NOT NULL, high FLOAT NOT NULL, low FLOAT NOT NULL, close FLOAT NOT NULL, volume FLOAT NOT NULL
+    )
+"""
+LEGACY_CANDLE_INDICATORS = """
+    CREATE TABLE candle_indicators (
+        currency_pair VARCHAR NOT NULL, timestamp DATETIME NOT NULL, "values" JSON NOT NULL,
+        PRIMARY KEY (currency_pair, timestamp)
+    )
+"""
+LEGACY_ROWS = """
+    INSERT INTO currency_data VALUES (1, 'EUR/USD', '2024-01-01 00:00:00', 1, 1, 1, 1, 1),
+                                     (2, 'EUR_USD', '2024-01-02 00:00:00', 1, 1, 1, 1, 1),
+                                     (3, 'USD/JPY', '2024-01-01 00:00:00', 150, 150, 150, 150, 1)
+"""
+MIGRATION_INDEXES = ('uq_currency_data_instrument_granularity_timestamp', 'ix_currency_data_timestamp',
+                     'ix_moving_average_currency_data_id_window_size', 'ix_prediction_currency_data_id_model_name')
+LATEST = [1, 2, 3, 4, 5, 6]
+
+
+def index_names(engine):
+    """Return the names of all indexes, including unique constraints, of the migrated tables."""
+    inspector = inspect(engine)
+    names = set()
+    for table in ('currency_data', 'moving_average', 'prediction'):
+        names.update(i['name'] for i in inspector.get_indexes(table))
+        names.update(c['name'] for c in inspector.get_unique_constraints(table))
+    return names
+
+
+class TestMigrations(unittest.TestCase):
+    """
+    End-to-end tests of the versioned migrations on SQLite.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.sleeps = []
+        self.options = {'sleep': self.sleeps.append}
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def create_legacy_tables(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(LEGACY_CURRENCY_DATA))
+            connection.execute(text(LEGACY_CANDLE_INDICATORS))
+            connection.execute(text(LEGACY_ROWS))
+            connection.execute(text("""INSERT INTO candle_indicators VALUES ('EUR/USD', '2024-01-01 00:00:00', '{"sma_5": 1.1}')"""))
+
+    def test_upgrade_legacy_database(self):
+        """Test that a database created before the migrations gets the missing tables, keys and indexes."""
+        self.create_legacy_tables()
+
+        self.assertEqual(upgrade(self.engine, **self.options), LATEST)
+
+        self.assertTrue({'moving_average', 'candle_indicators', 'candle_rollup', 'prediction'}
+                        <= set(inspect(self.engine).get_table_names()))
+        self.assertTrue(set(MIGRATION_INDEXES) <= index_names(self.engine))
+        self.assertNotIn('currency_pair', {c['name'] for c in inspect(self.engine).get_columns('currency_data')})
+        with self.engine.connect() as connection:
+            instruments = connection.execute(text("SELECT id, name, pip_size FROM instrument ORDER BY id")).all()
+            candles = connection.execute(text(
+                "SELECT instrument_id, granularity_id FROM currency_data ORDER BY id")).all()
+            indicators = connection.execute(text(
+                "SELECT instrument_id, granularity_id FROM candle_indicators")).all()
+        # Both spellings of EUR/USD become one instrument, and every legacy candle is daily
+        self.assertEqual([(name, pip_size) for _, name, pip_size in instruments],
+                         [('EUR/USD', 0.0001), ('USD/JPY', 0.01)])
+        eur_usd, usd_jpy = instruments[0][0], instruments[1][0]
+        daily = granularity_id('D')
+        self.assertEqual(candles, [(eur_usd, daily), (eur_usd, daily), (usd_jpy, daily)])
+        self.assertEqual(indicators, [(eur_usd, daily)])
+        self.assertEqual(upgrade(self.engine, **self.options), [])
+        self.assertEqual(current_version(self.engine), 6)
+
+    def test_upgrade_stops_on_candles_under_two_spellings(self):
+        """Test that a candle stored as both EUR/USD and EUR_USD stops migration 4 before it changes currency_data."""
+        self.create_legacy_tables()
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO currency_data VALUES (4, 'EUR_USD', '2024-01-01 00:00:00', 1, 1, 1, 1, 1)"))
+
+        with self.assertRaisesRegex(RuntimeError, r"1 candles .* EUR/USD 2024-01-01"):
+            upgrade(self.engine, **self.options)
+
+        self.assertEqual(current_version(self.engine), 3)
+        self.assertNotIn('instrument_id', {c['name'] for c in inspect(self.engine).get_columns('currency_data')})
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM currency_data WHERE id = 4"))
+        self.assertEqual(upgrade(self.engine, **self.options), [4, 5, 6])
+
+    def test_upgrade_new_database(self):
+        """Test that a new database gets the tables of the models and every migration is a no-op on them."""
+        self.assertEqual(upgrade(self.engine, **self.options), LATEST)
+
+        self.assertTrue(set(MIGRATION_INDEXES) <= index_names(self.engine))
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM granularity")).scalar(), 21)
+
+    def test_downgrade_and_upgrade_again(self):
+        """Test that downgrades revert newest first and that reverted migrations apply again."""
+        self.create_legacy_tables()
+        upgrade(self.engine, target=2, **self.options)
+        self.assertEqual(applied_versions(self.engine), {1, 2})
+        upgrade(self.engine, **self.options)
+
+        self.assertEqual(downgrade(self.engine, 1, **self.options), [6, 5, 4, 3, 2])
+        self.assertEqual(current_version(self.engine), 1)
+        self.assertNotIn('ix_currency_data_timestamp', index_names(self.engine))
+        self.assertFalse({'instrument', 'granularity', 'candle_rollup'} & set(inspect(self.engine).get_table_names()))
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT currency_pair FROM currency_data ORDER BY id")).scalars().all(),
+                             ['EUR/USD', 'EUR/USD', 'USD/JPY'])
+            self.assertEqual(connection.execute(text("SELECT currency_pair FROM candle_indicators")).scalars().all(),
+                             ['EUR/USD'])
+
+        self.assertEqual(upgrade(self.engine, **self.options), [2, 3, 4, 5, 6])
+        self.assertIn('ix_currency_data_timestamp', index_names(self.engine))
+        with self.assertRaises(IrreversibleMigrationError):
+            downgrade(self.engine, 0, **self.options)
+
+    def test_failed_migration_is_not_recorded(self):
+        """Test that a migration failing halfway is not recorded and is rerun by the next upgrade."""
+        def failing_upgrade(op):
+            op.execute("CREATE TABLE half_done (id INTEGER PRIMARY KEY)")
+            raise RuntimeError("interrupted")
+
+        migration = SimpleNamespace(VERSION=1, DESCRIPTION="test", upgrade=failing_upgrade, downgrade=None)
+        with self.assertRaises(RuntimeError):
+            upgrade(self.engine, migrations=[migration], **self.options)
+        self.assertEqual(current_version(self.engine), 0)
+
+        migration.upgrade = lambda op: op.execute("CREATE TABLE IF NOT EXISTS half_done (id INTEGER PRIMARY KEY)")
+        self.assertEqual(upgrade(self.engine, migrations=[migration], **self.options), [1])
+
+    def test_expand_backfill_contract(self):
+        """Test a column type change through add, throttled batched backfill, drop and rename."""
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE quotes (id INTEGER PRIMARY KEY, price VARCHAR)"))
+            connection.execute(text("INSERT INTO quotes (id, price) VALUES " +
+                                    ', '.join(f"({i}, '{i}.5')" for i in range(1, 26))))
+        op = Operations(self.engine, **self.options)
+
+        op.add_column('quotes', 'price_new', Float())
+        op.add_column('quotes', 'price_new', Float())
+        updated = op.backfill('quotes', "price_new = CAST(price AS REAL)", where="price_new IS NULL", batch_size=10)
+        self.assertEqual(updated, 25)
+        self.assertEqual(len(self.sleeps), 2)  # Pauses between the three batches, none after the last
+        self.assertEqual(op.backfill('quotes', "price_new = CAST(price AS REAL)", where="price_new IS NULL"), 0)
+        op.drop_column('quotes', 'price')
+        op.rename_column('quotes', 'price_new', 'price')
+        op.rename_column('quotes', 'price_new', 'price')
+
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT sum(price) FROM quotes")).scalar(), 337.5)
+        self.assertEqual([c['name'] for c in inspect(self.engine).get_columns('quotes')], ['id', 'price'])
+
+    def test_lock_timeouts_are_retried(self):
+        """Test that statements failing on a lock timeout are retried with backoff and other errors are not."""
+        op = Operations(MagicMock(), retries=2, backoff=0.5, **self.options)
+        lock_timeout = OperationalError('SET', {}, SimpleNamespace(pgcode='55P03'))
+        function = MagicMock(side_effect=[lock_timeout, lock_timeout, 'done'])
+
+        self.assertEqual(op._with_retries(function), 'done')
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+
+        function = MagicMock(side_effect=[lock_timeout] * 3)
+        with self.assertRaises(OperationalError):
+            op._with_retries(function)
+        function = MagicMock(side_effect=OperationalError('SELECT', {}, Exception('syntax error')))
+        with self.assertRaises(OperationalError):
+            op._with_retries(function)
+        function.assert_called_once()
+
+
+@unittest.skipUnless(os.getenv('TEST_POSTGRES_URL'), "TEST_POSTGRES_URL is not set")
+class TestMigrationsPostgres(unittest.TestCase):
+    """
+    End-to-end tests of the migrations on a scratch PostgreSQL database given by TEST_POSTGRES_URL.
+    """
+
+    def setUp(self):
+        self.engine = create_engine(os.getenv('TEST_POSTGRES_URL'))
+        self.drop_tables()
+
+    def tearDown(self):
+        self.drop_tables()
+        self.engine.dispose()
+
+    def drop_tables(self):
+        with self.engine.begin() as connection:
+            for table in ('schema_migrations', 'prediction', 'moving_average', 'candle_indicators',
+                          'candle_indicators_legacy', 'candle_rollup', 'currency_data', 'instrument', 'granularity'):
+                connection.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+
+    def test_upgrade_builds_valid_indexes_concurrently(self):
+        """Test that a legacy table is migrated and downgraded with valid indexes and constraints."""
+        with self.engine.begin() as connection:
+            connection.execute(text(LEGACY_CURRENCY_DATA.replace('INTEGER PRIMARY KEY', 'SERIAL PRIMARY KEY')
+                                    .replace('DATETIME', 'TIMESTAMP')))
+            connection.execute(text(LEGACY_CANDLE_INDICATORS.replace('DATETIME', 'TIMESTAMP').replace('JSON', 'JSONB')))
+            connection.execute(text(LEGACY_ROWS))
+
+        self.assertEqual(upgrade(self.engine, lock_timeout_ms=1000), LATEST)
+        with self.engine.connect() as connection:
+            invalid = connection.execute(text(
+                "SELECT count(*) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = ANY(:names) AND NOT i.indisvalid"), {'names': list(MIGRATION_INDEXES)}).scalar()
+            constraints = connection.execute(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = 'currency_data'::regclass "
+                "AND contype = 'f' AND convalidated ORDER BY conname")).scalars().all()
+        self.assertEqual(invalid, 0)
+        self.assertTrue(set(MIGRATION_INDEXES) <= index_names(self.engine))
+        self.assertEqual(constraints, ['currency_data_granularity_id_fkey', 'currency_data_instrument_id_fkey'])
+        self.assertFalse(next(c for c in inspect(self.engine).get_columns('currency_data')
+                              if c['name'] == 'instrument_id')['nullable'])
+
+        self.assertEqual(downgrade(self.engine, 1), [6, 5, 4, 3, 2])
+        self.assertFalse(set(MIGRATION_INDEXES) & index_names(self.engine))
+
+    @patch.dict('os.environ', {'DB_PARTITION_CURRENCY_DATA': 'true'})
+    def test_partitioned_table_index(self):
+        """Test that indexes on a partitioned table are built per partition and attached."""
+        create_partitioned_table(self.engine)
+        ensure_partitions(self.engine, datetime(2024, 1, 1), datetime(2024, 1, 1), pairs={})
+
+        upgrade(self.engine)
+
+        with self.engine.connect() as connection:
+            valid = connection.execute(text(
+                "SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass('ix_currency_data_timestamp')")).scalar()
+        self.assertTrue(valid)
+
+    @patch.dict('os.environ', {'DB_PARTITION_CURRENCY_DATA': 'true'})
+    def test_legacy_partitioned_table_is_rejected(self):
+        """Test that a table partitioned by currency_pair stops the migration before any change."""
+        with self.engine.begin() as connection:
+            connection.execute(text(LEGACY_CURRENCY_DATA.replace('INTEGER PRIMARY KEY', 'SERIAL')
+                                    .replace('DATETIME', 'TIMESTAMP').rstrip()[:-1] +
+                                    ", PRIMARY KEY (id, currency_pair, timestamp)) PARTITION BY RANGE (timestamp)"))
+            connection.execute(text("CREATE TABLE currency_data_p2024_01 PARTITION OF currency_data "
+                                    "FOR VALUES FROM ('2024-01-01') TO ('2024-02-01') PARTITION BY LIST (currency_pair)"))
+            connection.execute(text("CREATE TABLE currency_data_p2024_01_default PARTITION OF currency_data_p2024_01 DEFAULT"))
+
+        with self.assertRaisesRegex(RuntimeError, 'partitioned by currency_pair'):
+            upgrade(self.engine, target=4)
+        self.assertEqual(current_version(self.engine), 3)
+        self.assertNotIn('instrument_id', {c['name'] for c in inspect(self.engine).get_columns('currency_data')})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database.db_connect import Base
+from database.dimensions import get_instrument_id, granularity_id, seed_granularities
 from database.schema.create_tables import CurrencyData, MovingAverage, Prediction
 from datetime import datetime
 
@@ -13,6 +14,9 @@ class TestModels(unittest.TestCase):
         cls.engine = create_engine('sqlite:///:memory:')
         Base.metadata.create_all(cls.engine)
         cls.Session = sessionmaker(bind=cls.engine)
+        with cls.engine.begin() as connection:
+            seed_granularities(connection)
+        cls.instrument_id = get_instrument_id(cls.engine, 'EUR_USD')
 
     def setUp(self):
         # Create a new session for each test
@@ -26,7 +30,8 @@ class TestModels(unittest.TestCase):
     def test_currency_data_model(self):
         # Test inserting and querying CurrencyData
         data = CurrencyData(
-            currency_pair='EUR/USD',
+            instrument_id=self.instrument_id,
+            granularity_id=granularity_id('D'),
             timestamp=datetime.now(),
             open=1.2,
             high=1.3,
@@ -40,12 +45,15 @@ class TestModels(unittest.TestCase):
         # Query the database to check if the record was inserted
         result = self.session.query(CurrencyData).first()
         self.assertIsNotNone(result)
-        self.assertEqual(result.currency_pair, 'EUR/USD')
+        self.assertEqual(result.instrument.name, 'EUR/USD')
+        self.assertEqual(result.instrument.pip_size, 0.0001)
+        self.assertEqual(result.granularity.name, 'D')
 
     def test_moving_average_model(self):
         # Test inserting and querying MovingAverage
         currency_data = CurrencyData(
-            currency_pair='EUR/USD',
+            instrument_id=self.instrument_id,
+            granularity_id=granularity_id('D'),
             timestamp=datetime.now(),
             open=1.2,
             high=1.3,
@@ -73,7 +81,8 @@ class TestModels(unittest.TestCase):
     def test_prediction_model(self):
         # Test inserting and querying Prediction
         currency_data = CurrencyData(
-            currency_pair='EUR/USD',
+            instrument_id=self.instrument_id,
+            granularity_id=granularity_id('D'),
             timestamp=datetime.now(),
             open=1.2,
             high=1.3,
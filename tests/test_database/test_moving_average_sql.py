@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import granularity_id
+from database.schema.create_tables import CurrencyData, MovingAverage, Instrument
+from scripts.insert_data import upsert_currency_data
+from scripts.indicators import moving_averages
+from scripts.moving_average_sql import refresh_moving_averages, build_moving_average_insert
+
+START = datetime(2024, 1, 1)
+
+
+def make_candles(closes):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (START + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class TestMovingAverageSql(unittest.TestCase):
+    """
+    Parity tests of the window-function moving averages against the Python engine on SQLite.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.closes = (1.1 + np.random.default_rng(3).normal(0, 0.01, 120)).round(5)
+        upsert_currency_data(make_candles(self.closes), currency_pair='EUR/USD', session=self.session)
+        upsert_currency_data(make_candles(self.closes[:30] + 0.2), currency_pair='GBP/USD', session=self.session)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def stored_averages(self, window, currency_pair='EUR/USD'):
+        rows = self.session.query(MovingAverage.timestamp, MovingAverage.moving_average) \
+            .join(CurrencyData).join(Instrument) \
+            .filter(MovingAverage.window_size == window, Instrument.name == currency_pair) \
+            .order_by(MovingAverage.timestamp) \
+            .all()
+        return [row.timestamp for row in rows], [row.moving_average for row in rows]
+
+    def test_full_refresh_matches_python_engine(self):
+        """Test that the database averages equal the NumPy ones for every candle with enough history."""
+        counts = refresh_moving_averages('EUR/USD', windows=[5, 50], engine=self.engine)
+
+        self.assertEqual(counts, {5: 116, 50: 71})
+        expected = moving_averages(self.closes, [5, 50])
+        for window in (5, 50):
+            timestamps, values = self.stored_averages(window)
+            self.assertEqual(timestamps[0], START + timedelta(days=window - 1))
+            np.testing.assert_allclose(values, expected[window][window - 1:], atol=1e-12)
+        self.assertEqual(self.stored_averages(5, 'GBP/USD')[1], [])
+
+    def test_range_refresh_uses_preceding_history(self):
+        """Test that refreshing a range replaces only its averages and reads history before it."""
+        refresh_moving_averages('EUR/USD', windows=[5, 50], engine=self.engine)
+        self.session.query(CurrencyData).filter(CurrencyData.timestamp >= START + timedelta(days=100)) \
+            .update({CurrencyData.close: CurrencyData.close + 0.01})
+        self.session.commit()
+        self.closes[100:] += 0.01
+
+        counts = refresh_moving_averages('EUR/USD', START + timedelta(days=100), START + timedelta(days=110),
+                                         windows=[5, 50], engine=self.engine)
+
+        self.assertEqual(counts, {5: 10, 50: 10})
+        expected = moving_averages(self.closes, [5, 50])
+        for window in (5, 50):
+            timestamps, values = self.stored_averages(window)
+            self.assertEqual(len(timestamps), 120 - window + 1)
+            np.testing.assert_allclose(values[100 - window + 1:110 - window + 1], expected[window][100:110], atol=1e-12)
+            # Averages after the range were not refreshed and still reflect the old closes
+            self.assertNotAlmostEqual(values[-1], expected[window][-1], places=6)
+
+    def test_postgresql_statement(self):
+        """Test that the statement compiles to a windowed INSERT ... SELECT for PostgreSQL."""
+        compiled = build_moving_average_insert(50, 1, granularity_id('D'), START).compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+
+        self.assertIn('INSERT INTO moving_average', sql)
+        self.assertRegex(sql, r'ROWS BETWEEN \S+ PRECEDING AND CURRENT ROW')
+        self.assertIn(49, compiled.params.values())
+
+
+if __name__ == '__main__':
+    unittest.main()
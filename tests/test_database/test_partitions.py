@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+from database.schema.create_tables import MovingAverage
+from database.schema.partitions import (
+    add_months, partition_name, parse_partition_month, build_partitioned_table_ddl, build_partition_ddl,
+    plan_partitions, ensure_partitions, detach_partitions, partition_pairs)
+
+
+class TestPartitions(unittest.TestCase):
+    """
+    Tests for the monthly partition management of currency_data.
+    """
+
+    def test_month_arithmetic_and_names(self):
+        """Test month stepping across years and the partition naming scheme."""
+        self.assertEqual(add_months(datetime(2023, 11, 1), 3), datetime(2024, 2, 1))
+        self.assertEqual(add_months(datetime(2024, 1, 1), -1), datetime(2023, 12, 1))
+        self.assertEqual(partition_name(datetime(2024, 1, 15, 9)), 'currency_data_p2024_01')
+        self.assertEqual(partition_name(datetime(2024, 1, 1), 'EUR/USD'), 'currency_data_p2024_01_eur_usd')
+        self.assertEqual(parse_partition_month('currency_data_p2024_01'), datetime(2024, 1, 1))
+        self.assertIsNone(parse_partition_month('currency_data_p2024_01_eur_usd'))
+        self.assertIsNone(parse_partition_month('currency_data_default'))
+
+    def test_partitioned_table_ddl(self):
+        """Test that the parent table keeps the model columns and includes the partitioning columns in its keys."""
+        create, default = build_partitioned_table_ddl()
+        self.assertIn('id SERIAL NOT NULL', create)
+        self.assertIn('PRIMARY KEY (id, instrument_id, timestamp)', create)
+        self.assertIn('UNIQUE (instrument_id, granularity_id, timestamp)', create)
+        self.assertIn('FOREIGN KEY (instrument_id) REFERENCES instrument (id)', create)
+        self.assertTrue(create.endswith('PARTITION BY RANGE (timestamp)'))
+        self.assertEqual(default, 'CREATE TABLE currency_data_default PARTITION OF currency_data DEFAULT')
+
+    def test_partition_ddl(self):
+        """Test monthly bounds and the optional sub-partitions by instrument."""
+        self.assertEqual(build_partition_ddl(datetime(2024, 12, 20)), [
+            "CREATE TABLE currency_data_p2024_12 PARTITION OF currency_data "
+            "FOR VALUES FROM ('2024-12-01 00:00:00') TO ('2025-01-01 00:00:00')"])
+
+        statements = build_partition_ddl(datetime(2024, 1, 1), {'EUR/USD': 1, 'GBP/USD': 2})
+        self.assertTrue(statements[0].endswith('PARTITION BY LIST (instrument_id)'))
+        self.assertIn("currency_data_p2024_01_gbp_usd PARTITION OF currency_data_p2024_01 FOR VALUES IN (2)",
+                      statements[2])
+        self.assertEqual(statements[3], 'CREATE TABLE currency_data_p2024_01_default PARTITION OF currency_data_p2024_01 DEFAULT')
+
+    def test_plan_partitions_skips_existing_months(self):
+        """Test that only the missing months of a range are created."""
+        statements = plan_partitions(['currency_data_default', 'currency_data_p2024_02'],
+                                     datetime(2024, 1, 31, 23), datetime(2024, 3, 1))
+        self.assertEqual([statement.split()[2] for statement in statements],
+                         ['currency_data_p2024_01', 'currency_data_p2024_03'])
+
+    @patch.dict('os.environ', {'DB_PARTITION_PAIRS': ' EUR/USD, ,GBP/USD'})
+    def test_partition_pairs(self):
+        """Test that the configured pairs are parsed from the environment."""
+        self.assertEqual(partition_pairs(), ['EUR/USD', 'GBP/USD'])
+
+    def test_foreign_keys_skipped_when_partitioned(self):
+        """Test that foreign keys to currency_data are only left out of PostgreSQL DDL in partitioned mode."""
+        table = MovingAverage.__table__
+        with patch.dict('os.environ', {'DB_PARTITION_CURRENCY_DATA': 'true'}):
+            self.assertNotIn('FOREIGN KEY', str(CreateTable(table).compile(dialect=postgresql.dialect())))
+            self.assertIn('FOREIGN KEY', str(CreateTable(table).compile(dialect=sqlite.dialect())))
+        with patch.dict('os.environ', {'DB_PARTITION_CURRENCY_DATA': 'false'}):
+            self.assertIn('FOREIGN KEY', str(CreateTable(table).compile(dialect=postgresql.dialect())))
+
+    def test_ensure_partitions(self):
+        """Test that missing partitions are created and unpartitioned or non-PostgreSQL tables are left alone."""
+        engine = MagicMock()
+        engine.dialect.name = 'postgresql'
+        connection = engine.begin.return_value.__enter__.return_value
+        connection.execute.return_value.all.return_value = [('currency_data_p2024_01',)]
+
+        created = ensure_partitions(engine, datetime(2024, 1, 5), datetime(2024, 2, 5), pairs={})
+
+        self.assertEqual(created, ['currency_data_p2024_02'])
+        self.assertIn('currency_data_p2024_02', str(connection.execute.call_args[0][0]))
+
+        connection.execute.return_value.all.return_value = []
+        self.assertIsNone(ensure_partitions(engine, datetime(2024, 1, 5), datetime(2024, 2, 5)))
+        engine.dialect.name = 'sqlite'
+        self.assertIsNone(ensure_partitions(engine, datetime(2024, 1, 5), datetime(2024, 2, 5)))
+
+    def test_detach_partitions(self):
+        """Test that only months ending by the cutoff are detached and then archived or dropped."""
+        engine = MagicMock()
+        connection = engine.begin.return_value.__enter__.return_value
+        connection.execute.return_value.all.return_value = [
+            ('currency_data_default',), ('currency_data_p2023_12',), ('currency_data_p2024_01',), ('currency_data_p2024_02',)]
+
+        detached = detach_partitions(engine, datetime(2024, 2, 1), archive_schema='archive')
+
+        self.assertEqual(detached, ['currency_data_p2023_12', 'currency_data_p2024_01'])
+        statements = [str(call[0][0]) for call in connection.execute.call_args_list[1:]]
+        self.assertIn('ALTER TABLE currency_data DETACH PARTITION currency_data_p2023_12', statements)
+        self.assertIn('ALTER TABLE currency_data_p2024_01 SET SCHEMA archive', statements)
+        self.assertFalse(any(statement.startswith('DROP') for statement in statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import importlib.util
+import os
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import seed_granularities, clear_dimension_cache
+from database.schema.create_tables import Instrument
+from database.queries import (read_series, read_series_frame, read_series_arrow, read_watermark, build_series_query,
+                              fill_arrays, SERIES_DTYPES)
+from scripts.insert_data import upsert_currency_data
+
+START = datetime(2024, 1, 1)
+
+
+def make_candles(closes, start=START):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (start + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': i,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class SeriesTests:
+    """
+    Read tests shared by the SQLite and PostgreSQL cases; subclasses provide self.engine.
+    """
+
+    def fill(self):
+        clear_dimension_cache()
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            seed_granularities(connection)
+        self.closes = np.round(1.1 + np.arange(25) / 1000, 5)
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(make_candles(self.closes), currency_pair='EUR/USD', session=session)
+        upsert_currency_data(make_candles(self.closes + 0.2), currency_pair='GBP/USD', session=session)
+        session.close()
+
+    def test_read_series_types(self):
+        """Test that columns come back as float64 and datetime64 arrays in timestamp order."""
+        arrays = read_series('EUR/USD', columns=('timestamp', 'close', 'volume'), engine=self.engine)
+
+        self.assertEqual(arrays['timestamp'].dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(arrays['close'].dtype, np.dtype('float64'))
+        np.testing.assert_array_equal(arrays['close'], self.closes)
+        np.testing.assert_array_equal(arrays['volume'], np.arange(25))
+        self.assertEqual(arrays['timestamp'][0], np.datetime64('2024-01-01'))
+
+    def test_chunked_read_matches_single_chunk(self):
+        """Test that reading in chunks smaller than the range returns the same rows."""
+        whole = read_series('EUR/USD', engine=self.engine)
+        chunked = read_series('EUR/USD', engine=self.engine, chunk_size=4)
+
+        for column in whole:
+            np.testing.assert_array_equal(chunked[column], whole[column])
+
+    def test_read_series_range(self):
+        """Test that the range includes from_time and excludes to_time."""
+        arrays = read_series('GBP/USD', from_time=START + timedelta(days=5), to_time=START + timedelta(days=10),
+                             engine=self.engine)
+
+        np.testing.assert_array_equal(arrays['close'], self.closes[5:10] + 0.2)
+
+    def test_read_series_frame(self):
+        """Test that the DataFrame columns are typed, without object columns."""
+        frame = read_series_frame('EUR/USD', engine=self.engine)
+
+        self.assertEqual(list(frame.columns), ['timestamp', 'close'])
+        self.assertEqual(frame['close'].dtype, np.dtype('float64'))
+        self.assertTrue(np.issubdtype(frame['timestamp'].dtype, np.datetime64))
+
+    def test_read_watermark(self):
+        """Test that the watermark counts the candles of the range and finds the latest one."""
+        watermark = read_watermark('EUR/USD', engine=self.engine)
+        self.assertEqual((watermark['rows'], watermark['last_timestamp']), (25, START + timedelta(days=24)))
+        watermark = read_watermark('EUR/USD', to_time=START + timedelta(days=10), engine=self.engine)
+        self.assertEqual((watermark['rows'], watermark['last_timestamp']), (10, START + timedelta(days=9)))
+        self.assertEqual(read_watermark('USD/JPY', engine=self.engine),
+                         {'rows': 0, 'last_timestamp': None, 'checksum': None})
+
+    def test_watermark_moves_with_corrected_candles(self):
+        """Test that correcting a candle in place changes the checksum but not the count or latest candle."""
+        before = read_watermark('EUR/USD', engine=self.engine)
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(make_candles([2.0], start=START + timedelta(days=3)), update_existing=True,
+                             currency_pair='EUR/USD', session=session)
+        session.close()
+
+        after = read_watermark('EUR/USD', engine=self.engine)
+        self.assertEqual((after['rows'], after['last_timestamp']), (before['rows'], before['last_timestamp']))
+        self.assertNotAlmostEqual(after['checksum'], before['checksum'])
+
+    def test_empty_series(self):
+        """Test that a series without candles gives empty typed arrays."""
+        arrays = read_series('USD/JPY', engine=self.engine)
+
+        self.assertEqual(len(arrays['close']), 0)
+        self.assertEqual(arrays['timestamp'].dtype, np.dtype('datetime64[us]'))
+
+    def test_unknown_pair_is_not_registered(self):
+        """Test that reading a misspelt pair returns nothing and leaves the instrument table alone."""
+        arrays = read_series('EURUSD', columns=('timestamp', 'close', 'volume'), engine=self.engine)
+
+        self.assertEqual({column: len(array) for column, array in arrays.items()},
+                         {'timestamp': 0, 'close': 0, 'volume': 0})
+        self.assertEqual(read_watermark('EURUSD', engine=self.engine)['rows'], 0)
+        with self.engine.connect() as connection:
+            names = connection.execute(select(Instrument.name)).scalars().all()
+        self.assertEqual(sorted(names), ['EUR/USD', 'GBP/USD'])
+
+
+class TestQueries(SeriesTests, unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        self.fill()
+
+    def tearDown(self):
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def test_query_binds_parameters(self):
+        """Test that range values are bound parameters rather than part of the SQL text."""
+        query = build_series_query(1, 19, START, START + timedelta(days=1))
+
+        compiled = query.compile(self.engine)
+        self.assertNotIn('2024', str(compiled))
+        self.assertIn(START, compiled.params.values())
+
+    def test_unknown_column(self):
+        """Test that a column outside SERIES_DTYPES is rejected."""
+        with self.assertRaises(ValueError):
+            build_series_query(1, 19, columns=('timestamp', 'currency_pair'))
+
+    def test_fill_arrays_grows_past_count(self):
+        """Test that rows beyond the counted size are kept and unused space is trimmed."""
+        class Result:
+            def partitions(self, size):
+                yield [(1.0,), (2.0,)]
+                yield [(3.0,)]
+
+        self.assertEqual(list(fill_arrays(Result(), ('close',), 1)['close']), [1.0, 2.0, 3.0])
+        self.assertEqual(list(fill_arrays(Result(), ('close',), 10)['close']), [1.0, 2.0, 3.0])
+        self.assertEqual(fill_arrays(Result(), ('close',), 10)['close'].dtype, SERIES_DTYPES['close'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_read_series_arrow(self):
+        """Test that the Arrow table holds the same values."""
+        table = read_series_arrow('EUR/USD', engine=self.engine)
+
+        np.testing.assert_array_equal(table.column('close').to_numpy(), self.closes)
+
+
+@unittest.skipUnless(os.getenv('TEST_POSTGRES_URL'), "TEST_POSTGRES_URL is not set")
+class TestQueriesPostgres(SeriesTests, unittest.TestCase):
+    """
+    The read tests on a scratch PostgreSQL database given by TEST_POSTGRES_URL, where rows are
+    streamed through a server-side cursor.
+    """
+
+    def setUp(self):
+        self.engine = create_engine(os.getenv('TEST_POSTGRES_URL'))
+        Base.metadata.drop_all(self.engine)
+        self.fill()
+
+    def tearDown(self):
+        Base.metadata.drop_all(self.engine)
+        clear_dimension_cache()
+        self.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
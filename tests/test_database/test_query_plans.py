@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, inspect, text, desc, select
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.schema.create_tables import CurrencyData, MovingAverage, Prediction
+from database.schema.migrations import upgrade
+from database.dimensions import granularity_id
+
+H1 = granularity_id('H1')
+
+
+class TestQueryPlans(unittest.TestCase):
+    """
+    EXPLAIN QUERY PLAN checks that the hot queries use the model indexes, on SQLite.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        start = datetime(2024, 1, 1)
+        for instrument_id in (1, 2):
+            for i in range(50):
+                self.session.add(CurrencyData(instrument_id=instrument_id, granularity_id=H1,
+                                              timestamp=start + timedelta(hours=i),
+                                              open=1.1, high=1.1, low=1.1, close=1.1, volume=1))
+        self.session.commit()
+        with self.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def plan(self, statement):
+        """Return the EXPLAIN QUERY PLAN details of a statement as one string."""
+        compiled = statement.compile(self.engine, compile_kwargs={'literal_binds': True})
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        return ' | '.join(row[-1] for row in rows)
+
+    def test_pair_range_scan_uses_unique_index(self):
+        """Test that a series and timestamp range query searches the (instrument_id, granularity_id, timestamp) index."""
+        statement = select(CurrencyData.timestamp, CurrencyData.close).where(
+            CurrencyData.instrument_id == 1,
+            CurrencyData.granularity_id == H1,
+            CurrencyData.timestamp >= datetime(2024, 1, 1, 10),
+            CurrencyData.timestamp <= datetime(2024, 1, 1, 20),
+        ).order_by(CurrencyData.timestamp)
+
+        plan = self.plan(statement)
+
+        # SQLite backs the unique constraint with an automatic index, so the searched columns are checked
+        self.assertIn('(instrument_id=? AND granularity_id=? AND timestamp>? AND timestamp<?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_record_exists_uses_unique_index(self):
+        """Test that the existence check of one candle is an index lookup."""
+        statement = select(CurrencyData.id).where(CurrencyData.instrument_id == 1, CurrencyData.granularity_id == H1,
+                                                  CurrencyData.timestamp == datetime(2024, 1, 1))
+
+        self.assertIn('(instrument_id=? AND granularity_id=? AND timestamp=?)', self.plan(statement))
+
+    def test_latest_timestamp_uses_timestamp_index(self):
+        """Test that the latest candle across all series is read from the timestamp index without sorting."""
+        statement = select(CurrencyData).order_by(desc(CurrencyData.timestamp)).limit(1)
+
+        plan = self.plan(statement)
+
+        self.assertIn('SCAN currency_data USING INDEX ix_currency_data_timestamp', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_child_tables_use_composite_indexes(self):
+        """Test that moving averages and predictions of a candle are index lookups."""
+        moving_average = select(MovingAverage.moving_average).where(
+            MovingAverage.currency_data_id == 1, MovingAverage.window_size == 5)
+        prediction = select(Prediction.predicted_close).where(
+            Prediction.currency_data_id == 1, Prediction.model_name == 'lstm')
+
+        self.assertIn('USING INDEX ix_moving_average_currency_data_id_window_size', self.plan(moving_average))
+        self.assertIn('USING INDEX ix_prediction_currency_data_id_model_name', self.plan(prediction))
+
+    def test_migrations_add_missing_indexes(self):
+        """Test that tables created before the indexes existed get them from the migrations."""
+        for name in ('ix_currency_data_timestamp', 'ix_moving_average_currency_data_id_window_size',
+                     'ix_prediction_currency_data_id_model_name'):
+            with self.engine.begin() as connection:
+                connection.execute(text(f"DROP INDEX {name}"))
+
+        upgrade(self.engine)
+
+        inspector = inspect(self.engine)
+        self.assertIn('ix_currency_data_timestamp', {i['name'] for i in inspector.get_indexes('currency_data')})
+        self.assertIn('ix_moving_average_currency_data_id_window_size',
+                      {i['name'] for i in inspector.get_indexes('moving_average')})
+        self.assertIn('ix_prediction_currency_data_id_model_name',
+                      {i['name'] for i in inspector.get_indexes('prediction')})
+
+
+if __name__ == '__main__':
+    unittest.main()
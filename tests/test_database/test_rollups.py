@@ -0,0 +1,144 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import get_instrument_id, find_instrument_id, granularity_id
+from database.schema.create_tables import CurrencyData
+from scripts.insert_data import upsert_currency_data
+from scripts.rollups import bucket_start, bucket_range, refresh_rollups, read_candles
+
+START = datetime(2024, 1, 3, 5)  # A Wednesday, so the first week and day are partial
+HOURS = 24 * 20
+
+# pandas rules producing the same buckets as the rollups
+RESAMPLE_RULES = {'H4': '4h', 'D': 'D', 'W': 'W-MON'}
+
+
+def make_candles(closes, start=START):
+    """Build hourly raw OANDA candles around the given close prices."""
+    return [{'time': (start + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': i % 7 + 1,
+             'mid': {'o': f'{c - 0.001:.5f}', 'h': f'{c + 0.002:.5f}', 'l': f'{c - 0.002:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class TestBuckets(unittest.TestCase):
+
+    def test_bucket_start(self):
+        """Test that buckets start at multiples of their length, and weeks on Monday."""
+        timestamp = datetime(2024, 1, 3, 5, 30)  # Wednesday
+        self.assertEqual(bucket_start(timestamp, 'H4'), datetime(2024, 1, 3, 4))
+        self.assertEqual(bucket_start(timestamp, 'D'), datetime(2024, 1, 3))
+        self.assertEqual(bucket_start(timestamp, 'W'), datetime(2024, 1, 1))
+
+    def test_bucket_range(self):
+        """Test that a range is widened to whole buckets, keeping aligned and open ends."""
+        self.assertEqual(bucket_range(datetime(2024, 1, 3, 5), datetime(2024, 1, 3, 6), 'H4'),
+                         (datetime(2024, 1, 3, 4), datetime(2024, 1, 3, 8)))
+        self.assertEqual(bucket_range(datetime(2024, 1, 3), datetime(2024, 1, 4), 'D'),
+                         (datetime(2024, 1, 3), datetime(2024, 1, 4)))
+        self.assertEqual(bucket_range(None, None, 'W'), (None, None))
+
+
+class TestRollups(unittest.TestCase):
+    """
+    Parity tests of the rollups against pandas resampling on SQLite.
+    """
+
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.closes = (1.1 + np.random.default_rng(5).normal(0, 0.001, HOURS).cumsum()).round(5)
+        # Loaded without rollups, so each test refreshes them explicitly
+        upsert_currency_data(make_candles(self.closes), currency_pair='EUR/USD', session=self.session,
+                             granularity='H1', rollup=None)
+        upsert_currency_data(make_candles(self.closes[:48] + 0.2), currency_pair='GBP/USD', session=self.session,
+                             granularity='H1', rollup=None)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def expected(self, granularity):
+        frame = pd.DataFrame(read_candles('EUR/USD', 'H1', engine=self.engine)).set_index('timestamp')
+        return frame.resample(RESAMPLE_RULES[granularity], closed='left', label='left').agg(
+            {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum',
+             'candle_count': 'sum'}).dropna()
+
+    def assert_matches_resample(self, granularity):
+        stored = pd.DataFrame(read_candles('EUR/USD', granularity, engine=self.engine)).set_index('timestamp')
+        expected = self.expected(granularity)
+        self.assertEqual(list(stored.index), list(expected.index))
+        np.testing.assert_allclose(stored.to_numpy(dtype=float), expected[stored.columns].to_numpy(dtype=float))
+
+    def test_full_refresh_matches_resample(self):
+        """Test that every level equals resampling the H1 candles directly."""
+        counts = refresh_rollups('EUR/USD', engine=self.engine)
+
+        # Starting at 05:00 leaves a partial bucket at both ends of H4 and D
+        self.assertEqual(counts, {'H4': HOURS // 4 + 1, 'D': 21, 'W': 4})
+        for granularity in ('H4', 'D', 'W'):
+            self.assert_matches_resample(granularity)
+        # The first week starts on Monday but only holds candles from Wednesday 05:00
+        first_week = read_candles('EUR/USD', 'W', engine=self.engine)[0]
+        self.assertEqual(first_week['timestamp'], datetime(2024, 1, 1))
+        self.assertEqual(first_week['candle_count'], 24 * 5 - 5)
+        self.assertEqual(read_candles('GBP/USD', 'W', engine=self.engine), [])
+        # Reads and refreshes of unknown pairs never register them
+        self.assertEqual(read_candles('EURUSD', 'W', engine=self.engine), [])
+        self.assertEqual(refresh_rollups('EURUSD', engine=self.engine), {'H4': 0, 'D': 0, 'W': 0})
+        self.assertIsNone(find_instrument_id(self.engine, 'EURUSD'))
+
+    def test_range_refresh_updates_only_affected_buckets(self):
+        """Test that refreshing one changed candle rebuilds one bucket per level."""
+        refresh_rollups('EUR/USD', engine=self.engine)
+        changed = START + timedelta(days=9, hours=3)
+        self.session.query(CurrencyData).filter(
+            CurrencyData.instrument_id == get_instrument_id(self.engine, 'EUR/USD'),
+            CurrencyData.granularity_id == granularity_id('H1'),
+            CurrencyData.timestamp == changed,
+        ).update({CurrencyData.high: 9.0})
+        self.session.commit()
+
+        counts = refresh_rollups('EUR/USD', changed, changed + timedelta(hours=1), engine=self.engine)
+
+        self.assertEqual(counts, {'H4': 1, 'D': 1, 'W': 1})
+        for granularity in ('H4', 'D', 'W'):
+            self.assert_matches_resample(granularity)
+            highs = [candle['high'] for candle in read_candles('EUR/USD', granularity, engine=self.engine)]
+            self.assertEqual(highs.count(9.0), 1)
+
+    def test_loads_refresh_rollups(self):
+        """Test that upserted H1 candles update the rollups of their buckets once committed."""
+        refresh_rollups('EUR/USD', engine=self.engine)
+        changed = START + timedelta(days=9, hours=3)
+        candle = make_candles([9.0], start=changed)
+
+        upsert_currency_data(candle, update_existing=True, currency_pair='EUR/USD', session=self.session,
+                             granularity='H1')
+
+        for granularity in ('H4', 'D', 'W'):
+            self.assert_matches_resample(granularity)
+            highs = [candle['high'] for candle in read_candles('EUR/USD', granularity, engine=self.engine)]
+            self.assertEqual(highs.count(9.002), 1)
+        # Daily candles are not rolled up
+        upsert_currency_data(make_candles([1.2], start=datetime(2024, 3, 1)), currency_pair='USD/JPY',
+                             session=self.session)
+        self.assertEqual(read_candles('USD/JPY', 'W', engine=self.engine), [])
+
+    def test_read_candles_range(self):
+        """Test that range reads return the buckets starting in [from_time, to_time)."""
+        refresh_rollups('EUR/USD', engine=self.engine)
+
+        candles = read_candles('EUR/USD', 'D', datetime(2024, 1, 5), datetime(2024, 1, 8), engine=self.engine)
+
+        self.assertEqual([candle['timestamp'] for candle in candles],
+                         [datetime(2024, 1, 5), datetime(2024, 1, 6), datetime(2024, 1, 7)])
+        self.assertEqual([candle['candle_count'] for candle in candles], [24, 24, 24])
+
+
+if __name__ == '__main__':
+    unittest.main()
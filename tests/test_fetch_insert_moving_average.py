@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.schema.create_tables import Instrument, MovingAverage
+from database.dimensions import clear_dimension_cache
+from scripts.insert_data import upsert_currency_data
+from scripts.fetch_insert_moving_average import (
+    get_latest_timestamp, get_trailing_closes, calculate_moving_average_columns, insert_currency_and_moving_avg_data,
+    main)
+
+
+def make_candles(closes, start=datetime(2024, 1, 1)):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (start + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000000Z'), 'volume': 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class TestFetchInsertMovingAverage(unittest.TestCase):
+    """
+    Tests for the incremental moving average ingestion.
+    """
+
+    def setUp(self):
+        clear_dimension_cache()
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        patcher = patch('scripts.fetch_insert_moving_average.get_session', return_value=self.Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.closes = list((1.1 + np.random.default_rng(1).normal(0, 0.01, 80)).round(5))
+
+    def tearDown(self):
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def moving_averages_by_timestamp(self, window):
+        session = self.Session()
+        try:
+            rows = session.query(MovingAverage).filter_by(window_size=window).order_by(MovingAverage.timestamp).all()
+            return {row.timestamp: row.moving_average for row in rows}
+        finally:
+            session.close()
+
+    def test_get_trailing_closes(self):
+        """Test that the most recent closes are returned oldest first."""
+        data = make_candles(self.closes[:10])
+        insert_currency_and_moving_avg_data(data, calculate_moving_average_columns(data, [5]))
+
+        self.assertEqual(get_trailing_closes(3), self.closes[7:10])
+        self.assertEqual(get_trailing_closes(0), [])
+        self.assertEqual(get_trailing_closes(3, 'USD/JPY'), [])
+        session = self.Session()
+        self.assertEqual(session.query(Instrument.name).all(), [('EUR/USD',)])
+        session.close()
+
+    def test_incremental_runs_produce_gap_free_series(self):
+        """Test that a second run continues the averages from the stored closes."""
+        all_candles = make_candles(self.closes)
+        first, second = all_candles[:60], all_candles[60:]
+        windows = [5, 50]
+        insert_currency_and_moving_avg_data(first, calculate_moving_average_columns(first, windows))
+
+        history = get_trailing_closes(max(windows) - 1)
+        insert_currency_and_moving_avg_data(second, calculate_moving_average_columns(second, windows, history))
+
+        full = calculate_moving_average_columns(all_candles, windows)
+        for window in windows:
+            stored = self.moving_averages_by_timestamp(window)
+            self.assertEqual(len(stored), len(all_candles) - window + 1)
+            np.testing.assert_allclose(list(stored.values()), full[window][window - 1:], atol=1e-12)
+
+    def test_latest_timestamp_of_one_series(self):
+        """Test that newer candles of other pairs and granularities do not move the latest timestamp."""
+        data = make_candles(self.closes[:10])
+        insert_currency_and_moving_avg_data(data, calculate_moving_average_columns(data, [5]))
+        session = self.Session()
+        upsert_currency_data(make_candles(self.closes[:5], start=datetime(2024, 2, 1)), currency_pair='GBP/USD',
+                             session=session)
+        upsert_currency_data(make_candles(self.closes[:5], start=datetime(2024, 3, 1)), currency_pair='EUR/USD',
+                             session=session, granularity='H1')
+        session.close()
+
+        self.assertEqual(get_latest_timestamp(), datetime(2024, 1, 10))
+        self.assertEqual(get_latest_timestamp('GBP/USD'), datetime(2024, 2, 5))
+        self.assertIsNone(get_latest_timestamp('USD/JPY'))
+
+    def test_main_continues_the_given_pair(self):
+        """Test that main fetches and stores the pair it is given from the day after its latest candle."""
+        data = make_candles(self.closes[:10])
+        insert_currency_and_moving_avg_data(data, calculate_moving_average_columns(data, [5]), 'GBP/USD')
+
+        with patch('scripts.fetch_insert_moving_average.fetch_ohlc_data',
+                   return_value=make_candles(self.closes[10:12], start=datetime(2024, 1, 11))) as fetch:
+            main('GBP/USD')
+
+        fetch.assert_called_once_with('GBP_USD', from_time=datetime(2024, 1, 11))
+        self.assertEqual(get_latest_timestamp('GBP/USD'), datetime(2024, 1, 12))
+        self.assertIsNone(get_latest_timestamp())
+
+
+if __name__ == '__main__':
+    unittest.main()
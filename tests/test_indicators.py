@@ -0,0 +1,154 @@
+import math
+import unittest
+import numpy as np
+from scripts.indicators import (
+    parse_closes, rolling_mean, moving_averages, compute_indicators, prices_from_candles, normalise_spec)
+from scripts.fetch_insert_moving_average import calculate_moving_averages, calculate_moving_average_columns
+
+
+def make_candles(closes):
+    """Build raw OANDA candles with the given close prices."""
+    return [{'time': f'2024-01-{i % 28 + 1:02d}T00:00:00.000000000Z', 'volume': 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+def naive_moving_average(values, window):
+    """Reference implementation matching the original per-index slice sums."""
+    return [math.nan] * (window - 1) + [
+        math.fsum(values[i - window + 1:i + 1]) / window for i in range(window - 1, len(values))]
+
+
+def wilder_reference(values, period):
+    """Loop implementation of Wilder's smoothing seeded with the simple average of the first period values."""
+    result = [math.nan] * len(values)
+    result[period - 1] = sum(values[:period]) / period
+    for i in range(period, len(values)):
+        result[i] = (result[i - 1] * (period - 1) + values[i]) / period
+    return result
+
+
+def make_prices(rng, rows):
+    """Build a random-walk OHLC series."""
+    close = 1.1 + rng.normal(0, 0.001, rows).cumsum()
+    spread = np.abs(rng.normal(0, 0.0005, rows))
+    return {'high': close + spread, 'low': close - spread, 'close': close}
+
+
+class TestIndicators(unittest.TestCase):
+    """
+    Tests for the vectorised indicator engine.
+    """
+
+    def setUp(self):
+        self.rng = np.random.default_rng(42)
+
+    def test_parse_closes(self):
+        """Test that close prices are parsed into a float array."""
+        closes = parse_closes(make_candles([1.1, 1.2, 1.3]))
+        self.assertEqual(closes.dtype, np.float64)
+        np.testing.assert_allclose(closes, [1.1, 1.2, 1.3])
+
+    def test_rolling_mean_matches_naive_across_blocks(self):
+        """Test that block boundaries of the re-anchored cumulative sums do not change the result."""
+        values = 1.1 + self.rng.normal(0, 0.01, 1000).cumsum()
+        for window in (1, 5, 50, 200):
+            result = rolling_mean(values, window, anchor_interval=64)
+            np.testing.assert_allclose(result, naive_moving_average(list(values), window), rtol=0, atol=1e-12)
+
+    def test_rolling_mean_is_stable_on_long_series(self):
+        """Test that errors do not accumulate over a million rows of large values."""
+        values = 1e6 + self.rng.normal(0, 1, 1_000_000)
+        result = rolling_mean(values, 200)
+        expected = np.mean(values[-200:])
+        self.assertLess(abs(result[-1] - expected), 1e-8)
+
+    def test_rolling_mean_short_series(self):
+        """Test that series shorter than the window produce only NaN."""
+        self.assertTrue(np.isnan(rolling_mean(np.array([1.0, 2.0]), 5)).all())
+        with self.assertRaises(ValueError):
+            rolling_mean(np.array([1.0]), 0)
+
+    def test_moving_averages_columns(self):
+        """Test that all windows are returned as columns keyed by window size."""
+        columns = moving_averages(np.arange(10, dtype=float), [2, 5])
+        self.assertEqual(set(columns), {2, 5})
+        self.assertEqual(columns[2][1], 0.5)
+        self.assertEqual(columns[5][9], 7.0)
+
+    def test_calculate_moving_averages_compatibility(self):
+        """Test that the legacy wrapper stores the same values in the candle dicts."""
+        closes = list(1.1 + self.rng.normal(0, 0.01, 60).round(5))
+        data = calculate_moving_averages(make_candles(closes))
+        columns = calculate_moving_average_columns(make_candles(closes))
+
+        self.assertNotIn('moving_avg_5', data[3])
+        self.assertAlmostEqual(data[4]['moving_avg_5'], columns[5][4])
+        self.assertAlmostEqual(data[59]['moving_avg_50'], naive_moving_average(closes, 50)[59], places=12)
+
+    def test_rsi_and_atr_match_wilder_reference(self):
+        """Test RSI and ATR against loop implementations of Wilder's formulas."""
+        prices = make_prices(self.rng, 200)
+        columns, _ = compute_indicators(prices, [{'indicator': 'rsi', 'period': 14}, {'indicator': 'atr', 'period': 14}])
+
+        close, high, low = prices['close'], prices['high'], prices['low']
+        changes = np.diff(close)
+        average_gain = wilder_reference(list(np.maximum(changes, 0)), 14)
+        average_loss = wilder_reference(list(np.maximum(-changes, 0)), 14)
+        expected_rsi = [math.nan] + [100 - 100 / (1 + g / l) for g, l in zip(average_gain, average_loss)]
+        ranges = [high[0] - low[0]] + [max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+                                       for i in range(1, len(close))]
+
+        np.testing.assert_allclose(columns['rsi_14'], expected_rsi, atol=1e-9)
+        np.testing.assert_allclose(columns['atr_14'], wilder_reference(ranges, 14), atol=1e-12)
+        self.assertTrue(np.isnan(columns['rsi_14'][:14]).all())
+
+    def test_ema_macd_and_bollinger(self):
+        """Test EMA, MACD and Bollinger bands against straightforward implementations."""
+        close = make_prices(self.rng, 300)['close']
+        specs = [{'indicator': 'ema', 'period': 10}, {'indicator': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+                 {'indicator': 'bollinger', 'period': 20, 'width': 2.0, 'name': 'bb'}]
+        columns, _ = compute_indicators({'high': close, 'low': close, 'close': close}, specs)
+
+        def ema(values, period):
+            result = [math.nan] * len(values)
+            start = next(i for i, value in enumerate(values) if not math.isnan(value))
+            result[start + period - 1] = sum(values[start:start + period]) / period
+            for i in range(start + period, len(values)):
+                result[i] = result[i - 1] + 2 / (period + 1) * (values[i] - result[i - 1])
+            return np.array(result)
+
+        macd = ema(list(close), 12) - ema(list(close), 26)
+        np.testing.assert_allclose(columns['ema_10'], ema(list(close), 10), atol=1e-12)
+        np.testing.assert_allclose(columns['macd_12_26_9'], macd, atol=1e-12)
+        np.testing.assert_allclose(columns['macd_12_26_9_signal'], ema(list(macd), 9), atol=1e-12)
+        self.assertAlmostEqual(columns['bb_upper'][-1], close[-20:].mean() + 2 * close[-20:].std(), places=10)
+        self.assertAlmostEqual(columns['bb_lower'][-1], close[-20:].mean() - 2 * close[-20:].std(), places=10)
+
+    def test_incremental_updates_match_full_computation(self):
+        """Test that carrying state across chunks, including empty and tiny ones, reproduces a single pass."""
+        prices = make_prices(self.rng, 500)
+        full, _ = compute_indicators(prices)
+
+        state, chunks = None, {}
+        for start, stop in [(0, 7), (7, 30), (30, 31), (31, 31), (31, 500)]:
+            columns, state = compute_indicators({key: values[start:stop] for key, values in prices.items()}, state=state)
+            for name, values in columns.items():
+                chunks.setdefault(name, []).append(values)
+
+        for name, values in full.items():
+            np.testing.assert_allclose(np.concatenate(chunks[name]), values, atol=1e-12, err_msg=name)
+
+    def test_prices_from_candles_and_specs(self):
+        """Test parsing OHLC arrays from candles and validating specs."""
+        prices = prices_from_candles(make_candles([1.1, 1.2]))
+        self.assertEqual(set(prices), {'open', 'high', 'low', 'close'})
+        self.assertEqual(normalise_spec({'indicator': 'macd', 'fast': 12, 'slow': 26, 'signal': 9})['name'], 'macd_12_26_9')
+        with self.assertRaises(ValueError):
+            normalise_spec({'indicator': 'vwap', 'period': 5})
+        with self.assertRaises(ValueError):
+            normalise_spec({'indicator': 'rsi'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import unittest
+from unittest.mock import patch
+import requests_mock
+from scripts.oanda_client import OandaClient, get_client
+
+BASE_URL = "https://api-fxpractice.oanda.com/v3/instruments"
+
+
+def candles_response(close):
+    """Build an OANDA candles response with a single candle."""
+    return {"candles": [{"complete": True, "volume": 1, "time": "2020-01-01T00:00:00.000000000Z",
+                         "mid": {"o": close, "h": close, "l": close, "c": close}}]}
+
+
+class TestOandaClient(unittest.TestCase):
+    """
+    Tests for the pooled, concurrent OANDA client.
+    """
+
+    def setUp(self):
+        self.client = OandaClient("fake_api_key", max_concurrency=4)
+
+    def tearDown(self):
+        self.client.close()
+
+    @requests_mock.Mocker()
+    def test_get_candles(self, mock_get):
+        """Test that candles are requested for the given instrument with the auth header."""
+        mock_get.get(f"{BASE_URL}/GBP_USD/candles", json=candles_response("1.25"))
+
+        candles = self.client.get_candles("GBP_USD", "H1", count=10)
+
+        self.assertEqual(candles[0]["mid"]["c"], "1.25")
+        request = mock_get.request_history[0]
+        self.assertEqual(request.headers["Authorization"], "Bearer fake_api_key")
+        self.assertEqual(request.qs, {"granularity": ["h1"], "count": ["10"]})
+
+    @requests_mock.Mocker()
+    def test_fetch_many_keys_results_by_instrument(self, mock_get):
+        """Test that every instrument/granularity combination is fetched and keyed correctly."""
+        for instrument, close in (("EUR_USD", "1.1"), ("GBP_USD", "1.2")):
+            mock_get.get(f"{BASE_URL}/{instrument}/candles", json=candles_response(close))
+
+        results = self.client.fetch_many(["EUR_USD", "GBP_USD"], ["D", "H1"], count=1)
+
+        self.assertEqual(set(results), {"EUR_USD", "GBP_USD"})
+        self.assertEqual(set(results["EUR_USD"]), {"D", "H1"})
+        self.assertEqual(results["GBP_USD"]["H1"][0]["mid"]["c"], "1.2")
+        self.assertEqual(len(mock_get.request_history), 4)
+
+    def test_fetch_many_runs_concurrently(self):
+        """Test that fetching several instruments takes about as long as the slowest call."""
+        def slow_get_candles(instrument, granularity, **params):
+            time.sleep(0.2)
+            return candles_response("1.1")["candles"]
+
+        instruments = ["EUR_USD", "GBP_USD", "USD_JPY", "AUD_USD"]
+        started = time.perf_counter()
+        with patch.object(self.client, "get_candles", side_effect=slow_get_candles):
+            results = self.client.fetch_many(instruments, "D")
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(results), 4)
+        self.assertLess(elapsed, 0.6)
+
+    @requests_mock.Mocker()
+    def test_fetch_many_isolates_failures(self, mock_get):
+        """Test that one failing instrument does not lose the results of the others."""
+        mock_get.get(f"{BASE_URL}/EUR_USD/candles", json=candles_response("1.1"))
+        mock_get.get(f"{BASE_URL}/XXX_YYY/candles", status_code=400)
+
+        results = self.client.fetch_many(["EUR_USD", "XXX_YYY"], "D")
+
+        self.assertEqual(len(results["EUR_USD"]["D"]), 1)
+        self.assertEqual(results["XXX_YYY"]["D"], [])
+
+    def test_get_client_is_shared_per_api_key(self):
+        """Test that the shared client, and so its connection pool, is reused."""
+        self.assertIs(get_client("key_a"), get_client("key_a"))
+        self.assertIsNot(get_client("key_a"), get_client("key_b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import random
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from requests.exceptions import ConnectionError
+from scripts.rate_limiter import TokenBucket, RequestScheduler, parse_retry_after
+
+
+class FakeClock:
+    """Deterministic clock whose sleep advances time instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_response(status_code, retry_after=None):
+    """Build a mock response with an optional Retry-After header."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return response
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Tests for the token bucket and the retrying request scheduler.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make_scheduler(self, **kwargs):
+        return RequestScheduler(clock=self.clock, sleep=self.clock.sleep, rng=random.Random(0), **kwargs)
+
+    def test_token_bucket_enforces_rate(self):
+        """Test that requests beyond the burst are spaced at the configured rate."""
+        bucket = TokenBucket(rate=10, capacity=2, clock=self.clock, sleep=self.clock.sleep)
+
+        waits = [bucket.acquire() for _ in range(5)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertTrue(all(abs(wait - 0.1) < 1e-9 for wait in waits[2:]))
+        self.assertAlmostEqual(self.clock.now, 0.3)
+
+    def test_token_bucket_pause(self):
+        """Test that a pause delays the next token even when tokens are available."""
+        bucket = TokenBucket(rate=10, capacity=5, clock=self.clock, sleep=self.clock.sleep)
+        bucket.pause(2.0)
+
+        self.assertAlmostEqual(bucket.acquire(), 2.0)
+
+    def test_parse_retry_after(self):
+        """Test parsing Retry-After in seconds and as an HTTP date."""
+        now = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertEqual(parse_retry_after('Mon, 01 Jan 2024 12:00:05 GMT', now=now), 5.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_request_honours_retry_after(self):
+        """Test that a 429 is retried after the server-requested delay."""
+        scheduler = self.make_scheduler(rate=100)
+        send = MagicMock(side_effect=[make_response(429, '2'), make_response(200)])
+
+        response = scheduler.request(send)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_count, 2)
+        self.assertGreaterEqual(self.clock.now, 2.0)
+        self.assertEqual(scheduler.snapshot(), {'requests': 2, 'throttled': 1, 'retried': 1, 'failed': 0})
+
+    def test_service_unavailable_retry_after_pauses_every_caller(self):
+        """Test that a 503 with Retry-After pauses the shared budget, not only the failed request."""
+        scheduler = self.make_scheduler(rate=100)
+        send = MagicMock(side_effect=[make_response(503, '3'), make_response(200)])
+
+        scheduler.request(send)
+
+        self.assertAlmostEqual(self.clock.now, 3.0)
+        self.assertEqual(scheduler.bucket._paused_until, 3.0)
+        self.assertEqual(scheduler.snapshot()['throttled'], 1)
+
+    def test_request_retries_transient_errors_with_backoff(self):
+        """Test that connection errors and 5xx responses are retried with growing, jittered delays."""
+        scheduler = self.make_scheduler(rate=100, backoff_base=1.0)
+        send = MagicMock(side_effect=[ConnectionError("reset"), make_response(503), make_response(200)])
+
+        response = scheduler.request(send)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertLessEqual(self.clock.sleeps[0], 1.0)
+        self.assertLessEqual(self.clock.sleeps[1], 2.0)
+        self.assertEqual(scheduler.stats['retried'], 2)
+
+    def test_request_does_not_retry_client_errors(self):
+        """Test that non-transient errors are returned immediately."""
+        scheduler = self.make_scheduler(rate=100)
+        send = MagicMock(return_value=make_response(400))
+
+        self.assertEqual(scheduler.request(send).status_code, 400)
+        send.assert_called_once()
+
+    def test_request_gives_up_after_max_retries(self):
+        """Test that exhausted retries are counted as failed."""
+        scheduler = self.make_scheduler(rate=100, max_retries=2)
+        send = MagicMock(side_effect=ConnectionError("down"))
+
+        with self.assertRaises(ConnectionError):
+            scheduler.request(send)
+
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(scheduler.stats['failed'], 1)
+        self.assertEqual(scheduler.stats['retried'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import pandas as pd
+from scripts.time_series_forecasting.a_data_preparation import (prepare_data_for_lstm, iter_sequence_batches,
+                                                                reshape_for_lstm, split_data)
+
+
+def loop_sequences(values, window_size):
+    """Build the sequences the way prepare_data_for_lstm used to, one copied slice at a time."""
+    X, y = [], []
+    for i in range(len(values) - window_size):
+        X.append(values[i:i + window_size])
+        y.append(values[i + window_size, 0])
+    return np.array(X), np.array(y)
+
+
+class TestPrepareDataForLstm(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.data = pd.DataFrame({'scaled_close': rng.random(200), 'scaled_volume': rng.random(200)})
+
+    def test_matches_copied_windows(self):
+        """Test that the views hold the same sequences and targets as copying every window."""
+        X, y = prepare_data_for_lstm(self.data, window_size=30)
+
+        expected_X, expected_y = loop_sequences(self.data[['scaled_close']].to_numpy(), 30)
+        self.assertEqual(X.shape, (170, 30, 1))
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(y, expected_y)
+
+    def test_multiple_features(self):
+        """Test that every feature column becomes a feature of each timestep."""
+        X, y = prepare_data_for_lstm(self.data, window_size=10, feature_columns=('scaled_close', 'scaled_volume'))
+
+        expected_X, expected_y = loop_sequences(self.data[['scaled_close', 'scaled_volume']].to_numpy(), 10)
+        self.assertEqual(X.shape, (190, 10, 2))
+        np.testing.assert_array_equal(X, expected_X)
+        np.testing.assert_array_equal(y, expected_y)
+
+    def test_sequences_are_read_only_views(self):
+        """Test that no window is copied and the views cannot be written through."""
+        X, y = prepare_data_for_lstm(self.data, window_size=30)
+
+        # Overlapping windows are the same memory
+        self.assertTrue(np.shares_memory(X[0], X[1]))
+        self.assertFalse(X.flags.writeable)
+        self.assertFalse(y.flags.writeable)
+        self.assertIs(reshape_for_lstm(X), X)
+
+    def test_short_series(self):
+        """Test that a series no longer than the window gives no sequences."""
+        X, y = prepare_data_for_lstm(self.data.head(30), window_size=30)
+
+        self.assertEqual(X.shape, (0, 30, 1))
+        self.assertEqual(y.shape, (0,))
+
+    def test_iter_sequence_batches(self):
+        """Test that batches cover every sequence in order as contiguous arrays."""
+        X, y = prepare_data_for_lstm(self.data, window_size=30)
+        X_train, _, y_train, _ = split_data(X, y)
+
+        batches = list(iter_sequence_batches(X_train, y_train, batch_size=32))
+
+        self.assertEqual([len(X_batch) for X_batch, _ in batches], [32, 32, 32, 32, 8])
+        self.assertTrue(all(X_batch.flags.c_contiguous for X_batch, _ in batches))
+        np.testing.assert_array_equal(np.concatenate([X_batch for X_batch, _ in batches]), X_train)
+        np.testing.assert_array_equal(np.concatenate([y_batch for _, y_batch in batches]), y_train)
+
+    def test_reshape_for_lstm_2d(self):
+        """Test that 2D sequences still get a single feature dimension."""
+        self.assertEqual(reshape_for_lstm(np.zeros((5, 30))).shape, (5, 30, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
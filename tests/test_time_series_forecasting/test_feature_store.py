@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import seed_granularities, clear_dimension_cache
+from scripts.insert_data import upsert_currency_data
+from scripts.time_series_forecasting import feature_store
+from scripts.time_series_forecasting.a_data_preparation import scale_data, prepare_data_for_lstm, split_data
+from scripts.time_series_forecasting.feature_store import load_features, training_arrays, current_version
+from scripts.time_series_forecasting.input_pipeline import build_feature_set_datasets
+
+START = datetime(2024, 1, 1)
+
+
+def make_candles(closes, start=START):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (start + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': i + 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+def read_frame(closes):
+    """Build the DataFrame fetch_data returns for the given closes."""
+    return pd.DataFrame({'timestamp': [START + timedelta(days=i) for i in range(len(closes))], 'close': closes})
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        clear_dimension_cache()
+        self.root = tempfile.mkdtemp()
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            seed_granularities(connection)
+        self.closes = (1.1 + np.random.default_rng(3).normal(0, 0.002, 80).cumsum()).round(5)
+        self.insert(self.closes)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def insert(self, closes, start=START, update_existing=False):
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(make_candles(closes, start), update_existing=update_existing, currency_pair='EUR/USD',
+                             session=session)
+        session.close()
+
+    def load(self, **kwargs):
+        return load_features('EUR/USD', 'D', window_size=10, root=self.root, engine=self.engine, **kwargs)
+
+    def test_matches_in_memory_preparation(self):
+        """Test that the stored sequences and scaler match those of the in-memory preparation."""
+        X_train, X_test, y_train, y_test, scaler = training_arrays(self.load())
+
+        data, expected_scaler = scale_data(read_frame(self.closes))
+        expected = split_data(*prepare_data_for_lstm(data, 10))
+        for array, expected_array in zip((X_train, X_test, y_train, y_test), expected):
+            self.assertEqual(array.shape, expected_array.shape)
+            np.testing.assert_allclose(array, expected_array, atol=1e-6)
+        np.testing.assert_allclose(scaler.inverse_transform(y_test.reshape(-1, 1)).ravel(), self.closes[-len(y_test):],
+                                   rtol=1e-6)
+        np.testing.assert_array_equal(scaler.data_min_, expected_scaler.data_min_)
+
+    def test_arrays_are_memory_mapped(self):
+        """Test that the arrays are read-only memory maps and the sequences views of them."""
+        feature_set = self.load()
+        X_train = training_arrays(feature_set)[0]
+
+        self.assertIsInstance(feature_set['features'], np.memmap)
+        self.assertFalse(feature_set['features'].flags.writeable)
+        self.assertTrue(np.shares_memory(X_train, feature_set['features']))
+
+    def test_unchanged_watermark_reuses_version(self):
+        """Test that loading again without new candles does not read or rescale the series."""
+        path = self.load()['path']
+
+        with patch.object(feature_store, 'read_series') as read_series:
+            feature_set = self.load()
+
+        read_series.assert_not_called()
+        self.assertEqual(feature_set['path'], path)
+
+    def test_new_candles_materialise_new_version(self):
+        """Test that new candles move the watermark and produce a new current version."""
+        first = self.load()
+        self.insert([1.3, 1.31], start=START + timedelta(days=80))
+
+        second = self.load()
+
+        self.assertNotEqual(second['path'], first['path'])
+        self.assertEqual((second['watermark']['rows'], second['watermark']['last_timestamp']),
+                         (82, '2024-03-22T00:00:00'))
+        self.assertEqual(len(second['targets']), 82)
+        self.assertEqual(current_version(os.path.dirname(second['path'])), second['path'])
+        # The previous version stays readable for runs still mapping it
+        self.assertEqual(len(first['targets']), 80)
+
+    def test_corrected_candles_materialise_new_version(self):
+        """Test that a candle corrected in place moves the watermark and is served, while a refresh of
+        unchanged candles keeps the version with the same arrays."""
+        first = self.load()
+        self.assertEqual(self.load(refresh=True)['path'], first['path'])
+
+        self.insert([1.5], start=START + timedelta(days=40), update_existing=True)
+        second = self.load()
+
+        self.assertNotEqual(second['path'], first['path'])
+        self.assertEqual(second['watermark']['rows'], first['watermark']['rows'])
+        self.assertAlmostEqual(float(second['scaler'].inverse_transform(second['targets'][40:41].reshape(-1, 1))[0, 0]),
+                               1.5, places=5)
+
+    def test_main_uses_look_back(self):
+        """Test that main prepares only the candles of its look-back, as a_data_preparation.main does."""
+        now = START + timedelta(days=80, hours=12)
+        with patch.object(feature_store, 'datetime', wraps=datetime) as clock, \
+                patch.object(feature_store, 'FEATURE_STORE_DIR', self.root), \
+                patch('database.queries.get_engine', return_value=self.engine):
+            clock.now.return_value = now
+            X_train, X_test = feature_store.main(window_size=10, look_back_days=50)[:2]
+
+        self.assertEqual(len(X_train) + len(X_test), 50 - 10)
+
+    def test_feature_columns_and_split(self):
+        """Test that multi-column feature sets are keyed separately and keep their split."""
+        feature_set = self.load(columns=('close', 'volume'), test_size=0.25)
+
+        self.assertEqual(feature_set['features'].shape, (80, 2))
+        self.assertEqual(feature_set['split_index'], int(70 * 0.75))
+        self.assertIn('w10_test0.25_close-volume', feature_set['path'])
+        np.testing.assert_allclose(feature_set['feature_scaler'].inverse_transform(feature_set['features'])[:, 1],
+                                   np.arange(1, 81), rtol=1e-5)
+
+    def test_feature_set_datasets(self):
+        """Test that the tf.data datasets of a feature set hold the stored test targets."""
+        feature_set = self.load()
+        y_test = training_arrays(feature_set)[3]
+
+        _, test_dataset, dataset_y_test = build_feature_set_datasets(feature_set, batch_size=8, shuffle=False)
+
+        np.testing.assert_array_equal(dataset_y_test, y_test)
+        np.testing.assert_array_equal(np.concatenate([y for _, y in test_dataset.as_numpy_iterator()]), y_test)
+
+    def test_prune_keeps_recent_versions(self):
+        """Test that only the most recent versions are kept on disk."""
+        for day in range(80, 85):
+            self.insert([1.3], start=START + timedelta(days=day))
+            path = self.load()['path']
+
+        versions = [name for name in os.listdir(os.path.dirname(path)) if not name.startswith(('.', 'CURRENT'))]
+        self.assertEqual(len(versions), feature_store.FEATURE_STORE_KEEP_VERSIONS)
+        self.assertIn(os.path.basename(path), versions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import seed_granularities, clear_dimension_cache
+from scripts.insert_data import upsert_currency_data
+from scripts.time_series_forecasting.b_lstm_model import create_lstm_model
+from scripts.time_series_forecasting.hyperparameter_search import (sample_configurations, rung_epochs,
+                                                                   successive_halving, write_leaderboard, run_search)
+
+SPACE = {'units': [4, 8], 'layers': [1, 2], 'window_size': [5], 'dropout_rate': [0.1], 'learning_rate': [0.01],
+         'batch_size': [16]}
+
+
+class TestSuccessiveHalving(unittest.TestCase):
+
+    def test_sample_configurations(self):
+        """Test that sampling draws distinct grid points reproducibly and None takes the whole grid."""
+        self.assertEqual(len(sample_configurations(SPACE)), 4)
+        sample = sample_configurations(SPACE, trials=3, seed=1)
+        self.assertEqual(len({tuple(configuration.values()) for configuration in sample}), 3)
+        self.assertEqual(sample, sample_configurations(SPACE, trials=3, seed=1))
+
+    def test_rung_epochs(self):
+        """Test that budgets grow by eta and the last one is capped at max_epochs."""
+        self.assertEqual(rung_epochs(2, 18, 3), [2, 6, 18])
+        self.assertEqual(rung_epochs(1, 10, 2), [1, 2, 4, 8, 10])
+
+    def test_successive_halving_keeps_best_trials(self):
+        """Test that each rung keeps the best 1/eta of the trials and resumes them from their epochs."""
+        configurations = [{'quality': quality} for quality in (5, 1, 9, 3, 7, 2, 8, 4, 6)]
+        calls = []
+
+        def run_rung(trials, epochs):
+            calls.append([(trial['trial'], trial.get('epochs', 0), epochs) for trial in trials])
+            return [{'val_loss': trial['quality'] / epochs} for trial in trials]
+
+        trials = successive_halving(configurations, run_rung, min_epochs=1, max_epochs=9, eta=3)
+
+        self.assertEqual([len(call) for call in calls], [9, 3, 1])
+        self.assertEqual(sorted(trial for trial, _, _ in calls[1]), [1, 3, 5])
+        self.assertEqual(calls[2], [(1, 3, 9)])
+        self.assertEqual({trial['rung'] for trial in trials if trial['trial'] in (0, 2, 4, 6, 7, 8)}, {0})
+        self.assertEqual(trials[1]['epochs'], 9)
+
+    def test_write_leaderboard(self):
+        """Test that trials are ranked by rung reached, then validation loss."""
+        trials = [{'trial': 0, 'rung': 0, 'val_loss': 0.1}, {'trial': 1, 'rung': 1, 'val_loss': 0.5},
+                  {'trial': 2, 'rung': 1, 'val_loss': 0.2}]
+        path = os.path.join(tempfile.mkdtemp(), 'leaderboard.csv')
+
+        ranked = write_leaderboard(trials, path)
+
+        self.assertEqual([trial['trial'] for trial in ranked], [2, 1, 0])
+        with open(path) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['trial'] for row in rows], ['2', '1', '0'])
+        self.assertEqual(rows[0]['rank'], '1')
+        shutil.rmtree(os.path.dirname(path))
+
+
+class TestCreateLstmModel(unittest.TestCase):
+
+    def test_parameters(self):
+        """Test that units, layers and learning rate shape the compiled model."""
+        model = create_lstm_model((10, 2), dropout_rate=0.3, units=16, layers=3, learning_rate=0.01)
+
+        lstm_layers = [layer for layer in model.layers if layer.__class__.__name__ == 'LSTM']
+        self.assertEqual(len(lstm_layers), 3)
+        self.assertEqual({layer.units for layer in lstm_layers}, {16})
+        self.assertEqual([layer.return_sequences for layer in lstm_layers], [True, True, False])
+        self.assertAlmostEqual(float(model.optimizer.learning_rate.numpy()), 0.01)
+        self.assertEqual(model.output_shape, (None, 1))
+
+
+class TestRunSearch(unittest.TestCase):
+    """
+    A small search end to end, on spawned worker processes reading the feature store.
+    """
+
+    def setUp(self):
+        clear_dimension_cache()
+        self.directory = tempfile.mkdtemp()
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            seed_granularities(connection)
+        closes = 1.1 + np.sin(np.arange(60) / 5) / 100
+        candles = [{'time': (datetime(2024, 1, 1) + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+                    'volume': 1, 'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+                   for i, c in enumerate(closes)]
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(candles, currency_pair='EUR/USD', session=session)
+        session.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def test_run_search(self):
+        """Test that the search trains, prunes and ranks every trial with test metrics."""
+        ranked = run_search(space=SPACE, workers=1, intra_op_threads=1, min_epochs=1, max_epochs=2, eta=2,
+                            leaderboard_path=os.path.join(self.directory, 'leaderboard.csv'),
+                            model_dir=os.path.join(self.directory, 'models'), root=self.directory,
+                            engine=self.engine)
+
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual([trial['rung'] for trial in ranked], [1, 1, 0, 0])
+        self.assertEqual(ranked[0]['epochs'], 2)
+        for trial in ranked:
+            self.assertTrue(np.isfinite(trial['RMSE']))
+            self.assertTrue(os.path.exists(trial['model_path']))
+
+
+if __name__ == '__main__':
+    unittest.main()
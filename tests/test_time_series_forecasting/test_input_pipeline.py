@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+from scripts.time_series_forecasting.a_data_preparation import prepare_data_for_lstm, split_data
+from scripts.time_series_forecasting.input_pipeline import make_dataset, build_datasets
+
+
+def collect(dataset):
+    """Concatenate the (X, y) batches of a dataset into two arrays."""
+    batches = list(dataset.as_numpy_iterator())
+    return np.concatenate([X for X, _ in batches]), np.concatenate([y for _, y in batches])
+
+
+class TestInputPipeline(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.data = pd.DataFrame({'scaled_close': rng.random(150), 'scaled_volume': rng.random(150)})
+
+    def test_make_dataset_matches_prepare_data_for_lstm(self):
+        """Test that the dataset yields the sequences and targets of the NumPy path, in order."""
+        features = self.data[['scaled_close', 'scaled_volume']].to_numpy()
+        X, y = collect(make_dataset(features, features[:, 0], window_size=10, batch_size=16))
+
+        expected_X, expected_y = prepare_data_for_lstm(self.data, 10, feature_columns=('scaled_close', 'scaled_volume'))
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_allclose(X, expected_X, rtol=1e-6)
+        np.testing.assert_allclose(y, expected_y, rtol=1e-6)
+
+    def test_build_datasets_matches_split_data(self):
+        """Test that the train and test datasets hold exactly the sequences of split_data."""
+        train_dataset, test_dataset, y_test = build_datasets(self.data, window_size=10, batch_size=16, shuffle=False)
+
+        X_train, X_test, y_train, expected_y_test = split_data(*prepare_data_for_lstm(self.data, 10))
+        for dataset, expected_X, expected_y in ((train_dataset, X_train, y_train), (test_dataset, X_test,
+                                                                                    expected_y_test)):
+            X, y = collect(dataset)
+            np.testing.assert_allclose(X, expected_X, rtol=1e-6)
+            np.testing.assert_allclose(y, expected_y, rtol=1e-6)
+        np.testing.assert_allclose(y_test, expected_y_test, rtol=1e-6)
+
+    def test_epochs_repeat_without_shuffle(self):
+        """Test that an unshuffled dataset yields the same batches in every epoch."""
+        dataset = make_dataset(self.data[['scaled_close']].to_numpy(), self.data['scaled_close'].to_numpy(),
+                               window_size=10, batch_size=16)
+
+        first, second = collect(dataset), collect(dataset)
+        np.testing.assert_array_equal(first[0], second[0])
+
+    def test_uncached_dataset_reads_windows_from_arrays(self):
+        """Test that windows read per batch from the arrays, e.g. memory maps, match the cached ones."""
+        features = self.data[['scaled_close', 'scaled_volume']].to_numpy()
+        cached = collect(make_dataset(features, features[:, 1], window_size=10, batch_size=16))
+
+        X, y = collect(make_dataset(features, features[:, 1], window_size=10, batch_size=16, cache=False))
+
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X, cached[0])
+        np.testing.assert_array_equal(y, cached[1])
+
+    def test_shuffle_keeps_sequences_with_targets(self):
+        """Test that shuffling mixes individual sequences, anew every epoch, without separating them from their targets."""
+        features = self.data[['scaled_close']].to_numpy()
+        ordered_X, ordered_y = collect(make_dataset(features, features[:, 0], window_size=10, batch_size=16))
+        dataset = make_dataset(features, features[:, 0], window_size=10, batch_size=16, shuffle=True, seed=1)
+        X, y = collect(dataset)
+
+        self.assertFalse(np.array_equal(y, ordered_y))
+        order = np.argsort(y)
+        np.testing.assert_array_equal(X[order], ordered_X[np.argsort(ordered_y)])
+        # Sequences are shuffled individually, so the first batch is not a run of consecutive sequences
+        positions = np.sort(np.searchsorted(np.sort(ordered_y), y[:16], sorter=None))
+        self.assertGreater(positions[-1] - positions[0], 15)
+        self.assertFalse(np.array_equal(collect(dataset)[1], y))
+
+    def test_entry_point_loads_data_preparation_once(self):
+        """Test that the training entry point and the pipeline share one a_data_preparation module."""
+        code = ("import sys, scripts.time_series_forecasting.d_train_and_evaluate; "
+                "print(sorted(name for name in sys.modules if name.endswith('a_data_preparation')))")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True,
+                                check=True).stdout
+
+        self.assertEqual(output.strip().splitlines()[-1], "['scripts.time_series_forecasting.a_data_preparation']")
+
+if __name__ == '__main__':
+    unittest.main()
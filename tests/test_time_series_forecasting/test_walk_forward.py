@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.db_connect import Base
+from database.dimensions import seed_granularities, clear_dimension_cache
+from scripts.insert_data import upsert_currency_data
+from scripts.time_series_forecasting import walk_forward
+from scripts.time_series_forecasting.c_evaluate_model import directional_accuracy
+from scripts.time_series_forecasting.walk_forward import (make_folds, fold_key, fold_sequences, fold_report,
+                                                          run_walk_forward)
+
+PARAMS = {'units': 4, 'layers': 1, 'epochs': 1, 'batch_size': 16}
+
+
+def make_candles(closes, start=datetime(2024, 1, 1)):
+    """Build daily raw OANDA candles with the given close prices."""
+    return [{'time': (start + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%S.000000Z'), 'volume': 1,
+             'mid': {'o': f'{c:.5f}', 'h': f'{c:.5f}', 'l': f'{c:.5f}', 'c': f'{c:.5f}'}}
+            for i, c in enumerate(closes)]
+
+
+class TestFolds(unittest.TestCase):
+
+    def test_expanding_folds(self):
+        """Test that expanding folds all train from the first sequence up to their test block."""
+        folds = make_folds(60, n_folds=3)
+
+        self.assertEqual([(fold['train_start'], fold['train_end'], fold['test_start'], fold['test_end'])
+                          for fold in folds], [(0, 15, 15, 30), (0, 30, 30, 45), (0, 45, 45, 60)])
+
+    def test_walk_forward_folds(self):
+        """Test that walk-forward folds train on a fixed window just before the last test blocks."""
+        folds = make_folds(100, n_folds=3, test_size=10, train_size=40, mode='walk_forward')
+
+        self.assertEqual([(fold['train_start'], fold['train_end'], fold['test_end']) for fold in folds],
+                         [(30, 70, 80), (40, 80, 90), (50, 90, 100)])
+
+    def test_folds_move_on_by_complete_blocks(self):
+        """Test that new sequences keep explicit folds in place until they complete a further test block."""
+        folds = make_folds(100, n_folds=3, test_size=10, train_size=40)
+
+        self.assertEqual(make_folds(109, n_folds=3, test_size=10, train_size=40), folds)
+        self.assertEqual([fold['test_start'] for fold in make_folds(110, n_folds=3, test_size=10, train_size=40)],
+                         [80, 90, 100])
+        # Without a train size the last fold ends at the last sequence
+        self.assertEqual(make_folds(105, n_folds=3, test_size=10)[-1]['test_end'], 105)
+
+    def test_invalid_folds(self):
+        """Test that unknown modes and folds larger than the data are rejected."""
+        with self.assertRaises(ValueError):
+            make_folds(60, mode='rolling')
+        with self.assertRaises(ValueError):
+            make_folds(60, n_folds=3, test_size=20, train_size=10)
+
+    def test_directional_accuracy(self):
+        """Test that moves are scored against the previous true value."""
+        y_true = np.array([1.0, 2.0, 1.0, 3.0])
+        y_pred = np.array([9.0, 1.5, 0.5, 0.5])
+
+        # Up (predicted up), down (predicted down), up (predicted down)
+        self.assertAlmostEqual(directional_accuracy(y_true, y_pred), 2 / 3)
+        self.assertTrue(np.isnan(directional_accuracy(y_true[:1], y_pred[:1])))
+
+
+class TestFoldKey(unittest.TestCase):
+
+    def setUp(self):
+        closes = 1 + np.arange(100) / 100
+        self.feature_set = {'window_size': 5, 'columns': ['close'], 'raw_features': closes.reshape(-1, 1),
+                            'raw_targets': closes.copy(),
+                            'timestamps': np.datetime64('2024-01-01') + np.arange(100).astype('timedelta64[D]')}
+        self.fold = make_folds(95, n_folds=3, test_size=10, train_size=40)[0]
+
+    def test_key_depends_on_fold_inputs(self):
+        """Test that the key changes with the fold's data, parameters and warm start, and only with them."""
+        key = fold_key(self.fold, self.feature_set, PARAMS)
+
+        self.assertEqual(fold_key(self.fold, self.feature_set, dict(PARAMS)), key)
+        self.assertNotEqual(fold_key(self.fold, self.feature_set, {**PARAMS, 'units': 8}), key)
+        self.assertNotEqual(fold_key(self.fold, self.feature_set, PARAMS, previous_key='abc'), key)
+        # Rows after the fold's last sequence do not affect it, even a new high or low; rows inside it do
+        self.feature_set['raw_features'][90:] = 9
+        self.feature_set['raw_targets'][90:] = -9
+        self.assertEqual(fold_key(self.fold, self.feature_set, PARAMS), key)
+        self.feature_set['raw_features'][50] = 9
+        self.assertNotEqual(fold_key(self.fold, self.feature_set, PARAMS), key)
+
+    def test_scalers_fit_on_training_rows(self):
+        """Test that a fold is scaled by its training rows alone, so its test rows cannot leak into training."""
+        X_train, X_test, y_train = fold_sequences(self.fold, self.feature_set)[:3]
+        self.feature_set['raw_features'][self.fold['test_start'] + 5:] *= 2
+        self.feature_set['raw_targets'][self.fold['test_start'] + 5:] *= 2
+        changed = fold_sequences(self.fold, self.feature_set)
+
+        self.assertEqual((len(X_train), len(X_test)), (60, 10))
+        np.testing.assert_array_equal(changed[0], X_train)
+        np.testing.assert_array_equal(changed[2], y_train)
+        self.assertAlmostEqual(X_train.min(), 0)
+        self.assertAlmostEqual(y_train.max(), 1)
+        # Test targets above the training range scale above 1 instead of rescaling the training data
+        self.assertTrue((changed[3] > 1).all())
+        np.testing.assert_allclose(changed[4].inverse_transform(changed[3].reshape(-1, 1)).ravel(),
+                                   self.feature_set['raw_targets'][self.fold['test_start'] + 5:
+                                                                   self.fold['test_end'] + 5])
+
+
+class TestRunWalkForward(unittest.TestCase):
+    """
+    A small backtest end to end, on spawned worker processes reading the feature store.
+    """
+
+    def setUp(self):
+        clear_dimension_cache()
+        self.directory = tempfile.mkdtemp()
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            seed_granularities(connection)
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(make_candles(1.1 + np.sin(np.arange(70) / 5) / 100), currency_pair='EUR/USD',
+                             session=session)
+        session.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        clear_dimension_cache()
+        self.engine.dispose()
+
+    def run_backtest(self, **kwargs):
+        return run_walk_forward(window_size=5, n_folds=2, params=PARAMS, workers=1, intra_op_threads=1,
+                                cache_dir=os.path.join(self.directory, 'cache'), root=self.directory,
+                                engine=self.engine, **kwargs)
+
+    def test_backtest_caches_folds(self):
+        """Test that folds are scored, skipped when unchanged and retrained when warm-started."""
+        results = self.run_backtest()
+
+        self.assertEqual([result['cached'] for result in results], [False, False])
+        for result in results:
+            self.assertTrue(np.isfinite(result['RMSE']))
+            self.assertTrue(0 <= result['Directional Accuracy'] <= 1)
+        report = fold_report(results)
+        self.assertEqual(list(report.index), [0, 1, 'mean'])
+        self.assertAlmostEqual(report.loc['mean', 'MAE'], np.mean([result['MAE'] for result in results]))
+
+        with patch.object(walk_forward, 'ProcessPoolExecutor') as pool:
+            cached = self.run_backtest()
+        pool.assert_not_called()
+        self.assertEqual([result['cached'] for result in cached], [True, True])
+        self.assertEqual([result['RMSE'] for result in cached], [result['RMSE'] for result in results])
+
+        # The first fold of a warm-started backtest has no predecessor, so its cached result is reused
+        warm = self.run_backtest(warm_start=True)
+        self.assertEqual([result['cached'] for result in warm], [True, False])
+        self.assertTrue(warm[1]['warm_started'])
+
+    def test_new_candles_train_only_the_new_fold(self):
+        """Test that explicit folds stay cached as candles arrive and move on once a test block is complete."""
+        first = self.run_backtest(test_size=10, train_size=30)
+        self.assertEqual([result['test_end'] for result in first], [50, 60])
+
+        # New candles beyond the highs of the series do not touch the folds before them
+        session = sessionmaker(bind=self.engine)()
+        upsert_currency_data(make_candles(np.linspace(1.2, 1.3, 10), start=datetime(2024, 1, 1) + timedelta(days=70)),
+                             currency_pair='EUR/USD', session=session)
+        session.close()
+        moved = self.run_backtest(test_size=10, train_size=30)
+
+        self.assertEqual([result['test_end'] for result in moved], [60, 70])
+        self.assertEqual([result['cached'] for result in moved], [True, False])
+        self.assertEqual(moved[0]['fold'], 0)
+        self.assertEqual(moved[0]['RMSE'], first[1]['RMSE'])
+
+
+if __name__ == '__main__':
+    unittest.main()